@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+bench_axes.py [-n points] [-r repeats]
+
+Compares reading a horizontal slice metadata file with n lats and n lons
+by parsing the full json (read_metadata, then float64 arrays of the lists)
+against read_axes, which keeps the regular axes as RegularAxis without
+parsing the lists, with and without verify.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from ucvm_metadata.axes import read_axes
+from ucvm_metadata.metadata import read_metadata
+
+
+def write_meta(filename, num_points, spacing=0.0001):
+    lat1, lon1 = 34.0, -119.0
+    lats = (lat1 + spacing * np.arange(num_points)).tolist()
+    lons = (lon1 + spacing * np.arange(num_points)).tolist()
+    meta = {"lat1": str(lat1), "lon1": str(lon1),
+            "lat2": str(lats[-1] + spacing), "lon2": str(lons[-1] + spacing),
+            "spacing": str(spacing), "depth": "0", "data_type": "vs", "datapoints": num_points * num_points,
+            "num_x": num_points + 1, "num_y": num_points + 1, "lat_list": lats, "lon_list": lons}
+    with open(filename, "w") as f:
+        json.dump(meta, f)
+
+
+def read_full(filename):
+    obj = read_metadata(filename)
+    return obj, np.asarray(obj["lat_list"], dtype=np.float64), np.asarray(obj["lon_list"], dtype=np.float64)
+
+
+def measure(fn, repeats):
+    """
+    :return: (seconds per call, peak MB allocated by one call)
+    """
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats, peak / 1e6
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--points", type=int, default=100000, help="points per axis (default: 100000)")
+    parser.add_argument("-r", "--repeats", type=int, default=5, help="timed reads per method (default: 5)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "bench_h_meta.json")
+        write_meta(filename, args.points)
+        print("%d lats x %d lons, metadata %.1f MB" % (args.points, args.points, os.path.getsize(filename) / 1e6))
+        for name, fn in [("json", lambda: read_full(filename)),
+                         ("regular", lambda: read_axes(filename)),
+                         ("verify", lambda: read_axes(filename, verify=True))]:
+            seconds, peak = measure(fn, args.repeats)
+            print("%-8s %8.4fs  peak %7.1f MB" % (name, seconds, peak))
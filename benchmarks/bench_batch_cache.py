@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+bench_batch_cache.py [-p points]
+
+Timing and check of the --cache and --clean options of ucvm_batch2csv.py
+(see ucvm_metadata/cache.py).  Two directories of synthetic pairs (see
+synthetic.py) are converted into one output directory, sharing its
+manifest, the way convert_directory.sh converts 2ddata and 1ddata:
+
+    full        first --cache run of each directory
+    cached      second --cache run, every output up to date
+    clean       one pair of the second directory is removed, --clean of
+                the first directory has to keep every output and --clean
+                of the second one has to remove only the output of that pair
+
+Prints the time of each run and exits with 1 if a run converts or removes
+the wrong outputs.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synthetic
+
+BATCH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "bin", "ucvm_batch2csv.py")
+
+
+def batch(directory, output_dir, *options):
+    """
+    :return: (seconds, stdout lines) of a ucvm_batch2csv.py --cache run
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, BATCH, "--cache", "-j", "1", "-o", output_dir] + list(options)
+                            + [directory], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    if result.returncode != 0:
+        raise RuntimeError("ucvm_batch2csv.py %s failed: %s" % (directory, result.stdout[-1000:]))
+    return time.perf_counter() - start, result.stdout.splitlines()
+
+
+def outputs(output_dir):
+    return sorted(f for f in os.listdir(output_dir) if f.endswith(".csv"))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-p", "--points", type=lambda s: int(float(s)), default=10 ** 5,
+                        help="points of the synthetic grids (default: 1e5)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ucvm_batch_cache_bench_")
+    try:
+        first, second, output_dir = (os.path.join(workdir, name) for name in ("first", "second", "csv"))
+        removed = None
+        for directory in (first, second):
+            os.makedirs(directory)
+            synthetic.write_cross_section(directory, os.path.basename(directory), args.points)
+            removed = synthetic.write_horizontal_slice(directory, os.path.basename(directory), args.points)
+
+        problems = []
+        for name, directory in (("full", first), ("full", second), ("cached", first), ("cached", second)):
+            seconds, lines = batch(directory, output_dir)
+            converted = [line for line in lines if line.startswith("OK")]
+            if name == "cached" and converted:
+                problems.append("cached run of %s converted %d pairs" % (directory, len(converted)))
+            print("%-8s %-8s %8.2f s  %d converted" % (name, os.path.basename(directory), seconds, len(converted)))
+        before = outputs(output_dir)
+
+        for filename in removed:
+            os.remove(filename)
+        expected = os.path.basename(removed[0]).replace(".bin", ".csv")
+        for directory, gone in ((first, []), (second, [expected])):
+            seconds, lines = batch(directory, output_dir, "--clean")
+            found = [os.path.basename(line.split(" ", 1)[1]) for line in lines if line.startswith("REMOVED")]
+            if found != gone:
+                problems.append("--clean of %s removed %s, expected %s" % (directory, found, gone))
+            print("%-8s %-8s %8.2f s  removed %s" % ("clean", os.path.basename(directory), seconds,
+                                                    ", ".join(found) or "nothing"))
+        left = [f for f in before if f != expected]
+        if outputs(output_dir) != left:
+            problems.append("outputs after --clean %s, expected %s" % (outputs(output_dir), left))
+
+        for problem in problems:
+            print("FAILED: %s" % problem)
+        sys.exit(1 if problems else 0)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+bench_converters.py run [options]
+bench_converters.py compare base.json new.json [--threshold 0.1]
+
+Benchmarks the seven converter scripts in bin/ on synthetic data (see
+synthetic.py) at several scales, from 10^4 to 10^8 points:
+
+    python3 bench_converters.py run --scales 1e4 1e5 1e6 --output new.json
+
+Each script runs in its own process, and its wall time, peak RSS and
+output size are recorded as json.  The inputs are generated in a separate
+process too, a child process starts with the peak RSS of its parent.
+compare reports the change of two runs per converter and scale and exits
+with 1 when a converter got slower or bigger by more than the threshold:
+
+    python3 bench_converters.py compare base.json new.json
+
+Vertical profiles are json files with one object per point, their size is
+capped with --max-profile-points.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synthetic
+
+BIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "bin")
+
+# converter name -> script, kind of input
+CONVERTERS = {
+    "vertical_profile": ("ucvm_vertical_profile2csv.py", "v"),
+    "cross_section": ("ucvm_cross_section2csv.py", "c"),
+    "cross_section_line": ("ucvm_cross_section2csv_line.py", "c"),
+    "cross_section_all": ("ucvm_cross_section2csv_all.py", "call"),
+    "horizontal_slice": ("ucvm_horizontal_slice2csv.py", "h"),
+    "horizontal_slice_line": ("ucvm_horizontal_slice2csv_line.py", "h"),
+    "horizontal_slice_all": ("ucvm_horizontal_slice2csv_all.py", "hall"),
+}
+
+# metrics compared between runs, a larger value is worse
+METRICS = ("seconds", "max_rss_mb")
+
+RESULTS_VERSION = 1
+
+
+def parse_scale(text):
+    """
+    :return: number of points, from 10000, 1e4 or 10^4
+    """
+    if "^" in text:
+        base, exp = text.split("^")
+        return int(base) ** int(exp)
+    return int(float(text))
+
+
+def write_inputs(directory, num_points, max_profile_points, seed=0):
+    """
+    Generate the inputs in a separate process, the peak RSS of the
+    converters would otherwise include the memory used to generate them.
+
+    :return: dict of input kind -> list of input file names
+    """
+    out = subprocess.run([sys.executable, synthetic.__file__, directory, str(num_points),
+                          "--max-profile-points", str(max_profile_points), "--seed", str(seed)],
+                         check=True, stdout=subprocess.PIPE)
+    return json.loads(out.stdout)
+
+
+def run_script(script, args):
+    """
+    :return: (seconds, peak RSS in MB, exit code, stderr text) of running a script
+    """
+    start = time.perf_counter()
+    p = subprocess.Popen([sys.executable, os.path.join(BIN_DIR, script)] + args,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr = p.stderr.read()
+    _, status, usage = os.wait4(p.pid, 0)
+    seconds = time.perf_counter() - start
+    p.returncode = os.waitstatus_to_exitcode(status)
+    #
+    # ru_maxrss is in kilobytes on linux and in bytes on macOS
+    rss = usage.ru_maxrss / (1 << 20) if sys.platform == "darwin" else usage.ru_maxrss / 1024.0
+    return seconds, rss, p.returncode, stderr.decode(errors="replace")
+
+
+def run_converter(name, inputs, directory, num_points, repeat):
+    """
+    :return: result dict of the best (fastest) of repeat runs of a converter
+    """
+    script, kind = CONVERTERS[name]
+    files = inputs[kind]
+    output = os.path.join(directory, name + ".csv")
+    best = None
+    for _ in range(repeat):
+        if os.path.exists(output):
+            os.remove(output)
+        seconds, rss, code, stderr = run_script(script, files + [output])
+        if best is None or seconds < best[0]:
+            best = (seconds, rss, code, stderr)
+    seconds, rss, code, stderr = best
+    #
+    # the scripts exit with 1 on success too, the output file tells if it worked
+    ok = os.path.exists(output) and "Traceback" not in stderr
+    output_bytes = os.path.getsize(output) if os.path.exists(output) else 0
+    input_bytes = sum(os.path.getsize(f) for f in files)
+    result = {
+        "converter": name,
+        "points": num_points,
+        "ok": ok,
+        "exit_code": code,
+        "seconds": seconds,
+        "max_rss_mb": rss,
+        "input_bytes": input_bytes,
+        "output_bytes": output_bytes,
+        "output_mb_per_second": output_bytes / 1e6 / seconds if seconds > 0 else 0.0,
+        "points_per_second": num_points / seconds if seconds > 0 else 0.0,
+    }
+    if not ok:
+        result["error"] = stderr.strip().splitlines()[-1] if stderr.strip() else "no output file"
+    if os.path.exists(output):
+        os.remove(output)
+    return result
+
+
+def run(scales, converters, workdir=None, keep=False, repeat=1, max_profile_points=10 ** 6, progress=print):
+    """
+    :return: results dict of a benchmark run
+    """
+    results = []
+    for num_points in scales:
+        directory = tempfile.mkdtemp(prefix="ucvm_bench_%d_" % num_points, dir=workdir)
+        try:
+            start = time.perf_counter()
+            inputs = write_inputs(directory, num_points, max_profile_points)
+            progress("%d points: generated inputs in %.1fs" % (num_points, time.perf_counter() - start))
+            for name in converters:
+                points = min(num_points, max_profile_points) if name == "vertical_profile" else num_points
+                result = run_converter(name, inputs, directory, points, repeat)
+                results.append(result)
+                progress("  %-22s %9.2fs %9.1f MB %9.2f MB/s %s" % (
+                    name, result["seconds"], result["max_rss_mb"], result["output_mb_per_second"],
+                    "" if result["ok"] else "FAILED " + result["error"]))
+        finally:
+            if not keep:
+                shutil.rmtree(directory, ignore_errors=True)
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "cores": os.cpu_count(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(base, new, threshold=0.1):
+    """
+    :return: (list of row dicts, number of regressions), one row per
+             converter and scale found in both runs
+    """
+    base_results = {(r["converter"], r["points"]): r for r in base["results"]}
+    rows = []
+    regressions = 0
+    for r in new["results"]:
+        old = base_results.get((r["converter"], r["points"]))
+        if old is None:
+            continue
+        row = {"converter": r["converter"], "points": r["points"], "regressed": []}
+        for metric in METRICS:
+            ratio = r[metric] / old[metric] if old[metric] > 0 else 1.0
+            row[metric] = (old[metric], r[metric], ratio)
+            if ratio > 1.0 + threshold:
+                row["regressed"].append(metric)
+        if old["ok"] and not r["ok"]:
+            row["regressed"].append("ok")
+        regressions += bool(row["regressed"])
+        rows.append(row)
+    return rows, regressions
+
+
+def format_compare(rows):
+    """
+    :return: the rows of compare as printable text
+    """
+    lines = ["%-22s %10s %10s %10s %7s %9s %9s %7s" % (
+        "converter", "points", "base(s)", "new(s)", "ratio", "base(MB)", "new(MB)", "ratio")]
+    for row in rows:
+        s_old, s_new, s_ratio = row["seconds"]
+        m_old, m_new, m_ratio = row["max_rss_mb"]
+        lines.append("%-22s %10d %10.3f %10.3f %7.2f %9.1f %9.1f %7.2f %s" % (
+            row["converter"], row["points"], s_old, s_new, s_ratio, m_old, m_new, m_ratio,
+            "REGRESSED " + ",".join(row["regressed"]) if row["regressed"] else ""))
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("-s", "--scales", nargs="+", default=["1e4", "1e5", "1e6"],
+                            help="numbers of points, e.g. 1e4 10^6 (default: 1e4 1e5 1e6)")
+    run_parser.add_argument("-c", "--converters", nargs="+", choices=sorted(CONVERTERS),
+                            default=list(CONVERTERS), help="converters to run (default: all)")
+    run_parser.add_argument("-o", "--output", help="write the results json here (default: stdout)")
+    run_parser.add_argument("-r", "--repeat", type=int, default=1, help="keep the fastest of N runs (default: 1)")
+    run_parser.add_argument("-w", "--workdir", help="directory for the synthetic inputs (default: system temp)")
+    run_parser.add_argument("--keep", action="store_true", help="keep the synthetic inputs")
+    run_parser.add_argument("--max-profile-points", type=parse_scale, default=10 ** 6,
+                            help="largest vertical profile (default: 1e6)")
+
+    compare_parser = commands.add_parser("compare", help="compare two benchmark runs")
+    compare_parser.add_argument("base", help="results json of the reference run")
+    compare_parser.add_argument("new", help="results json of the new run")
+    compare_parser.add_argument("-t", "--threshold", type=float, default=0.1,
+                                help="relative increase counted as a regression (default: 0.1)")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run([parse_scale(s) for s in args.scales], args.converters, args.workdir, args.keep,
+                      args.repeat, args.max_profile_points, progress=lambda s: print(s, file=sys.stderr))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+        else:
+            json.dump(results, sys.stdout, indent=2)
+            print()
+        sys.exit(0 if all(r["ok"] for r in results["results"]) else 1)
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    rows, regressions = compare(base, new, args.threshold)
+    print(format_compare(rows))
+    print("%d of %d converter runs regressed by more than %d%%" % (regressions, len(rows), 100 * args.threshold))
+    sys.exit(1 if regressions else 0)
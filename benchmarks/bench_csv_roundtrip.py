@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+bench_csv_roundtrip.py [-p points] [directory ...]
+
+Round trip check and timing of the CSV reader (ucvm_metadata/csvreader.py).
+Every cross section and horizontal slice pair in the directories (or
+synthetic data, see synthetic.py, when none are given) is converted to the
+wide, line and all CSV formats, read back with read_csv and compared with
+the original:
+
+    line, all   grid and coordinate lists equal bit for bit, -1 NoData
+                points included
+    wide        grid values within half of the last written decimal,
+                coordinate lists within the decimals of the labels
+
+and the header fields (title, cvm, data_type, depths, spacings, min/max/
+mean, end points) equal in the metadata.  A cut off CSV read back over a
+copy of the first pair has to fail and leave the copy as it was.  Prints
+the read rate of each format and exits with 1 if any round trip differs.  Pairs that the
+converters refuse (metadata that does not match the data) are skipped.
+
+    python3 bench_csv_roundtrip.py ../2ddata
+"""
+import argparse
+import filecmp
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import synthetic
+from ucvm_metadata import batch
+from ucvm_metadata.converters import (convert_cross_section, convert_cross_section_all, convert_cross_section_line,
+                                      convert_horizontal_slice, convert_horizontal_slice_all,
+                                      convert_horizontal_slice_line)
+from ucvm_metadata.csvreader import HEADER_KEYS, read_csv
+from ucvm_metadata.floatfmt import DECIMALS
+from ucvm_metadata.metadata import MetadataError, read_metadata
+
+CONVERTERS = {
+    "c": {"wide": convert_cross_section, "line": convert_cross_section_line, "all": convert_cross_section_all},
+    "h": {"wide": convert_horizontal_slice, "line": convert_horizontal_slice_line,
+          "all": convert_horizontal_slice_all},
+}
+
+# horizontal slice lats are written with 4 decimals in the wide format
+WIDE_AXIS_TOLERANCE = 0.5e-4 + 1e-9
+
+# metadata the header of a format does not hold, or holds for all properties at once
+NOT_IN_HEADER = {"wide": ("horizontal_spacing",), "line": (), "all": ("data_type",)}
+
+
+def write_csv(job, fmt, csv_file):
+    convert = CONVERTERS[job.kind][fmt]
+    if fmt == "all":
+        convert(*(job.data_file, job.meta_file) * 3, output_file_name=csv_file)
+    else:
+        convert(job.data_file, job.meta_file, output_file_name=csv_file)
+
+
+def differences(job, fmt, data_file, meta_file):
+    """
+    :return: list of what differs between a pair and the pair read back from its CSV
+    """
+    obj, new_obj = read_metadata(job.meta_file), read_metadata(meta_file)
+    grid, new_grid = np.load(job.data_file), np.load(data_file)
+    found = []
+    if grid.shape != new_grid.shape:
+        return ["grid shape %s, read back %s" % (grid.shape, new_grid.shape)]
+    if fmt == "wide":
+        empty = 0.0 if job.kind == "h" else None
+        a = np.where(grid == empty, np.nan, grid).astype(np.float64)
+        b = np.where(new_grid == empty, np.nan, new_grid).astype(np.float64)
+        same_nan = np.array_equal(np.isnan(a), np.isnan(b))
+        error = np.nanmax(np.abs(a - b), initial=0.0)
+        # the float32 of the rounded text can be off by one float32 step
+        limit = 0.5 * 10.0 ** -DECIMALS + np.nanmax(np.abs(a), initial=0.0) * np.finfo(np.float32).eps
+        if not same_nan or error > limit:
+            found.append("grid differs by %g" % error)
+    elif not np.array_equal(grid, new_grid):
+        found.append("grid differs at %d points" % int(np.count_nonzero(grid != new_grid)))
+    for key in ("lon_list", "lat_list", "depth_list"):
+        if key not in obj:
+            continue
+        a, b = np.array(obj[key], dtype=np.float64), np.array(new_obj[key], dtype=np.float64)
+        tolerance = WIDE_AXIS_TOLERANCE if fmt == "wide" else 0.0
+        if len(a) != len(b) or np.abs(a - b).max(initial=0.0) > tolerance:
+            found.append(key + " differs")
+    skip = ("datapoints", "num_x", "num_y") + NOT_IN_HEADER[fmt]
+    for name, _ in HEADER_KEYS.values():
+        if name in obj and name not in skip and str(obj[name]) != str(new_obj.get(name)):
+            found.append("%s %r, read back %r" % (name, obj[name], new_obj.get(name)))
+    return found
+
+
+def round_trip(job, fmt, directory):
+    """
+    :return: (seconds to read the CSV back, CSV bytes, list of differences)
+    """
+    csv_file = os.path.join(directory, "%s_%s_%s_data.csv" % (os.path.basename(job.name), fmt, job.kind))
+    write_csv(job, fmt, csv_file)
+    start = time.perf_counter()
+    files = read_csv(csv_file, force=True)
+    seconds = time.perf_counter() - start
+    found = []
+    for data_file, meta_file in files:
+        found += differences(job, fmt, data_file, meta_file)
+    return seconds, os.path.getsize(csv_file), found
+
+
+def failed_read(job, directory):
+    """
+    Read a cut off CSV of a pair back over a copy of the pair.
+
+    :return: list of what went wrong, empty when the read failed and the copy is unchanged
+    """
+    csv_file = os.path.join(directory, "cut_%s_data.csv" % job.kind)
+    write_csv(job, "line", csv_file)
+    with open(csv_file, "r+") as f:
+        f.truncate(os.path.getsize(csv_file) // 2)
+        f.seek(0, os.SEEK_END)
+        f.write("\nnot,a,row\n")
+    prefix = os.path.join(directory, "copy")
+    pair = [prefix + "_%s_data.bin" % job.kind, prefix + "_%s_meta.json" % job.kind]
+    shutil.copy(job.data_file, pair[0])
+    shutil.copy(job.meta_file, pair[1])
+    try:
+        read_csv(csv_file, prefix, force=True)
+        return ["a cut off CSV was read back"]
+    except (MetadataError, ValueError):
+        pass
+    found = ["%s changed" % name for name, original in zip(pair, (job.data_file, job.meta_file))
+             if not filecmp.cmp(name, original, shallow=False)]
+    return found + ["%s left behind" % name for name in os.listdir(directory) if name.endswith(".tmp")]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directories", nargs="*", help="directories of pairs (default: synthetic data)")
+    parser.add_argument("-p", "--points", type=lambda s: int(float(s)), default=10 ** 6,
+                        help="points of the synthetic grids (default: 1e6)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ucvm_csv_roundtrip_")
+    try:
+        directories = args.directories
+        if not directories:
+            directories = [os.path.join(workdir, "data")]
+            os.makedirs(directories[0])
+            synthetic.write_horizontal_slice(directories[0], "synthetic", args.points)
+            synthetic.write_cross_section(directories[0], "synthetic", args.points)
+        jobs = []
+        for directory in directories:
+            jobs += [job for job in batch.discover(directory)[0] if job.kind in "ch"]
+
+        failed = 0
+        print("%-40s %-5s %12s %10s  %s" % ("pair", "fmt", "csv MB", "MB/s", "result"))
+        for job in jobs:
+            for fmt in ("wide", "line", "all"):
+                try:
+                    seconds, size, found = round_trip(job, fmt, workdir)
+                except MetadataError as e:
+                    print("%-40s %-5s %12s %10s  skipped: %s" % (os.path.basename(job.name), fmt, "", "",
+                                                                 " ".join(map(str, e.args))))
+                    break
+                failed += bool(found)
+                print("%-40s %-5s %12.1f %10.1f  %s" % (os.path.basename(job.name), fmt, size / 1e6,
+                                                        size / 1e6 / seconds, "; ".join(found) or "ok"),
+                      flush=True)
+        if jobs:
+            found = failed_read(jobs[0], workdir)
+            failed += bool(found)
+            print("%-40s %-5s %12s %10s  %s" % (os.path.basename(jobs[0].name), "cut", "", "",
+                                                "; ".join(found) or "ok"))
+        sys.exit(1 if failed else 0)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
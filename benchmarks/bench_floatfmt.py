@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+bench_floatfmt.py [-n cells] [--pandas]
+
+Compares the cells per second of the wide format number formatting before
+and after floatfmt.py on a synthetic float32 block:
+
+    python      '{:5.4f}'.format called per cell
+    pandas      DataFrame.to_csv(float_format='{:5.4f}'.format), the old
+                wide converter path (with --pandas)
+    floatfmt    write_wide_csv, the vectorized path
+
+and checks that every path writes the same text.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from ucvm_metadata.csvwriter import write_wide_csv
+
+
+def synthetic_block(num_cells, num_cols=1000, seed=0):
+    """
+    :return: (labels, names, grid) of a float32 grid with velocity-like values
+    """
+    rng = np.random.default_rng(seed)
+    num_rows = max(1, num_cells // num_cols)
+    grid = rng.uniform(100.0, 8000.0, (num_rows, num_cols)).astype(np.float32)
+    grid[rng.random(grid.shape) < 0.05] = np.nan
+    labels = [round(35.0 + 0.01 * i, 2) for i in range(num_rows)]
+    names = ["Lats"] + [str(round(-120.0 + 0.01 * j, 2)) for j in range(num_cols)]
+    return labels, names, grid
+
+
+def run_python(labels, names, grid):
+    f = io.StringIO()
+    f.write(",".join(names) + "\n")
+    for label, row in zip(labels, grid.tolist()):
+        cells = ["" if v != v else '{:5.4f}'.format(v) for v in row]
+        f.write('{:5.4f}'.format(label) + "," + ",".join(cells) + "\n")
+    return f.getvalue()
+
+
+def run_pandas(labels, names, grid):
+    import pandas as pd
+
+    f = io.StringIO()
+    df = pd.DataFrame(grid, columns=names[1:])
+    df.insert(0, names[0], labels)
+    df.to_csv(f, float_format='{:5.4f}'.format, index=False)
+    return f.getvalue()
+
+
+def run_floatfmt(labels, names, grid):
+    f = io.StringIO()
+    write_wide_csv(f, names, labels, grid)
+    return f.getvalue()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--cells", type=int, default=1000000, help="number of cells (default: 1000000)")
+    parser.add_argument("--pandas", action="store_true", help="also time the pandas to_csv path")
+    args = parser.parse_args()
+
+    labels, names, grid = synthetic_block(args.cells)
+    runs = [("python", run_python)]
+    if args.pandas:
+        runs.append(("pandas", run_pandas))
+    runs.append(("floatfmt", run_floatfmt))
+
+    reference = None
+    for name, fn in runs:
+        start = time.perf_counter()
+        text = fn(labels, names, grid)
+        seconds = time.perf_counter() - start
+        if reference is None:
+            reference = text
+        same = "same" if text == reference else "DIFFERENT"
+        print("%-10s %8.3fs %12.0f cells/s  %s" % (name, seconds, grid.size / seconds, same))
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+bench_interpolate.py [-p points] [-l loop_points] [-g grid_points]
+
+Compares the vectorized interpolation of interpolate.py with a naive loop
+over the points (bisect into the axes, then the bilinear weights of one
+point at a time) on synthetic data (see synthetic.py), for a horizontal
+slice, a cross section and a vertical profile.  The loop runs on the first
+loop_points points only, its rate is compared with the vectorized rate
+over all points, and the two are checked to agree on those points.
+"""
+import argparse
+import bisect
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import synthetic
+from ucvm_metadata.interpolate import (interpolate_cross_section, interpolate_horizontal_slice,
+                                       interpolate_vertical_profile, path_axis)
+from ucvm_metadata.loader import load_cross_section, load_horizontal_slice, load_vertical_profile
+
+
+def _loop_position(axis, x):
+    """
+    :return: fractional index of x in an increasing or decreasing list, None outside
+    """
+    if axis[-1] < axis[0]:
+        position = _loop_position(axis[::-1], x)
+        return None if position is None else len(axis) - 1 - position
+    if x < axis[0] or x > axis[-1]:
+        return None
+    i = min(max(bisect.bisect_right(axis, x) - 1, 0), len(axis) - 2)
+    return i + (x - axis[i]) / (axis[i + 1] - axis[i])
+
+
+def _loop_value(data, positions, nodata):
+    """
+    :return: linear interpolation at one position, leaving out NoData
+    """
+    lows = [min(int(p), n - 2) for p, n in zip(positions, data.shape)]
+    total = weight_sum = 0.0
+    for corner in np.ndindex(*(2,) * len(positions)):
+        w = 1.0
+        for c, p, low in zip(corner, positions, lows):
+            w *= (p - low) if c else 1.0 - (p - low)
+        value = float(data[tuple(low + c for low, c in zip(lows, corner))])
+        if value != value or value == nodata:
+            continue
+        total += w * value
+        weight_sum += w
+    return total / weight_sum if weight_sum > 0 else float("nan")
+
+
+def loop_horizontal_slice(hs, lon, lat):
+    lats, lons = hs.lat.tolist(), hs.lon.tolist()
+    values = []
+    for x, y in zip(lon.tolist(), lat.tolist()):
+        row, col = _loop_position(lats, y), _loop_position(lons, x)
+        values.append(float("nan") if row is None or col is None else _loop_value(hs.data, (row, col), 0.0))
+    return np.array(values)
+
+
+def loop_cross_section(cs, lon, lat, depth):
+    axis, column = path_axis(cs.lon, cs.lat)
+    axis, depths = axis.tolist(), cs.depth.tolist()
+    values = []
+    for x, y, z in zip(lon.tolist(), lat.tolist(), depth.tolist()):
+        row, col = _loop_position(depths, z), _loop_position(axis, (x, y)[column])
+        values.append(float("nan") if row is None or col is None else _loop_value(cs.data, (row, col), -1.0))
+    return np.array(values)
+
+
+def loop_vertical_profile(vp, depth):
+    depths, data = vp.depth.tolist(), vp.data["vs"]
+    values = []
+    for z in depth.tolist():
+        row = _loop_position(depths, z)
+        values.append(float("nan") if row is None else _loop_value(data, (row,), None))
+    return np.array(values)
+
+
+def compare(name, vectorized, loop, num_points, loop_points):
+    """
+    :return: printable line comparing a vectorized and a loop interpolation
+    """
+    start = time.perf_counter()
+    values = vectorized()
+    seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    loop_values = loop()
+    loop_seconds = time.perf_counter() - start
+    same = np.allclose(values[:loop_points], loop_values, equal_nan=True)
+    rate, loop_rate = num_points / seconds, loop_points / loop_seconds
+    return "%-18s %14.0f %14.0f %9.1fx %s" % (name, rate, loop_rate, rate / loop_rate,
+                                               "" if same else "RESULTS DIFFER")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-p", "--points", type=lambda s: int(float(s)), default=10 ** 6,
+                        help="query points (default: 1e6)")
+    parser.add_argument("-l", "--loop-points", type=lambda s: int(float(s)), default=10 ** 4,
+                        help="query points of the loop (default: 1e4)")
+    parser.add_argument("-g", "--grid-points", type=lambda s: int(float(s)), default=10 ** 6,
+                        help="points of the synthetic grids (default: 1e6)")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="ucvm_interp_bench_")
+    try:
+        hs = load_horizontal_slice(*synthetic.write_horizontal_slice(directory, "bench", args.grid_points))
+        cs = load_cross_section(*synthetic.write_cross_section(directory, "bench", args.grid_points))
+        vp = load_vertical_profile(*synthetic.write_vertical_profile(directory, "bench", 10 ** 4))
+        rng = np.random.default_rng(0)
+        n, m = args.points, args.loop_points
+        lon = rng.uniform(hs.lon[0], hs.lon[-1], n)
+        lat = rng.uniform(hs.lat[0], hs.lat[-1], n)
+        cs_lon = rng.uniform(cs.lon.min(), cs.lon.max(), n)
+        cs_lat = np.interp(cs_lon, cs.lon, cs.lat)
+        depth = rng.uniform(cs.depth[0], cs.depth[-1], n)
+        vp_depth = rng.uniform(vp.depth[0], vp.depth[-1], n)
+
+        print("%d points, %d in the loop" % (n, m))
+        print("%-18s %14s %14s %10s" % ("", "points/s", "loop points/s", "speedup"))
+        print(compare("horizontal_slice", lambda: interpolate_horizontal_slice(hs, lon, lat),
+                      lambda: loop_horizontal_slice(hs, lon[:m], lat[:m]), n, m))
+        print(compare("cross_section", lambda: interpolate_cross_section(cs, cs_lon, cs_lat, depth),
+                      lambda: loop_cross_section(cs, cs_lon[:m], cs_lat[:m], depth[:m]), n, m))
+        print(compare("vertical_profile", lambda: interpolate_vertical_profile(vp, vp_depth),
+                      lambda: loop_vertical_profile(vp, vp_depth[:m]), n, m))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
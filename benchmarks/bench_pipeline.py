@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+bench_pipeline.py [-p points] [-w workers ...] [--latency ms]
+
+Compares the read/format/write pipeline of the CSV writers (see
+ucvm_metadata/pipeline.py) with the serial path (0 workers) on synthetic
+data (see synthetic.py): the wide and long format of a cross section and
+a horizontal slice, written with each number of formatter workers.
+
+--latency adds a sleep to every block read and every write, like a
+network file system that is slow to answer but not busy, which is where
+overlapping the stages pays off even on one core.  Prints MB/s of CSV per
+run and the speedup over the serial path, and checks that every run
+writes the same bytes.
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import synthetic
+from ucvm_metadata.csvwriter import write_line_csv, write_wide_csv
+from ucvm_metadata.loader import load_cross_section, load_horizontal_slice
+
+
+class SlowGrid:
+    """
+    Grid whose block reads take latency seconds longer.
+    """
+
+    def __init__(self, grid, latency):
+        self.grid = grid
+        self.latency = latency
+        self.shape = grid.shape
+        self.dtype = grid.dtype
+
+    def __getitem__(self, index):
+        time.sleep(self.latency)
+        return self.grid[index]
+
+
+class SlowFile:
+    """
+    File whose writes take latency seconds longer, hashing what is written.
+    """
+
+    def __init__(self, f, latency):
+        self.f = f
+        self.latency = latency
+        self.sha256 = hashlib.sha256()
+
+    def write(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        self.sha256.update(text.encode())
+        return self.f.write(text)
+
+
+def writers(cs, hs):
+    """
+    :return: list of (name, function of (file, workers, latency)) of the runs
+    """
+    def grid(data, latency):
+        return SlowGrid(data, latency) if latency else data
+
+    return [
+        ("cross_section wide", lambda f, w, l: write_wide_csv(
+            f, ["Depths[m]"] + ["(%s,%s)" % p for p in zip(cs.lat.tolist(), cs.lon.tolist())],
+            cs.depth, grid(cs.data, l), workers=w)),
+        ("cross_section line", lambda f, w, l: write_line_csv(
+            f, [cs.lon.tolist(), cs.lat.tolist()], [cs.depth.tolist()], [grid(cs.data, l)], workers=w)),
+        ("horizontal_slice wide", lambda f, w, l: write_wide_csv(
+            f, ["Lats"] + [str(lon) for lon in hs.lon.tolist()], hs.lat, grid(hs.data, l), empty=0.0,
+            workers=w)),
+        ("horizontal_slice line", lambda f, w, l: write_line_csv(
+            f, [hs.lon.tolist()], [hs.lat.tolist()], [grid(hs.data, l)], workers=w)),
+    ]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-p", "--points", type=lambda s: int(float(s)), default=4 * 10 ** 6,
+                        help="points of the synthetic grids (default: 4e6)")
+    parser.add_argument("-w", "--workers", type=int, nargs="+", default=[0, 1, 2, 4],
+                        help="formatter workers to compare, 0 is the serial path (default: 0 1 2 4)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="milliseconds added to every block read and write (default: 0)")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="ucvm_pipeline_bench_")
+    try:
+        cs = load_cross_section(*synthetic.write_cross_section(directory, "bench", args.points))
+        hs = load_horizontal_slice(*synthetic.write_horizontal_slice(directory, "bench", args.points))
+        output = os.path.join(directory, "out.csv")
+        latency = args.latency / 1000.0
+        failed = False
+        print("%d points, %d cores, %g ms latency" % (args.points, os.cpu_count(), args.latency))
+        print("%-22s %8s %10s %10s %9s" % ("", "workers", "seconds", "MB/s", "speedup"))
+        for name, write in writers(cs, hs):
+            serial = digest = None
+            for workers in args.workers:
+                with open(output, "w") as f:
+                    slow = SlowFile(f, latency)
+                    start = time.perf_counter()
+                    write(slow, workers, latency)
+                    seconds = time.perf_counter() - start
+                size = os.path.getsize(output)
+                serial = serial or seconds
+                digest = digest or slow.sha256.hexdigest()
+                same = slow.sha256.hexdigest() == digest
+                failed |= not same
+                print("%-22s %8d %10.2f %10.1f %8.2fx %s" % (name, workers, seconds, size / 1e6 / seconds,
+                                                            serial / seconds, "" if same else "OUTPUT DIFFERS"),
+                      flush=True)
+        sys.exit(1 if failed else 0)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
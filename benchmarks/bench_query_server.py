@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+bench_query_server.py [options] [directory ...]
+
+Load test of bin/ucvm_query_server.py.  Starts a server on a temporary Unix
+socket with the pairs in the directories (or synthetic data, see
+synthetic.py, when none are given), or uses a running one with --address,
+and sends batched point queries of random points inside each dataset:
+
+    python3 bench_query_server.py --batches 1 100 10000 --seconds 2 ../2ddata
+
+Reports requests per second, points per second and the p50 and p99
+request latency for each dataset kind, batch size and method, and writes
+them as json with --output.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import synthetic
+from ucvm_metadata.server import QueryClient
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "bin", "ucvm_query_server.py")
+
+
+def start_server(directories, socket_path, timeout=60.0):
+    """
+    :return: Popen of a query server on socket_path, once it answers
+    """
+    p = subprocess.Popen([sys.executable, SERVER, "--socket", socket_path] + directories,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if p.poll() is not None:
+            raise RuntimeError("Query server exited: " + p.stderr.read().decode(errors="replace"))
+        if os.path.exists(socket_path):
+            try:
+                QueryClient("unix:" + socket_path).datasets()
+                return p
+            except OSError:
+                pass
+        time.sleep(0.1)
+    p.kill()
+    raise RuntimeError("Query server did not start")
+
+
+def random_points(info, num_points, rng):
+    """
+    :return: (num_points, 3) lon, lat, depth array inside the extent of a dataset
+    """
+    points = np.empty((num_points, 3))
+    for column, key in enumerate(("lon", "lat", "depth")):
+        lo, hi = info[key]
+        points[:, column] = rng.uniform(lo, hi, num_points)
+    if info["kind"] == "cross_section":
+        #
+        # cross section points are placed on the path by lon, keep lat on the path too
+        points[:, 1] = np.interp(points[:, 0], info["lon"], info["lat"])
+    return points
+
+
+def run_load(client, info, batch, method, seconds, rng):
+    """
+    :return: result dict of sending batches of random points for seconds
+    """
+    latencies = []
+    # a pool of requests, so generating points is not timed
+    pool = [random_points(info, batch, rng) for _ in range(16)]
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        t = time.perf_counter()
+        client.query(info["name"], pool[len(latencies) % len(pool)], method)
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1e6
+    return {
+        "dataset": info["name"],
+        "kind": info["kind"],
+        "batch": batch,
+        "method": method,
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / elapsed,
+        "points_per_second": len(latencies) * batch / elapsed,
+        "p50_us": float(np.percentile(latencies, 50)),
+        "p99_us": float(np.percentile(latencies, 99)),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directories", nargs="*", help="directories of pairs to serve (default: synthetic data)")
+    parser.add_argument("-a", "--address", help="use a running server, http://host:port or unix:/path")
+    parser.add_argument("-b", "--batches", type=int, nargs="+", default=[1, 100, 10000],
+                        help="points per request (default: 1 100 10000)")
+    parser.add_argument("-m", "--methods", nargs="+", default=["nearest", "linear"],
+                        help="methods (default: nearest linear)")
+    parser.add_argument("-s", "--seconds", type=float, default=2.0, help="seconds per run (default: 2)")
+    parser.add_argument("-p", "--points", type=lambda s: int(float(s)), default=10 ** 6,
+                        help="points of the synthetic grids (default: 1e6)")
+    parser.add_argument("-o", "--output", help="write the results to this json file")
+    args = parser.parse_args()
+
+    workdir = None
+    server = None
+    try:
+        address = args.address
+        if address is None:
+            workdir = tempfile.mkdtemp(prefix="ucvm_query_bench_")
+            directories = args.directories
+            if not directories:
+                directories = [os.path.join(workdir, "data")]
+                os.makedirs(directories[0])
+                synthetic.write_inputs(directories[0], args.points, max_profile_points=10 ** 4)
+            socket_path = os.path.join(workdir, "query.sock")
+            server = start_server(directories, socket_path)
+            address = "unix:" + socket_path
+        client = QueryClient(address)
+        #
+        # one dataset of each kind
+        datasets = {}
+        for info in client.datasets():
+            datasets.setdefault(info["kind"], info)
+        rng = np.random.default_rng(0)
+        results = []
+        print("%-18s %-8s %7s %10s %12s %10s %10s" % ("kind", "method", "batch", "req/s", "points/s",
+                                                       "p50(us)", "p99(us)"))
+        for kind, info in sorted(datasets.items()):
+            for method in args.methods:
+                for batch in args.batches:
+                    r = run_load(client, info, batch, method, args.seconds, rng)
+                    results.append(r)
+                    print("%-18s %-8s %7d %10.0f %12.0f %10.1f %10.1f" % (
+                        kind, method, batch, r["requests_per_second"], r["points_per_second"],
+                        r["p50_us"], r["p99_us"]), flush=True)
+        client.close()
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({"address": address, "results": results}, f, indent=2)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+bench_startup.py [--budget ms] [--repeat N] [-p points]
+
+Startup check of the ucvm-meta command (bin/ucvm-meta): runs --help and
+each subcommand and format on tiny synthetic inputs (see synthetic.py)
+under python -X importtime, and adds up the import time of every module
+the run imported.  None of these paths needs pandas, so a run that
+imports it, or whose imports take longer than the budget, fails:
+
+    python3 bench_startup.py --budget 400
+
+Each path runs --repeat times and the fastest run counts, the import
+times of one run vary with the file system cache.  Prints the import time
+of each path, its slowest top level imports and exits with 1 if any path
+fails.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synthetic
+
+UCVM_META = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "bin", "ucvm-meta")
+
+# import time budget of a path in milliseconds
+BUDGET_MS = 400.0
+
+# modules the ucvm-meta paths must not import
+FORBIDDEN = ("pandas",)
+
+
+def paths(inputs, directory):
+    """
+    :param inputs: dict of input kind -> input files, from synthetic.write_inputs
+    :return: list of (name, ucvm-meta arguments) of the paths to time
+    """
+    def output(name):
+        return os.path.join(directory, name + ".csv")
+
+    found = [("--help", ["--help"]),
+             ("profile", ["profile"] + inputs["v"] + [output("v")])]
+    for command, kind in (("cross", "c"), ("slice", "h")):
+        for fmt in ("wide", "line"):
+            found.append(("%s %s" % (command, fmt),
+                          [command, "--format", fmt] + inputs[kind] + [output(command + fmt)]))
+        found.append(("%s all" % command,
+                      [command, "--format", "all"] + inputs[kind + "all"] + [output(command + "all")]))
+    return found
+
+
+def parse_importtime(stderr):
+    """
+    :return: list of (module, cumulative microseconds, depth) of the
+             -X importtime lines of a run, depth 0 for top level imports
+    """
+    found = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        found.append((name.strip(), int(cumulative), (len(name) - len(name.lstrip()) - 1) // 2))
+    return found
+
+
+def run(args):
+    """
+    :return: (total import ms, list of (module, cumulative us) of the top
+             level imports, set of the modules imported)
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", UCVM_META] + args,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError("ucvm-meta %s failed: %s" % (" ".join(args), result.stderr[-1000:]))
+    imports = parse_importtime(result.stderr)
+    top = [(name, us) for name, us, depth in imports if depth == 0]
+    return sum(us for _, us in top) / 1000.0, top, {name for name, _, _ in imports}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=BUDGET_MS,
+                        help="import time budget of each path in ms (default: %g)" % BUDGET_MS)
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each path (default: 5)")
+    parser.add_argument("-p", "--points", type=lambda s: int(float(s)), default=1000,
+                        help="points of the synthetic inputs (default: 1000)")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="ucvm_startup_bench_")
+    try:
+        inputs = synthetic.write_inputs(directory, args.points)
+        failed = False
+        print("%-12s %10s  %-8s %s" % ("path", "import ms", "result", "slowest imports (ms)"))
+        for name, argv in paths(inputs, directory):
+            best = None
+            for _ in range(args.repeat):
+                ms, top, modules = run(argv)
+                if best is None or ms < best[0]:
+                    best = ms, top, modules
+            ms, top, modules = best
+            problems = ["imports " + m for m in FORBIDDEN if m in modules]
+            if ms > args.budget:
+                problems.append("over %g ms" % args.budget)
+            failed |= bool(problems)
+            slowest = sorted(top, key=lambda item: -item[1])[:3]
+            print("%-12s %10.1f  %-8s %s" % (name, ms, "; ".join(problems) or "ok",
+                                             ", ".join("%s %.0f" % (m, us / 1000.0) for m, us in slowest)),
+                  flush=True)
+        sys.exit(1 if failed else 0)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+bench_wide_memory.py [-n size]
+
+Measures the peak memory (python/numpy allocations, through tracemalloc)
+and time of building the wide table of a synthetic n x n horizontal slice:
+
+    columns     the original converter, one DataFrame column assigned per
+                lon from a python list, 0.0 replaced point by point
+    frame       horizontal_slice_frame, one 2D array masked in one
+                operation and wrapped by a single DataFrame constructor
+    csv         convert_horizontal_slice, the wide CSV converter, which
+                streams blocks of rows without a DataFrame
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from ucvm_metadata.converters import convert_horizontal_slice
+from ucvm_metadata.loader import horizontal_slice_frame, load_horizontal_slice
+
+
+def write_slice(directory, size, seed=0):
+    """
+    :return: (data file, meta file) of a synthetic size x size horizontal slice
+    """
+    rng = np.random.default_rng(seed)
+    grid = rng.uniform(100.0, 8000.0, (size, size)).astype(np.float32)
+    grid[rng.random(grid.shape) < 0.1] = 0.0
+    lats = [round(34.0 + 0.001 * i, 3) for i in range(size)]
+    lons = [round(-119.0 + 0.001 * j, 3) for j in range(size)]
+    meta = {"lat1": str(lats[0]), "lon1": str(lons[0]), "lat2": str(lats[-1]), "lon2": str(lons[-1]),
+            "depth": "0", "spacing": "0.001", "cvm": "synthetic", "data_type": "vs", "title": "bench",
+            "datapoints": size * size, "num_x": size, "num_y": size,
+            "max": float(grid.max()), "min": float(grid.min()), "mean": float(grid.mean()),
+            "lat_list": lats, "lon_list": lons}
+    data_file = os.path.join(directory, "bench_h_data.bin")
+    meta_file = os.path.join(directory, "bench_h_meta.json")
+    with open(data_file, "wb") as f:
+        np.save(f, grid)
+    with open(meta_file, "w") as f:
+        json.dump(meta, f)
+    return data_file, meta_file
+
+
+def build_columns(data_file, meta_file):
+    import pandas as pd
+
+    hs = load_horizontal_slice(data_file, meta_file, mmap_mode=None)
+    datalist = hs.data.tolist()
+    df = pd.DataFrame({"Lats": hs.meta["lat_list"]})
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for j, lon in enumerate(hs.meta["lon_list"]):
+            vals = []
+            for i in range(len(hs.meta["lat_list"])):
+                v = datalist[i][j]
+                vals.append(np.nan if v == 0.0 else v)
+            df[str(lon)] = vals
+    return df
+
+
+def build_frame(data_file, meta_file):
+    return horizontal_slice_frame(load_horizontal_slice(data_file, meta_file))
+
+
+def write_csv(data_file, meta_file):
+    return convert_horizontal_slice(data_file, meta_file, data_file.replace(".bin", ".csv"))
+
+
+def measure(fn, *args):
+    """
+    :return: (seconds, peak MB allocated while fn ran)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return seconds, peak / 1e6
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--size", type=int, default=1000, help="slice is n x n points (default: 1000)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file, meta_file = write_slice(tmp, args.size)
+        print("%d x %d slice, grid %.1f MB" % (args.size, args.size, os.path.getsize(data_file) / 1e6))
+        for name, fn in [("columns", build_columns), ("frame", build_frame), ("csv", write_csv)]:
+            seconds, peak = measure(fn, data_file, meta_file)
+            print("%-8s %8.2fs  peak %8.1f MB" % (name, seconds, peak))
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+synthetic.py directory points [--max-profile-points N]
+
+Synthetic UCVM plotting outputs for the benchmarks, with the metadata keys
+of the examples in 1ddata/ and 2ddata/ and the coordinate lists laid out
+the way UCVM plotting writes them.  Grids are written a block of rows at
+a time into a memory mapped .npy file, so even 10^8 point grids are
+generated in bounded memory.
+
+Values look like a velocity model: increasing with depth, with noise.
+Horizontal slices have 0.0 (outside the model) points and cross sections
+have -1 (above the surface) points, like the real files.
+
+Run as a script it writes a full set of inputs for the seven converters
+into a directory and prints the file names as json.
+"""
+import argparse
+import json
+import math
+import os
+
+import numpy as np
+
+# properties written for the _all converters
+PROPERTIES = ("vp", "vs", "density")
+
+# points generated per block of rows
+BLOCK_POINTS = 1 << 22
+
+# fraction of points without data
+NODATA_FRACTION = 0.05
+
+
+def _value(prop, depth, noise):
+    """
+    :return: float32 values of a property at depths (m)
+    """
+    vs = 300.0 + 3500.0 * (1.0 - np.exp(-depth / 8000.0)) + noise
+    if prop == "vs":
+        return vs.astype(np.float32)
+    vp = 1.73 * vs + 600.0
+    if prop == "vp":
+        return vp.astype(np.float32)
+    return (1700.0 + 0.2 * vp).astype(np.float32)
+
+
+def _write_grid(data_file, num_rows, num_cols, rows_fn, seed):
+    """
+    Write a float32 .npy grid, rows_fn(rng, start, stop) returns the rows start:stop.
+    """
+    rng = np.random.default_rng(seed)
+    grid = np.lib.format.open_memmap(data_file, mode="w+", dtype=np.float32, shape=(num_rows, num_cols))
+    step = max(1, BLOCK_POINTS // max(1, num_cols))
+    for start in range(0, num_rows, step):
+        stop = min(start + step, num_rows)
+        grid[start:stop] = rows_fn(rng, start, stop)
+    grid.flush()
+    del grid
+
+
+def _stats(data_file, nodata):
+    grid = np.load(data_file, mmap_mode="r")
+    lo, hi, total, count = np.inf, -np.inf, 0.0, 0
+    step = max(1, BLOCK_POINTS // max(1, grid.shape[1]))
+    for start in range(0, grid.shape[0], step):
+        block = np.asarray(grid[start:start + step])
+        block = block[block != nodata]
+        if block.size:
+            lo = min(lo, float(block.min()))
+            hi = max(hi, float(block.max()))
+            total += float(block.sum(dtype=np.float64))
+            count += block.size
+    return {"min": lo if count else 0.0, "max": hi if count else 0.0, "mean": total / count if count else 0.0}
+
+
+def _write_json(filename, obj):
+    with open(filename, "w") as f:
+        json.dump(obj, f)
+
+
+def horizontal_slice_shape(num_points):
+    """
+    :return: (num_lat, num_lon) of a slice with about num_points points
+    """
+    num_lat = max(1, int(math.sqrt(num_points * 0.75)))
+    return num_lat, max(1, num_points // num_lat)
+
+
+def cross_section_shape(num_points):
+    """
+    :return: (num_depth, num_horizontal) of a cross section with about num_points points
+    """
+    num_depth = max(2, int(math.sqrt(num_points / 1.6)))
+    return num_depth, max(1, num_points // num_depth)
+
+
+def write_horizontal_slice(directory, name, num_points, prop="vs", seed=0):
+    """
+    :return: (data file, meta file) of a synthetic horizontal slice
+    """
+    num_lat, num_lon = horizontal_slice_shape(num_points)
+    spacing = 0.004
+    lat1, lon1 = 34.3185, -118.114
+    lat2, lon2 = lat1 + spacing * num_lat, lon1 + spacing * num_lon
+    depth = 1000.0
+
+    def rows(rng, start, stop):
+        noise = rng.normal(0.0, 150.0, (stop - start, num_lon))
+        block = _value(prop, depth, noise)
+        block[rng.random(block.shape) < NODATA_FRACTION] = 0.0
+        return block
+
+    data_file = os.path.join(directory, name + "_h_data.bin")
+    meta_file = os.path.join(directory, name + "_h_meta.json")
+    _write_grid(data_file, num_lat, num_lon, rows, seed)
+    meta = {
+        "num_y": num_lat + 1, "lat1": str(lat1), "data_type": prop, "lat2": str(round(lat2, 4)),
+        "color": "sd", "title": "synthetic Horizontal Slice at %dm" % depth, "spacing": str(spacing),
+        "configfile": "../model/UCVM_TARGET/conf/ucvm.conf",
+        "lon_list": np.linspace(lon1, lon2 - spacing, num_lon).tolist(),
+        "num_x": num_lon + 1, "outfile": "../result/%s_h.png" % name, "depth": str(int(depth)),
+        "cvm": "synthetic", "datapoints": num_lat * num_lon, "lon1": str(lon1),
+        "lat_list": np.linspace(lat1, lat2 - spacing, num_lat).tolist(),
+        "lon2": str(round(lon2, 4)), "installdir": "../model/UCVM_TARGET",
+    }
+    meta.update(_stats(data_file, 0.0))
+    _write_json(meta_file, meta)
+    return data_file, meta_file
+
+
+def write_cross_section(directory, name, num_points, prop="vs", seed=0):
+    """
+    :return: (data file, meta file) of a synthetic cross section
+    """
+    num_depth, num_horizontal = cross_section_shape(num_points)
+    vertical_spacing = 50
+    depths = np.arange(num_depth, dtype=np.float64) * vertical_spacing
+    lat1, lon1, lat2, lon2 = 35.4002, -118.3557, 35.3106, -117.1472
+    #
+    # the surface is a few points deep at some horizontal points
+    surface = np.random.default_rng(seed + 1).integers(0, 3, num_horizontal)
+
+    def rows(rng, start, stop):
+        noise = rng.normal(0.0, 100.0, (stop - start, num_horizontal))
+        block = _value(prop, depths[start:stop, None], noise)
+        block[np.arange(start, stop)[:, None] < surface[None, :]] = -1.0
+        return block
+
+    data_file = os.path.join(directory, name + "_c_data.bin")
+    meta_file = os.path.join(directory, name + "_c_meta.json")
+    _write_grid(data_file, num_depth, num_horizontal, rows, seed)
+    meta = {
+        "depth_list": depths.tolist(), "color": "sd", "horizontal_spacing": "674",
+        "configfile": "../model/UCVM_TARGET/conf/ucvm.conf", "datapoints": num_depth * num_horizontal,
+        "starting_depth": "0", "installdir": "../model/UCVM_TARGET",
+        "title": "synthetic Cross Section from (%.2f, %.2f) to (%.2f, %.2f)" % (lon1, lat1, lon2, lat2),
+        "vertical_spacing": str(vertical_spacing), "data_type": prop, "outfile": "../result/%s_c.png" % name,
+        "lat1": str(lat1), "ending_depth": str(int(depths[-1])), "lat2": str(lat2),
+        "lon_list": np.round(np.linspace(lon1, lon2, num_horizontal), 5).tolist(),
+        "num_x": num_horizontal, "num_y": num_depth, "cvm": "synthetic", "lon1": str(lon1),
+        "lat_list": np.round(np.linspace(lat1, lat2, num_horizontal), 5).tolist(), "lon2": str(lon2),
+    }
+    meta.update(_stats(data_file, -1.0))
+    _write_json(meta_file, meta)
+    return data_file, meta_file
+
+
+def write_vertical_profile(directory, name, num_points, seed=0):
+    """
+    :return: (matprops file, meta file) of a synthetic vertical profile
+    """
+    vertical_spacing = 100
+    depths = np.arange(num_points, dtype=np.float64) * vertical_spacing
+    noise = np.random.default_rng(seed).normal(0.0, 50.0, num_points)
+    values = {prop: np.round(_value(prop, depths, noise).astype(np.float64), 3).tolist() for prop in PROPERTIES}
+    matprops_file = os.path.join(directory, name + "_v_matprops.json")
+    meta_file = os.path.join(directory, name + "_v_meta.json")
+    _write_json(matprops_file, {"matprops": [{"vp": vp, "vs": vs, "density": density} for vp, vs, density
+                                             in zip(values["vp"], values["vs"], values["density"])]})
+    _write_json(meta_file, {
+        "comment": "synthetic", "lat1": "33.6261", "data_type": "vs,vp,density",
+        "ending_depth": str(int(depths[-1])) if num_points else "0", "installdir": "../model/UCVM_TARGET",
+        "depth": depths.tolist(), "outfile": "../result/%s_v.png" % name,
+        "configfile": "../model/UCVM_TARGET/conf/ucvm.conf", "cvm": "synthetic", "lon1": "-116.1694",
+        "vertical_spacing": str(vertical_spacing), "starting_depth": "0",
+    })
+    return matprops_file, meta_file
+
+
+def write_all(directory, kind, num_points, seed=0):
+    """
+    Write a vp, vs and density grid of the same points, for the _all converters.
+
+    :param kind: "c" for cross sections, "h" for horizontal slices
+    :return: list of (data file, meta file), in vp, vs, density order
+    """
+    write = write_cross_section if kind == "c" else write_horizontal_slice
+    return [write(directory, prop, num_points, prop, seed) for prop in PROPERTIES]
+
+
+def write_inputs(directory, num_points, max_profile_points=10 ** 6, seed=0):
+    """
+    Write the inputs of all seven converters.
+
+    :return: dict of input kind -> list of input file names, c and h are a
+             vs cross section and slice, call and hall the vp, vs, density
+             files of the _all converters, v a vertical profile
+    """
+    inputs = {}
+    for kind in ("c", "h"):
+        files = write_all(directory, kind, num_points, seed)
+        inputs[kind + "all"] = [name for pair in files for name in pair]
+        inputs[kind] = list(files[PROPERTIES.index("vs")])
+    inputs["v"] = list(write_vertical_profile(directory, "profile", min(num_points, max_profile_points), seed))
+    return inputs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="directory to write the files to")
+    parser.add_argument("points", type=lambda s: int(float(s)), help="points per grid, e.g. 1e6")
+    parser.add_argument("--max-profile-points", type=lambda s: int(float(s)), default=10 ** 6,
+                        help="largest vertical profile (default: 1e6)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    args = parser.parse_args()
+    os.makedirs(args.directory, exist_ok=True)
+    print(json.dumps(write_inputs(args.directory, args.points, args.max_profile_points, args.seed)))
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+ucvm_batch2csv.py [options] directory
+
+This script converts every UCVM plotting data/metadata pair found in a
+directory to CSV files, using a pool of worker processes.  Pairs are found
+by file name:
+
+    <name>_c_data.bin     <name>_c_meta.json     cross section
+    <name>_h_data.bin     <name>_h_meta.json     horizontal slice
+    <name>_v_matprops.json <name>_v_meta.json    vertical profile
+
+and prints a summary of successes, failures and throughput.
+
+With --cache a manifest of the input hashes and options of every output
+is kept, and pairs whose output is up to date are skipped, see
+ucvm_metadata/cache.py.
+
+With --shard K/N only shard K of N of the pairs is converted, split by
+input bytes, for the tasks of a cluster job array.  Each task writes a
+result manifest of its shard, which ucvm_batch_merge.py combines, see
+ucvm_metadata/jobarray.py.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from ucvm_metadata import batch, cache, jobarray
+from ucvm_metadata.cli import shard_spec
+from ucvm_metadata.shards import shard_file
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert a directory of UCVM plotting outputs to CSV files.")
+    parser.add_argument("directory", help="directory containing the data and metadata files")
+    parser.add_argument("-r", "--recursive", action="store_true", help="also search sub directories")
+    parser.add_argument("-f", "--format", choices=batch.FORMATS, default="wide",
+                        help="cross section and horizontal slice output format, parquet, arrow and npz "
+                             "write the line format as a columnar binary file (default: wide)")
+    parser.add_argument("-o", "--output-dir", help="write the CSV files here instead of next to the data files")
+    parser.add_argument("-z", "--compress", choices=("gz", "bz2", "xz"), help="compress the CSV files")
+    parser.add_argument("-j", "--jobs", type=int, help="number of worker processes (default: available cores)")
+    parser.add_argument("-s", "--summary", help="also write the summary to this json file")
+    parser.add_argument("--cache", action="store_true",
+                        help="only convert pairs that changed since the last --cache run")
+    parser.add_argument("--manifest", help="manifest file of --cache, implies --cache "
+                                           "(default: %s in the output directory)" % cache.MANIFEST_NAME)
+    parser.add_argument("--rehash", action="store_true",
+                        help="hash every input, not only the ones with a new size or modification time")
+    parser.add_argument("--clean", action="store_true",
+                        help="remove outputs in the manifest of pairs in this directory that no pair writes "
+                             "any more, implies --cache")
+    parser.add_argument("--shard", type=shard_spec, metavar="K/N",
+                        help="only convert shard K of N of the pairs, K from 0 to N-1, like "
+                             "$SLURM_ARRAY_TASK_ID/N in a job array")
+    parser.add_argument("--results", help="result manifest of --shard "
+                                          "(default: ucvm_batch_results-K-of-N.json in the output directory)")
+    args = parser.parse_args()
+    if args.shard and args.clean:
+        parser.error("--clean would remove the outputs of the other shards, run it without --shard")
+
+    jobs, unpaired = batch.discover(args.directory, args.recursive)
+    print("Found %d pairs in %s" % (len(jobs), args.directory))
+
+    shard_results = None
+    if args.shard:
+        index, count = args.shard
+        shards = jobarray.partition(jobs, count)
+        jobs = [job for job, _ in shards[index]]
+        print("Shard %d of %d: %d pairs, %d bytes" % (index, count, len(jobs),
+                                                      sum(size for _, size in shards[index])))
+        shard_results_name = args.results or jobarray.results_file(args.directory, index, count, args.output_dir)
+        shard_results = jobarray.start_results(index, shards, args.directory, args.recursive, args.format,
+                                               args.compress, args.output_dir)
+        os.makedirs(os.path.dirname(os.path.abspath(shard_results_name)), exist_ok=True)
+        cache.save_manifest(shard_results_name, shard_results)
+
+    manifest = None
+    up_to_date = []
+    inputs = {}
+    if args.cache or args.manifest or args.clean:
+        manifest_name = args.manifest or cache.manifest_file(args.directory, args.output_dir)
+        if args.shard and not args.manifest:
+            #
+            # one cache manifest per shard, the tasks run at the same time
+            manifest_name = shard_file(manifest_name, *args.shard)
+        manifest_dir = os.path.dirname(os.path.abspath(manifest_name))
+        manifest = cache.load_manifest(manifest_name)
+        stale, up_to_date = cache.check_jobs(jobs, manifest, manifest_dir, args.format, args.output_dir,
+                                             args.compress, args.rehash)
+        inputs = dict(stale)
+        jobs = [job for job, _ in stale]
+        if shard_results is not None:
+            shard_results["up_to_date"] = [job.data_file for job in up_to_date]
+
+    def progress(result):
+        print("%s %s" % ("OK    " if result.ok else "FAILED", result.job.data_file))
+        if shard_results is not None:
+            jobarray.add_result(shard_results, result)
+            cache.save_manifest(shard_results_name, shard_results)
+
+    start = time.perf_counter()
+    results = batch.run(jobs, args.format, args.output_dir, args.jobs, progress, args.compress)
+    if manifest is not None:
+        for result in results:
+            cache.record(manifest, manifest_dir, result, inputs[result.job], args.format, args.compress)
+        if args.clean:
+            orphans = cache.orphans(manifest, manifest_dir, jobs + up_to_date, args.directory, args.recursive,
+                                    args.format, args.output_dir, args.compress)
+            for filename in cache.clean(manifest, manifest_dir, orphans):
+                print("REMOVED %s" % filename)
+        os.makedirs(manifest_dir, exist_ok=True)
+        cache.save_manifest(manifest_name, manifest)
+    if shard_results is not None:
+        shard_results["complete"] = True
+        cache.save_manifest(shard_results_name, shard_results)
+    summary = batch.summarize(results, time.perf_counter() - start, unpaired, up_to_date)
+    print(batch.format_summary(summary))
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+    sys.exit(1 if summary["failed"] else 0)
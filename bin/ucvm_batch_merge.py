@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+ucvm_batch_merge.py [-s summary.json] results [results ...]
+
+This script combines the result manifests written by the tasks of a job
+array running ucvm_batch2csv.py --shard K/N (see ucvm_metadata/jobarray.py):
+
+    ucvm_batch_merge.py csv/ucvm_batch_results-*-of-00100.json
+
+and reports the shards without a result manifest, the tasks that did not
+finish, the pairs that were not converted and the pairs that failed.  The
+pairs of a missing shard are found by discovering the input directory
+again.  Exits with 1 when any pair was not converted or failed, so a
+dependent job can resubmit the array.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from ucvm_metadata import jobarray
+from ucvm_metadata.metadata import MetadataError
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("results", nargs="+", help="result manifests of the shards of one run")
+    parser.add_argument("-s", "--summary", help="also write the merged report to this json file")
+    args = parser.parse_args()
+
+    try:
+        merged = jobarray.merge([jobarray.load_results(filename) for filename in args.results])
+    except MetadataError as e:
+        print("FAILED:", *e.args)
+        sys.exit(1)
+    except (ValueError, OSError) as e:
+        print("FAILED: %s" % e)
+        sys.exit(1)
+    print(jobarray.format_merge(merged))
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(merged, f, indent=2)
+    sys.exit(1 if merged["missing_shards"] or merged["not_converted"] or merged["failed"] else 0)
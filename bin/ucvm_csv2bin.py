@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+ucvm_csv2bin.py [-o prefix] [--force] csv_file [csv_file ...]
+
+This script reads cross section and horizontal slice CSV files written by
+the converters (wide, _line and _all formats, optionally compressed) back
+into UCVM plotting data and metadata files (see ucvm_metadata/csvreader.py):
+
+    UCVM_71396357_c_data.csv    ->  UCVM_71396357_csv2bin_c_data.bin, UCVM_71396357_csv2bin_c_meta.json
+    cross_all.csv               ->  cross_all_csv2bin_vp_c_data.bin, cross_all_csv2bin_vp_c_meta.json,
+                                    ...vs..., ...density...
+
+The default names keep the pair the CSV was converted from, existing
+files are only overwritten with --force.  Long format values come back
+exactly, wide format values with the decimals they were written with.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from ucvm_metadata.csvreader import read_csv
+from ucvm_metadata.metadata import MetadataError
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv_files", nargs="+", help="CSV files written by the converters")
+    parser.add_argument("-o", "--output", help="output prefix, only with one CSV file "
+                                               "(default: the CSV name without _c_data.csv or _h_data.csv, "
+                                               "with _csv2bin)")
+    parser.add_argument("--force", action="store_true", help="overwrite existing data and meta files")
+    args = parser.parse_args()
+    if args.output and len(args.csv_files) > 1:
+        parser.error("--output takes a single CSV file")
+
+    failed = 0
+    for csv_file in args.csv_files:
+        try:
+            files = read_csv(csv_file, args.output, force=args.force)
+        except (MetadataError, ValueError, OSError) as e:
+            print("FAILED: %s" % csv_file, *e.args)
+            failed += 1
+            continue
+        for data_file, meta_file in files:
+            print("Wrote %s %s" % (data_file, meta_file))
+    sys.exit(1 if failed else 0)
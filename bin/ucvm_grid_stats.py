@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+ucvm_grid_stats.py [options] data.bin meta.json
+
+This script computes the statistics of a cross section or horizontal slice
+data file in one pass over the memory mapped grid: min, max, mean, std,
+NoData and nan counts, percentiles and a histogram, for the whole grid and
+for each depth (cross sections) or lat (horizontal slices).  It checks the
+min, max, mean and point counts of the metadata file against the data,
+prints a summary and exits with 1 when they do not match.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from ucvm_metadata import stats
+from ucvm_metadata.gridio import load_grid
+from ucvm_metadata.metadata import read_metadata
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data_file", help="c_data.bin or h_data.bin")
+    parser.add_argument("meta_file", help="c_meta.json or h_meta.json")
+    parser.add_argument("-o", "--output", help="write the report, with the per row statistics, to this json file")
+    parser.add_argument("-b", "--bins", type=int, default=stats.HISTOGRAM_BINS,
+                        help="number of histogram bins (default: %d)" % stats.HISTOGRAM_BINS)
+    parser.add_argument("-p", "--percentiles", type=float, nargs="+", default=list(stats.PERCENTILES),
+                        help="percentiles to compute (default: %s)" % " ".join(map(str, stats.PERCENTILES)))
+    parser.add_argument("-t", "--tolerance", type=float, default=stats.TOLERANCE,
+                        help="relative difference allowed between metadata and data (default: %g)"
+                             % stats.TOLERANCE)
+    args = parser.parse_args()
+
+    report = stats.grid_stats(read_metadata(args.meta_file), load_grid(args.data_file),
+                              [p if p % 1 else int(p) for p in args.percentiles], args.bins,
+                              args.tolerance, rows=args.output is not None)
+    print(stats.format_report(report))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f)
+    sys.exit(1 if report["mismatches"] else 0)
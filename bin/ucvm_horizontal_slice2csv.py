@@ -6,25 +6,13 @@ This script inputs the metadata (json) and data (bin) files produced from the UC
 when doing a horizontal slice plot. This then outputs the panda data frame to a csv file format.
 
 """
-import pandas as pd
-import json
+import os
 import sys
-import numpy as np
-import pdb
 
-# import raw floats array data from the external file into
-# numpy array
-def import_np_float_array(num_x, num_y):
-    global fh
-    try:
-        fh = open(input_data_file, 'rb')
-    except:
-        print("ERROR: binary np float array data does not exist.")
-        exit(1)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from ucvm_metadata.cli import converter_parser, profiler_from_args, run_converter
+from ucvm_metadata.converters import convert_horizontal_slice
 
-    floats = np.load(fh)
-    fh.close()
-    return floats
 
 if __name__ == '__main__':
     """
@@ -57,149 +45,15 @@ Lats,-126.4,-126.39,...
  
     """
 
-    if len(sys.argv) != 3:
-        raise ValueError("Please provide arguments: ucvm_horizontal_slice2csv.py h_data.bin h_meta.json.\n"
-                         "e.g. ./ucvm_horizontal_slice2csv.py h_data.bin h_meta.json")
-
-    input_data_file = sys.argv[1]
-    input_metadata_file = sys.argv[2]
-    with open(input_metadata_file) as json_data:
-        obj = json.load(json_data)
-
-    #
-    # The return values here are
-    """
-    ['num_y', 'lat1', 'data_type', 'lat2', 'color', 'max',
-     'title', 'spacing', 'configfile', 'lon_list', 'num_x',
-     'outfile', 'depth', 'cvm', 'min', 'datapoints', 'lon1',
-     'lat_list', 'lon2', 'installdir', 'mean']
-    """
-    depth = obj["depth"]
-    latlist = obj["lat_list"]
-    lonlist = obj["lon_list"]
-    npts = obj["datapoints"]
-    num_x = obj["num_x"]
-    num_y = obj["num_y"]
-
-## remove when ucvm_plotting is fixed
-#    lat2 = obj["lat2"]
-#    lon2 = obj["lon2"]
-#    if(len(latlist) != num_x ):
-#      latlist.append(lat2)
-#    if(len(lonlist) != num_y ):
-#      lonlist.append(lon2)
-
-    #
-    total_pts = len(lonlist) * len(latlist)
-    datalist = import_np_float_array(len(lonlist), len(latlist))
-    # Use shape to return the dimensions of the np array that is returned
-    # We assume it is 2D array
-    datasizes = datalist.shape
-    if npts != (datasizes[0] * datasizes[1]) :
-        raise Exception("Number of depth points does not each number of 1ddata points. Exiting", npts, datasizes[0] * datasizes[1])
-    #
-    # Combine the
-    mystrlist = []
-    for i in range(len(lonlist)):
-        mystr = str(lonlist[i])
-        mystrlist.append(mystr)
-
-
-    if len(mystrlist) * len(latlist) != npts:
-        print("Error: Total points should equal the number of lats times the number of lons",
-              len(mystrlist) * len(latlist),npts)
-        sys.exit(0)
-
-    #
-    # Find properties type
-    proptype = obj["data_type"]
-    if proptype == "vp":
-        propstr = "Vp(m/s)"
-    elif proptype == "vs":
-        propstr = "Vs(m/s)"
-    elif proptype == "density":
-        propstr = "Density(kg/m^3)"
-    elif proptype == "poisson":
-        propstr = "PoissionRatio"
-    else:
-        raise Exception("Unknown propertype type error type:",proptype)
-
-    dlist = []
-    # Create a dataframe with one columen of Lat values
-    for idx in range(len(latlist)):
-        dlist.append(latlist[idx])
-
-    #Convert it to dataframe
-    df = pd.DataFrame(dlist,columns=["Lats"])
-
-
-    # Add each lonlist point as a column. 
-    for indx in range(len(lonlist)):
-        colstr = mystrlist[indx]
-        vals = []
-        for d in range(len(latlist)):
-            v=datalist[d][indx]
-            if(v == 0.0):
-              vals.append(np.nan)
-            else:     
-              vals.append(datalist[d][indx])
-        df[colstr] = vals
-
-    #
-    # Create output file name
-    # Example filename: input_data_file = "cross-cvmsi_meta.json"
-    # cross-cvmsi_data.bin cross-cvmsi_meta.json
-    output_file_name = input_data_file.replace(".bin",".csv")
-    print("\nWriting CSV file: ", output_file_name)
-    f = open(output_file_name, "w")
-
-    """
-  ['num_y', 'lat1', 'data_type', 'lat2', 'color', 'max',
-   'title', 'spacing', 'configfile', 'lon_list', 'num_x',
-   'outfile', 'depth', 'cvm', 'min', 'datapoints', 'lon1',
-   'lat_list', 'lon2', 'installdir', 'mean']
-    """
-
-    header_str = '''\
-# Title: {9}
-# CVM(abbr): {2}
-# Data_type: {3}
-# Depth(m): {4} 
-# Spacing(degree): {5}
-# Lon_pts: {6} 
-# Lat_pts: {7} 
-# Total_pts: {8}
-# Min_v: {10}
-# Max_v: {11}
-# Mean_v: {12}
-# Lat1: {13}
-# Lon1: {14}
-# Lat2: {15}
-# Lon2: {16}
-'''.format(
-                input_data_file,
-                input_metadata_file,
-                obj["cvm"],
-                obj["data_type"],
-                obj["depth"],
-                obj["spacing"],
-                len(lonlist),
-                len(latlist),
-                npts,
-                obj["title"],
-                obj["min"],
-                obj["max"],
-                obj["mean"],
-                obj["lat1"],
-                obj["lon1"],
-                obj["lat2"],
-                obj["lon2"]
-                )
-
-    print(header_str)
-    f.write(header_str)
-    df.to_csv(f, float_format='{:5.4f}'.format, index=False, mode="a")
-    # This version will remove the column name headers
-    #  df.to_csv(f, header=False,float_format='{:5.4f}'.format, index=False, mode="a")
-    f.close()
+    parser = converter_parser(__doc__, [("data_file", "h_data.bin"),
+                                        ("meta_file", "h_meta.json")], wide=True, bbox=True, thin=True, pipeline=True,
+                              shards=True)
+    args = parser.parse_args()
+
+    run_converter(convert_horizontal_slice, [args.data_file, args.meta_file], args.output_file, args,
+                  verbose=True, compress_threads=args.compress_threads,
+                  decimals=args.decimals, significant=args.significant,
+                  profiler=profiler_from_args(args),
+                  bbox=args.bbox, decimate=args.decimate, block_mean=args.block_mean,
+                  workers=args.pipeline_workers)
     sys.exit(True)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+ucvm_horizontal_slice2csv_multi.py [options] data meta [data meta ...] output_file
+ucvm_horizontal_slice2csv_multi.py [options] --glob PATTERN output_file
+
+This script takes any number of metadata (json) and binary data (bin) file pairs of
+the same horizontal slice produced from the UCVM plotting routines, one per property
+(vp, vs, density, poisson), and outputs them to one csv file format.
+
+lon lat prop prop ...
+
+The properties are named by the data_type of each metadata file, and the
+lat, lon and depth points of all the pairs have to be the same.
+
+    python3 ucvm_horizontal_slice2csv_multi.py --glob '2ddata/la_*_h_meta.json' la_all.csv
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from ucvm_metadata.cli import (add_converter_options, add_multi_arguments, multi_pairs, profiler_from_args,
+                              run_converter)
+from ucvm_metadata.converters import convert_horizontal_slice_multi
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_multi_arguments(parser, "h")
+    add_converter_options(parser, bbox=True, thin=True, pipeline=True, skip_nodata=True, shards=True)
+    args = parser.parse_args()
+    pairs, output_file = multi_pairs(parser, args, "h")
+
+    run_converter(convert_horizontal_slice_multi, [pairs], output_file, args,
+                  verbose=True, compress_threads=args.compress_threads,
+                  profiler=profiler_from_args(args),
+                  bbox=args.bbox, decimate=args.decimate, block_mean=args.block_mean,
+                  workers=args.pipeline_workers,
+                  skip_nodata=args.skip_nodata, nodata_policy=args.nodata_policy)
+    sys.exit(True)
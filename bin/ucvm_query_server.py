@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+ucvm_query_server.py [options] directory [directory ...]
+
+This script loads every UCVM plotting data/metadata pair found in the
+directories (named like ucvm_batch2csv.py expects them) and answers point
+queries on them over HTTP, on a localhost port or a Unix socket, until it
+is interrupted.  Each dataset is named by the title of its metadata, see
+ucvm_metadata/server.py for the requests:
+
+    curl localhost:8765/datasets
+    curl -d '{"dataset": "...", "points": [[-118.0, 35.38, 1000]], "method": "linear"}' localhost:8765/query
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from ucvm_metadata import batch
+from ucvm_metadata.query import load_datasets
+from ucvm_metadata.server import DEFAULT_PORT, make_server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directories", nargs="+", help="directories containing the data and metadata files")
+    parser.add_argument("-r", "--recursive", action="store_true", help="also search sub directories")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on (default: %d)"
+                                                                          % DEFAULT_PORT)
+    parser.add_argument("--socket", help="listen on this Unix socket instead of a port")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    jobs = []
+    for directory in args.directories:
+        jobs += batch.discover(directory, args.recursive)[0]
+    datasets, failed = load_datasets(jobs)
+    for job, error in failed:
+        print("FAILED: %s %s" % (job.data_file, error))
+    for dataset in datasets:
+        print("Loaded %s: %s" % (dataset.kind, dataset.name))
+    if not datasets:
+        sys.exit(1)
+
+    server = make_server(datasets, args.host, args.port, args.socket, args.verbose)
+    print("Serving %d datasets on %s" % (len(datasets), "unix:" + args.socket if args.socket
+                                         else "http://%s:%d" % (args.host, args.port)), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
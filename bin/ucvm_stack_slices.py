@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+ucvm_stack_slices.py [options] volume_dir input [input ...]
+
+This script stacks UCVM horizontal slices of the same region at different
+depths into a chunked 3D volume (see ucvm_metadata/volume.py), sorted by
+depth.  Inputs are directories, searched for _h_data.bin/_h_meta.json
+pairs, or _h_meta.json files of single slices.  The slices must have the
+same data type and the same lat and lon lists.  The volume directory has
+to be empty, --force replaces the volume in it.
+
+    python3 ucvm_stack_slices.py --chunks 8,128,128 la_vs ../depths/
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from ucvm_metadata import batch
+from ucvm_metadata.loader import load_horizontal_slice
+from ucvm_metadata.metadata import MetadataError
+from ucvm_metadata.volume import CHUNKS, write_volume
+
+
+def chunk_shape(text):
+    """
+    :return: (depth, lat, lon) tuple of a D,R,C chunk shape
+    """
+    try:
+        shape = tuple(int(v) for v in text.split(","))
+    except ValueError:
+        shape = ()
+    if len(shape) != 3 or min(shape) < 1:
+        raise argparse.ArgumentTypeError("expected 3 positive integers D,R,C, got %r" % text)
+    return shape
+
+
+def find_pairs(inputs, recursive):
+    """
+    :return: list of (data file, meta file) of the horizontal slices in the inputs
+    """
+    pairs = []
+    for name in inputs:
+        if os.path.isdir(name):
+            jobs, _ = batch.discover(name, recursive)
+            pairs += [(job.data_file, job.meta_file) for job in jobs if job.kind == "h"]
+        elif name.endswith("_h_meta.json"):
+            pairs.append((name[:-len("meta.json")] + "data.bin", name))
+        else:
+            raise SystemExit("Not a directory or _h_meta.json file: " + name)
+    return pairs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("volume_dir", help="directory to write the volume to")
+    parser.add_argument("inputs", nargs="+", help="directories of horizontal slices or _h_meta.json files")
+    parser.add_argument("-r", "--recursive", action="store_true", help="also search sub directories")
+    parser.add_argument("--force", action="store_true",
+                        help="replace the volume in a volume directory that is not empty")
+    parser.add_argument("-c", "--chunks", type=chunk_shape, default=CHUNKS,
+                        help="depth,lat,lon points per chunk (default: %s)" % ",".join(map(str, CHUNKS)))
+    args = parser.parse_args()
+
+    pairs = find_pairs(args.inputs, args.recursive)
+    if not pairs:
+        print("No horizontal slices found")
+        sys.exit(1)
+    try:
+        slices = [load_horizontal_slice(data_file, meta_file) for data_file, meta_file in pairs]
+        index = write_volume(args.volume_dir, slices, args.chunks, force=args.force,
+                             progress=lambda done, total: print("Stacked %d of %d depths" % (done, total),
+                                                                flush=True))
+    except (MetadataError, OSError) as e:
+        print("FAILED:", *e.args)
+        sys.exit(1)
+    print("Wrote %s: %d depths from %s to %s, %d lats by %d lons, chunks of %s" % (
+        args.volume_dir, index["shape"][0], index["depth"][0], index["depth"][-1], index["shape"][1],
+        index["shape"][2], "x".join(map(str, index["chunks"]))))
@@ -0,0 +1,6 @@
+#
+CWD=`pwd`
+export PATH=${CWD}/bin:$PATH
+
+./bin/ucvm_batch2csv.py --output-dir csv 2ddata
+./bin/ucvm_batch2csv.py --output-dir csv 1ddata
@@ -1,3 +1,4 @@
 #
 CWD=`pwd`
 export PATH=${CWD}/bin:$PATH
+export PYTHONPATH=${CWD}:$PYTHONPATH
@@ -0,0 +1,43 @@
+"""
+ucvm_metadata
+
+Library code shared by the UCVM metadata conversion scripts in bin/, and an
+in-process API for reading UCVM plotting data without writing CSV files.
+
+The names below are imported from their modules the first time they are
+used, so that importing the package, or one of its light modules like
+cli.py, does not import numpy.
+"""
+import importlib
+
+# public name -> module it is imported from
+_EXPORTS = {
+    "RegularAxis": "axes", "axis_length": "axes", "axis_values": "axes", "read_axes": "axes",
+    "NODATA": "csvwriter", "format_values": "csvwriter", "mask_nodata": "csvwriter",
+    "write_line_csv": "csvwriter", "write_wide_csv": "csvwriter",
+    "fixed_chars": "floatfmt", "format_fixed": "floatfmt",
+    "iter_row_blocks": "gridio", "load_grid": "gridio", "release_pages": "gridio",
+    "interpolate_cross_section": "interpolate", "interpolate_horizontal_slice": "interpolate",
+    "interpolate_vertical_profile": "interpolate",
+    "CrossSection": "loader", "HorizontalSlice": "loader", "VerticalProfile": "loader",
+    "cross_section_frame": "loader", "horizontal_slice_frame": "loader", "load_cross_section": "loader",
+    "load_horizontal_slice": "loader", "load_vertical_profile": "loader",
+    "MetadataError": "metadata", "property_label": "metadata", "read_matprops": "metadata",
+    "read_metadata": "metadata", "read_metadata_lists": "metadata",
+    "GridStats": "stats", "grid_stats": "stats",
+    "Volume": "volume", "write_volume": "volume",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module("." + _EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,170 @@
+"""
+axes.py
+
+Regular coordinate axes.  The coordinate lists stored in the _meta.json
+files are regular grids, fully defined by a few scalar metadata fields:
+
+    horizontal slice    lon_list    lon1 .. lon2 - spacing, len(lon_list) points
+                        lat_list    lat1 .. lat2 - spacing, len(lat_list) points
+    cross section       depth_list  starting_depth + i * vertical_spacing
+    vertical profile    depth       starting_depth + i * vertical_spacing
+                        elevation   starting_elevation -/+ i * vertical_spacing
+
+so they can be held as RegularAxis(start, step, count) and only turned
+into arrays when they are used.  Cross section lat/lon points follow a
+great circle path and are not regular in degrees, those are always read
+from the lists.
+
+read_axes reads a metadata file without parsing the lists it can derive.
+It compares the first, the last and a few evenly spaced stored entries of
+each derived list with its axis, and parses the list instead when one is
+off, so a file whose lists do not follow its scalar fields still reads
+right.  An entry between the samples is not looked at, verify=True checks
+every derived axis against the whole stored list.
+"""
+import json
+from collections import namedtuple
+
+import numpy as np
+
+from .metadata import MetadataError, list_length, read_metadata_lists
+
+# value of point i is start + i * step
+RegularAxis = namedtuple("RegularAxis", ["start", "step", "count"])
+
+# largest difference allowed between a stored list and its derived axis,
+# the stored lists are rounded to 5 decimals at most
+TOLERANCE = 1e-5
+
+# stored entries besides the first one compared with each derived axis
+SAMPLES = 16
+
+
+def axis_values(axis):
+    """
+    :param axis: RegularAxis, or a list or array of coordinates
+    :return: float64 array of the coordinates
+    """
+    if isinstance(axis, RegularAxis):
+        return axis.start + axis.step * np.arange(axis.count, dtype=np.float64)
+    return np.asarray(axis, dtype=np.float64)
+
+
+def axis_length(axis):
+    """
+    :return: number of points of a RegularAxis, list or array
+    """
+    if isinstance(axis, RegularAxis):
+        return axis.count
+    return len(axis)
+
+
+def _between(start, stop, count):
+    step = (stop - start) / (count - 1) if count > 1 else 0.0
+    return RegularAxis(start, step, count)
+
+
+def _spaced(obj, start_key, end_key, count):
+    start = float(obj[start_key])
+    spacing = abs(float(obj["vertical_spacing"]))
+    if float(obj[end_key]) < start:
+        spacing = -spacing
+    return RegularAxis(start, spacing, count)
+
+
+def regular_axes(obj, lengths):
+    """
+    Derive the regular axes of a metadata file.
+
+    :param obj: metadata dict
+    :param lengths: dict of list key -> number of entries
+    :return: dict of list key -> RegularAxis, for the lists the metadata defines
+    """
+    axes = {}
+    try:
+        if "spacing" in obj and "lat_list" in lengths and "lon_list" in lengths:
+            spacing = float(obj["spacing"])
+            axes["lon_list"] = _between(float(obj["lon1"]), float(obj["lon2"]) - spacing, lengths["lon_list"])
+            axes["lat_list"] = _between(float(obj["lat1"]), float(obj["lat2"]) - spacing, lengths["lat_list"])
+        if "depth_list" in lengths and "starting_depth" in obj:
+            axes["depth_list"] = _spaced(obj, "starting_depth", "ending_depth", lengths["depth_list"])
+        if "depth" in lengths and "starting_depth" in obj:
+            axes["depth"] = _spaced(obj, "starting_depth", "ending_depth", lengths["depth"])
+        if "elevation" in lengths and "starting_elevation" in obj:
+            axes["elevation"] = _spaced(obj, "starting_elevation", "ending_elevation", lengths["elevation"])
+    except (KeyError, ValueError) as e:
+        raise MetadataError("Cannot derive the coordinate axes from the metadata:", e)
+    return axes
+
+
+def sample_entries(text, samples=SAMPLES):
+    """
+    Read a few entries of a json list of numbers without parsing all of it.
+
+    :return: list of (index, value) of the first and last entries and
+             about samples - 1 evenly spaced entries in between
+    """
+    if text[1:-1].strip() == "":
+        return []
+    found = []
+    start, index = 1, 0
+    for i in range(samples + 1):
+        target = 1 + (len(text) - 2) * i // samples
+        comma = text.rfind(",", start, target)
+        if comma >= 0:
+            index += text.count(",", start, comma + 1)
+            start = comma + 1
+        stop = text.find(",", start)
+        value = float(text[start:stop if stop >= 0 else len(text) - 1])
+        if not found or found[-1][0] != index:
+            found.append((index, value))
+    return found
+
+
+def matches_samples(axis, text, tolerance=TOLERANCE):
+    """
+    :return: True if the sampled entries of a stored list (see sample_entries)
+             are within tolerance of the derived axis
+    """
+    return all(abs(axis.start + axis.step * index - value) <= tolerance
+               for index, value in sample_entries(text))
+
+
+def check_axis(key, axis, values, tolerance=TOLERANCE):
+    """
+    Check a derived axis against the stored coordinate list.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) != axis.count:
+        raise MetadataError("Derived axis does not have the length of the stored list", key,
+                            axis.count, len(values))
+    if len(values) == 0:
+        return
+    error = np.abs(axis_values(axis) - values).max()
+    if error > tolerance:
+        raise MetadataError("Derived axis differs from the stored list", key, error)
+
+
+def read_axes(meta_file, verify=False, tolerance=TOLERANCE):
+    """
+    Read a metadata file, keeping its regular coordinate lists as RegularAxis.
+
+    :param verify: also parse the lists that were derived and check them
+                   against the derived axes, without it only sampled
+                   entries are compared and a list that does not match is parsed
+    :param tolerance: largest difference allowed between a stored entry and its axis
+    :return: (metadata dict without the coordinate lists,
+              dict of list key -> RegularAxis or float64 array of the list,
+              dict of list key -> number of entries)
+    """
+    obj, lists = read_metadata_lists(meta_file)
+    lengths = {key: list_length(text) for key, text in lists.items()}
+    axes = regular_axes(obj, lengths)
+    for key, text in lists.items():
+        if key not in axes:
+            axes[key] = np.array(json.loads(text), dtype=np.float64)
+        elif verify:
+            check_axis(key, axes[key], json.loads(text), tolerance)
+        elif not matches_samples(axes[key], text, tolerance):
+            axes[key] = np.array(json.loads(text), dtype=np.float64)
+    return obj, axes, lengths
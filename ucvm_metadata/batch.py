@@ -0,0 +1,228 @@
+"""
+batch.py
+
+Convert whole directories of UCVM plotting outputs.  Data and metadata
+files are paired up by the UCVM plotting naming convention:
+
+    <name>_c_data.bin     <name>_c_meta.json     cross section
+    <name>_h_data.bin     <name>_h_meta.json     horizontal slice
+    <name>_v_matprops.json <name>_v_meta.json    vertical profile
+
+and each pair is converted by the matching converter in a pool of worker
+processes.
+"""
+import glob
+import os
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from . import converters
+
+# one data/metadata pair to convert
+Job = namedtuple("Job", ["kind", "name", "data_file", "meta_file"])
+
+# outcome of converting one Job
+Result = namedtuple("Result", ["job", "ok", "output", "error", "seconds", "bytes_in", "bytes_out"])
+
+KINDS = {
+    "c": "cross section",
+    "h": "horizontal slice",
+    "v": "vertical profile",
+}
+
+# output formats, parquet, arrow and npz are the line layout in a columnar binary file
+FORMATS = ("wide", "line", "parquet", "arrow", "npz")
+
+_EXTENSIONS = {"wide": ".csv", "line": ".csv", "parquet": ".parquet", "arrow": ".arrow", "npz": ".npz"}
+
+_FILE_RE = re.compile(r"^(?P<name>.+)_(?P<kind>[chv])_(?P<part>data\.bin|matprops\.json|meta\.json)$")
+
+_DATA_PART = {"c": "data.bin", "h": "data.bin", "v": "matprops.json"}
+
+
+def discover(directory, recursive=False):
+    """
+    Find the data/metadata pairs in a directory.
+
+    :param recursive: also search sub directories
+    :return: (list of Job sorted by data file, list of files missing their partner)
+    """
+    found = {}
+    if recursive:
+        walk = os.walk(directory)
+    else:
+        walk = [(directory, None, os.listdir(directory))]
+    for dirpath, _, filenames in walk:
+        for filename in filenames:
+            m = _FILE_RE.match(filename)
+            if m is None:
+                continue
+            key = (dirpath, m.group("name"), m.group("kind"))
+            found.setdefault(key, {})[m.group("part")] = os.path.join(dirpath, filename)
+
+    jobs = []
+    unpaired = []
+    for (dirpath, name, kind), parts in found.items():
+        data_file = parts.get(_DATA_PART[kind])
+        meta_file = parts.get("meta.json")
+        if data_file is None or meta_file is None:
+            unpaired.extend(f for f in parts.values())
+            continue
+        jobs.append(Job(kind, name, data_file, meta_file))
+    jobs.sort(key=lambda job: job.data_file)
+    unpaired.sort()
+    return jobs, unpaired
+
+
+def glob_pairs(pattern, kind):
+    """
+    Find the pairs of one kind among the files a glob pattern matches, by
+    the name of either file of a pair.
+
+    :param kind: c or h
+    :return: list of (data file, meta file) sorted by data file
+    """
+    pairs = set()
+    for filename in glob.glob(pattern):
+        m = _FILE_RE.match(os.path.basename(filename))
+        if m is None or m.group("kind") != kind:
+            continue
+        prefix = filename[:len(filename) - len(m.group("part"))]
+        pairs.add((prefix + _DATA_PART[kind], prefix + "meta.json"))
+    return sorted(pairs)
+
+
+def output_file(job, output_dir=None, fmt="wide", compress=None):
+    """
+    :param compress: gz, bz2 or xz to compress CSV output files
+    :return: name of the file a job writes, next to the data file
+             unless an output directory is given
+    """
+    if job.kind == "v":
+        name = job.data_file.replace(".json", ".csv")
+    else:
+        name = job.data_file.replace(".bin", _EXTENSIONS[fmt])
+    if compress and name.endswith(".csv"):
+        name += "." + compress
+    if output_dir is not None:
+        name = os.path.join(output_dir, os.path.basename(name))
+    return name
+
+
+def converter(kind, fmt="wide"):
+    """
+    :return: the converter function for a kind of pair and output format
+    """
+    if kind == "v":
+        return converters.convert_vertical_profile
+    if fmt not in FORMATS:
+        raise ValueError("Unknown output format:", fmt)
+    if kind == "c":
+        return converters.convert_cross_section if fmt == "wide" else converters.convert_cross_section_line
+    return converters.convert_horizontal_slice if fmt == "wide" else converters.convert_horizontal_slice_line
+
+
+def convert_job(job, fmt="wide", output_dir=None, compress=None):
+    """
+    Convert one pair, catching any error.
+
+    :return: Result
+    """
+    start = time.perf_counter()
+    output = output_file(job, output_dir, fmt, compress)
+    bytes_in = os.path.getsize(job.data_file) + os.path.getsize(job.meta_file)
+    try:
+        converter(job.kind, fmt)(job.data_file, job.meta_file, output)
+    except Exception as e:
+        return Result(job, False, output, "%s: %s" % (type(e).__name__, e),
+                      time.perf_counter() - start, bytes_in, 0)
+    return Result(job, True, output, None, time.perf_counter() - start, bytes_in,
+                  os.path.getsize(output))
+
+
+def available_cores():
+    """
+    :return: number of cores this process may run on
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def run(jobs, fmt="wide", output_dir=None, workers=None, progress=None, compress=None):
+    """
+    Convert a list of jobs in a pool of worker processes.
+
+    :param workers: pool size, defaults to the number of available cores
+    :param progress: called with each Result as it completes
+    :return: list of Result, in the order of jobs
+    """
+    if workers is None:
+        workers = available_cores()
+    workers = max(1, min(workers, len(jobs)))
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    results = {}
+    if workers == 1:
+        for job in jobs:
+            results[job] = convert_job(job, fmt, output_dir, compress)
+            if progress is not None:
+                progress(results[job])
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(convert_job, job, fmt, output_dir, compress): job for job in jobs}
+            for future in as_completed(futures):
+                result = future.result()
+                results[futures[future]] = result
+                if progress is not None:
+                    progress(result)
+    return [results[job] for job in jobs]
+
+
+def summarize(results, seconds, unpaired=(), up_to_date=()):
+    """
+    :param seconds: wall time of the whole run
+    :param up_to_date: jobs skipped because their output was up to date
+    :return: dict with counts, failures and throughput of a run
+    """
+    ok = [r for r in results if r.ok]
+    failed = [r for r in results if not r.ok]
+    bytes_in = sum(r.bytes_in for r in results)
+    bytes_out = sum(r.bytes_out for r in ok)
+    return {
+        "pairs": len(results),
+        "succeeded": len(ok),
+        "failed": len(failed),
+        "up_to_date": len(up_to_date),
+        "unpaired": list(unpaired),
+        "failures": [{"data_file": r.job.data_file, "meta_file": r.job.meta_file, "error": r.error}
+                     for r in failed],
+        "seconds": seconds,
+        "bytes_in": bytes_in,
+        "bytes_out": bytes_out,
+        "pairs_per_second": len(results) / seconds if seconds > 0 else 0.0,
+        "mb_in_per_second": bytes_in / 1e6 / seconds if seconds > 0 else 0.0,
+        "mb_out_per_second": bytes_out / 1e6 / seconds if seconds > 0 else 0.0,
+    }
+
+
+def format_summary(summary):
+    """
+    :return: the summary of a run as printable text
+    """
+    lines = []
+    for failure in summary["failures"]:
+        lines.append("FAILED: %s %s" % (failure["data_file"], failure["error"]))
+    for filename in summary["unpaired"]:
+        lines.append("UNPAIRED: %s" % filename)
+    lines.append("Converted %d of %d pairs, %d failed, %d unpaired files" % (
+        summary["succeeded"], summary["pairs"], summary["failed"], len(summary["unpaired"])))
+    if summary["up_to_date"]:
+        lines.append("Skipped %d up to date pairs" % summary["up_to_date"])
+    lines.append("Time(s): %.2f  Pairs/s: %.2f  In(MB/s): %.2f  Out(MB/s): %.2f" % (
+        summary["seconds"], summary["pairs_per_second"],
+        summary["mb_in_per_second"], summary["mb_out_per_second"]))
+    return "\n".join(lines)
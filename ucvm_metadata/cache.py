@@ -0,0 +1,205 @@
+"""
+cache.py
+
+Manifest of the conversions done by a batch run, so that the next run only
+converts the pairs that changed.
+
+The manifest is a json file in the output directory (or the input
+directory when the outputs go next to the data files).  It has one entry
+per output file, holding the sha256 of each input file and the options it
+was converted with:
+
+    {"version": 1,
+     "entries": {"cross_c_data.csv": {
+         "options": {"kind": "c", "format": "wide", "compress": null, "cache_version": 1},
+         "inputs": [{"path": "../2ddata/cross_c_data.bin", "size": 66128,
+                     "mtime_ns": 1618866062727000000, "sha256": "..."}, ...],
+         "output": {"size": 162912},
+         "converted": "2026-10-18T09:12:00"}}}
+
+An output is up to date when its entry has the same options and input
+hashes and the file still has the recorded size.  Inputs whose size and
+mtime did not change keep their recorded hash unless rehash is set, so
+checking an unchanged directory reads no data.
+
+Entries of pairs in the scanned directory whose output no pair produces
+any more (the inputs were removed or renamed, or the output format
+changed) are orphans, which clean removes together with their output
+files.  Several input directories can share an output directory and its
+manifest, the entries of pairs in the other directories are never orphans.
+"""
+import datetime
+import hashlib
+import json
+import os
+
+from .batch import output_file
+
+MANIFEST_NAME = ".ucvm_batch_manifest.json"
+
+MANIFEST_VERSION = 1
+
+# bump when a converter changes its output, so every cached output is rebuilt
+CACHE_VERSION = 1
+
+_HASH_BLOCK = 1 << 20
+
+
+def manifest_file(directory, output_dir=None):
+    """
+    :return: default manifest file name of a batch run
+    """
+    return os.path.join(output_dir if output_dir is not None else directory, MANIFEST_NAME)
+
+
+def load_manifest(filename):
+    """
+    :return: manifest dict, empty if the file does not exist or is from another version
+    """
+    try:
+        with open(filename) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        manifest = None
+    if manifest is None or manifest.get("version") != MANIFEST_VERSION:
+        return {"version": MANIFEST_VERSION, "entries": {}}
+    return manifest
+
+
+def save_manifest(filename, manifest):
+    """
+    Write the manifest, replacing the old one only once it is complete.
+    """
+    tmp = filename + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, filename)
+
+
+def file_hash(filename):
+    """
+    :return: hex sha256 of the file contents
+    """
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def job_options(job, fmt="wide", compress=None):
+    """
+    :return: dict of everything besides the inputs that decides the output of a job
+    """
+    return {"kind": job.kind, "format": fmt, "compress": compress, "cache_version": CACHE_VERSION}
+
+
+def _key(manifest_dir, filename):
+    return os.path.relpath(filename, manifest_dir)
+
+
+def input_states(job, manifest_dir, previous=None, rehash=False):
+    """
+    :param previous: the manifest entry of the job's output, if any
+    :param rehash: hash the inputs even if their size and mtime did not change
+    :return: list of input dicts (path, size, mtime_ns, sha256) of a job
+    """
+    known = {}
+    if previous is not None and not rehash:
+        known = {i["path"]: i for i in previous["inputs"]}
+    states = []
+    for filename in (job.data_file, job.meta_file):
+        st = os.stat(filename)
+        path = _key(manifest_dir, filename)
+        old = known.get(path)
+        if old is not None and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+            digest = old["sha256"]
+        else:
+            digest = file_hash(filename)
+        states.append({"path": path, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest})
+    return states
+
+
+def is_fresh(entry, options, inputs, output):
+    """
+    :return: True if the manifest entry says the output is up to date
+    """
+    if entry is None or entry["options"] != options:
+        return False
+    if [i["sha256"] for i in entry["inputs"]] != [i["sha256"] for i in inputs]:
+        return False
+    return os.path.exists(output) and os.path.getsize(output) == entry["output"]["size"]
+
+
+def check_jobs(jobs, manifest, manifest_dir, fmt="wide", output_dir=None, compress=None, rehash=False):
+    """
+    Split jobs into the ones that need converting and the ones that are up to date.
+
+    :return: (list of (job, inputs) to convert, list of up to date jobs)
+    """
+    stale = []
+    fresh = []
+    for job in jobs:
+        output = output_file(job, output_dir, fmt, compress)
+        entry = manifest["entries"].get(_key(manifest_dir, output))
+        inputs = input_states(job, manifest_dir, entry, rehash)
+        if is_fresh(entry, job_options(job, fmt, compress), inputs, output):
+            fresh.append(job)
+        else:
+            stale.append((job, inputs))
+    return stale, fresh
+
+
+def record(manifest, manifest_dir, result, inputs, fmt="wide", compress=None):
+    """
+    Add the result of a conversion to the manifest, a failed one removes its entry.
+    """
+    key = _key(manifest_dir, result.output)
+    if not result.ok:
+        manifest["entries"].pop(key, None)
+        return
+    manifest["entries"][key] = {
+        "options": job_options(result.job, fmt, compress),
+        "inputs": inputs,
+        "output": {"size": os.path.getsize(result.output)},
+        "converted": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def _scanned(manifest_dir, path, directory, recursive=False):
+    """
+    :param path: input path of a manifest entry, relative to manifest_dir
+    :return: True if discover(directory, recursive) would find the input there
+    """
+    parent = os.path.dirname(os.path.abspath(os.path.join(manifest_dir, path)))
+    top = os.path.abspath(directory)
+    return parent == top or (recursive and parent.startswith(top + os.sep))
+
+
+def orphans(manifest, manifest_dir, jobs, directory, recursive=False, fmt="wide", output_dir=None,
+            compress=None):
+    """
+    :param jobs: every pair discover found in directory
+    :return: list of manifest keys of the pairs in directory whose output
+             none of the jobs write
+    """
+    current = {_key(manifest_dir, output_file(job, output_dir, fmt, compress)) for job in jobs}
+    return sorted(key for key, entry in manifest["entries"].items()
+                  if key not in current and all(_scanned(manifest_dir, i["path"], directory, recursive)
+                                                for i in entry["inputs"]))
+
+
+def clean(manifest, manifest_dir, keys):
+    """
+    Remove orphaned entries and their output files.
+
+    :return: list of the output files removed
+    """
+    removed = []
+    for key in keys:
+        manifest["entries"].pop(key, None)
+        filename = os.path.join(manifest_dir, key)
+        if os.path.exists(filename):
+            os.remove(filename)
+            removed.append(filename)
+    return removed
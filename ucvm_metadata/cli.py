@@ -0,0 +1,227 @@
+"""
+cli.py
+
+Command line handling shared by the scripts in bin/.  Only argparse and
+the pipeline defaults are imported here, each script imports the converter
+it runs.
+"""
+import argparse
+
+from .pipeline import PIPELINE_WORKERS
+
+
+def floats(count):
+    """
+    :return: argparse type of count comma separated numbers, as a tuple
+    """
+    def parse(text):
+        try:
+            values = tuple(float(v) for v in text.split(","))
+        except ValueError:
+            values = ()
+        if len(values) != count:
+            raise argparse.ArgumentTypeError("expected %d comma separated numbers: %s" % (count, text))
+        return values
+    return parse
+
+
+def positive(text):
+    """
+    :return: argparse type of a whole number of at least 1
+    """
+    try:
+        value = int(text)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise argparse.ArgumentTypeError("expected a whole number of at least 1: %s" % text)
+    return value
+
+
+def whole_number(low, high):
+    """
+    :return: argparse type of a whole number from low to high
+    """
+    def parse(text):
+        try:
+            value = int(text)
+        except ValueError:
+            value = low - 1
+        if not low <= value <= high:
+            raise argparse.ArgumentTypeError("expected a whole number from %d to %d: %s" % (low, high, text))
+        return value
+    return parse
+
+
+def shard_spec(text):
+    """
+    :return: argparse type of a K/N shard of a job array, K from 0 to N-1, as a tuple
+    """
+    try:
+        index, count = (int(v) for v in text.split("/"))
+    except ValueError:
+        index, count = -1, 0
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError("expected K/N with K from 0 to N-1: %s" % text)
+    return index, count
+
+
+def block_size(text):
+    """
+    :return: argparse type of a ROWSxCOLS block size, N is NxN, as a tuple
+    """
+    parts = text.lower().split("x")
+    if len(parts) == 1:
+        parts = parts * 2
+    if len(parts) != 2:
+        raise argparse.ArgumentTypeError("expected ROWSxCOLS or N: %s" % text)
+    return positive(parts[0]), positive(parts[1])
+
+
+def converter_parser(doc, inputs, output_required=False, wide=False, bbox=False, depth_range=False,
+                     thin=False, pipeline=False, skip_nodata=False, shards=False):
+    """
+    :param doc: script docstring, shown as the help description
+    :param inputs: list of (name, help) of the positional input file arguments
+    :param output_required: output file argument is required instead of optional
+    :return: argparse.ArgumentParser for a converter script, with the
+             options of add_converter_options
+    """
+    parser = argparse.ArgumentParser(description=doc, formatter_class=argparse.RawDescriptionHelpFormatter)
+    for name, help in inputs:
+        parser.add_argument(name, help=help)
+    if output_required:
+        parser.add_argument("output_file", help="output file")
+    else:
+        parser.add_argument("output_file", nargs="?",
+                            help="output file, defaults to the data file name with a .csv extension")
+    add_converter_options(parser, wide, bbox, depth_range, thin, pipeline, skip_nodata, shards)
+    return parser
+
+
+def add_converter_options(parser, wide=False, bbox=False, depth_range=False, thin=False, pipeline=False,
+                          skip_nodata=False, shards=False):
+    """
+    Add the options of the converters to a parser.
+
+    :param wide: add the number format options of the wide format converters
+    :param bbox: add the --bbox window option
+    :param depth_range: add the --depth-range window option
+    :param thin: add the --decimate and --block-mean options
+    :param pipeline: add the --pipeline-workers option
+    :param skip_nodata: add the --skip-nodata and --nodata-policy options of the long formats
+    :param shards: add the --shards, --shard-by and --shard-workers options,
+                   --shard-by depth only with depth_range
+    """
+    parser.add_argument("--compress-threads", type=int, default=1, metavar="N",
+                        help="compress .gz, .bz2 and .xz output files with N threads (default: 1)")
+    parser.add_argument("--profile", action="store_true",
+                        help="write the time, bytes and rows of each stage to <output>.profile.json")
+    parser.add_argument("--cprofile", action="store_true",
+                        help="also run one stage under cProfile and dump the stats to <output>.<stage>.prof, "
+                             "implies --profile")
+    parser.add_argument("--cprofile-stage", default="write", metavar="STAGE",
+                        help="stage run under cProfile (default: write)")
+    if bbox:
+        #
+        # four arguments rather than one comma separated one, argparse takes
+        # -118.2 for a number but -118.2,35.3,... for an option
+        parser.add_argument("--bbox", type=float, nargs=4, metavar=("LON_MIN", "LAT_MIN", "LON_MAX", "LAT_MAX"),
+                            help="only convert the points inside this lon/lat box")
+    if depth_range:
+        parser.add_argument("--depth-range", type=floats(2), metavar="MIN,MAX",
+                            help="only convert the depths from MIN to MAX meters")
+    if thin:
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument("--decimate", type=positive, metavar="N",
+                           help="only convert every Nth row and column of the grid")
+        group.add_argument("--block-mean", type=block_size, metavar="ROWSxCOLS",
+                           help="convert the mean of each block of ROWS by COLS grid points, "
+                                "leaving out points without data")
+    if pipeline:
+        parser.add_argument("--pipeline-workers", type=int, default=PIPELINE_WORKERS, metavar="N",
+                            help="format the CSV in N threads while reading and writing in two more, "
+                                 "0 does one after the other (default: %d)" % PIPELINE_WORKERS)
+    if skip_nodata:
+        parser.add_argument("--skip-nodata", action="store_true",
+                            help="leave out the rows without data, the header records the NoData values "
+                                 "and the number of rows written")
+        parser.add_argument("--nodata-policy", choices=("all", "any"), default="all",
+                            help="with --skip-nodata, skip a row when all of its properties are NoData, "
+                                 "or when any one is (default: all)")
+    if shards:
+        parser.add_argument("--shards", type=positive, default=1, metavar="N",
+                            help="write the output as N shard files in parallel, listed with their bounds, "
+                                 "rows and sha256 in <output>.shards.json (default: 1, no shards)")
+        parser.add_argument("--shard-by", choices=("rows", "lon", "depth") if depth_range else ("rows", "lon"),
+                            default="rows",
+                            help="split the output into ranges of rows, lon tiles"
+                                 + (" or depth bands" if depth_range else "") + " (default: rows)")
+        parser.add_argument("--shard-workers", type=positive, metavar="N",
+                            help="write the shards in N processes (default: one per core)")
+    if wide:
+        digits = parser.add_mutually_exclusive_group()
+        #
+        # floatfmt writes up to 12 decimals exactly, and a float64 holds 17
+        # significant digits
+        digits.add_argument("--decimals", type=whole_number(0, 12), default=4, metavar="N",
+                            help="write values with N decimals, 0 to 12 (default: 4)")
+        digits.add_argument("--significant", type=whole_number(1, 17), metavar="N",
+                            help="write values with enough decimals for N significant digits, 1 to 17")
+
+
+def add_multi_arguments(parser, kind):
+    """
+    Add the file arguments of a multi property converter: data/meta pairs
+    followed by the output file, or --glob and the output file.
+
+    :param kind: c or h, for the help text
+    """
+    parser.add_argument("files", nargs="+", metavar="file",
+                        help="%s_data.bin %s_meta.json pairs, one per property, then the output file" % (kind, kind))
+    parser.add_argument("--glob", metavar="PATTERN",
+                        help="convert the pairs whose data or meta file names match PATTERN, quoted so the "
+                             "shell does not expand it, the files are then only the output file")
+
+
+def multi_pairs(parser, args, kind):
+    """
+    :param kind: c or h, the kind of pairs --glob looks for
+    :return: (list of (data file, meta file), output file) of the add_multi_arguments arguments
+    """
+    *inputs, output = args.files
+    if args.glob:
+        if inputs:
+            parser.error("--glob takes the output file only")
+        from .batch import glob_pairs
+        pairs = glob_pairs(args.glob, kind)
+        if not pairs:
+            parser.error("no _%s_data.bin/_%s_meta.json files match %s" % (kind, kind, args.glob))
+        return pairs, output
+    if not inputs or len(inputs) % 2:
+        parser.error("expected data and meta file pairs followed by the output file")
+    return list(zip(inputs[::2], inputs[1::2])), output
+
+
+def run_converter(convert, inputs, output_file, args, **options):
+    """
+    Run convert(*inputs, output_file_name=output_file, **options), or with
+    --shards write its output as shards (see shards.py).
+
+    :return: output file name, or the shard manifest file name
+    """
+    if getattr(args, "shards", 1) > 1:
+        from .shards import write_shards
+        return write_shards(convert, inputs, output_file, args.shards, args.shard_by, args.shard_workers,
+                            **options)
+    return convert(*inputs, output_file_name=output_file, **options)
+
+
+def profiler_from_args(args):
+    """
+    :return: profiling.Profiler for the --profile and --cprofile options, None without them
+    """
+    if not (args.profile or args.cprofile):
+        return None
+    from .profiling import Profiler
+    return Profiler(args.cprofile_stage if args.cprofile else None)
@@ -0,0 +1,167 @@
+"""
+columnar.py
+
+Typed binary output of the long format tables (Lon, Lat, Depth(m),
+properties) as an alternative to CSV.  The output format follows the output
+file extension:
+
+    .parquet            Apache Parquet      (needs pyarrow)
+    .arrow, .feather    Arrow IPC file      (needs pyarrow)
+    .npz                numpy zip archive   (numpy only)
+
+Coordinates are float64 columns and properties are float32 columns with
+nodata points stored as nan.  The '# Key: value' lines of the CSV header
+are stored as file level metadata: schema metadata for parquet and arrow,
+and a json string in the 'metadata' entry of a .npz file.
+
+Columns are written a block of rows at a time, so memory use does not
+depend on the size of the grid.
+"""
+import json
+import os
+import zipfile
+
+import numpy as np
+
+from .csvwriter import BLOCK_ROWS, NODATA, iter_blocks, read_values
+
+EXTENSIONS = {
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".npz": "npz",
+}
+
+# name of the .npz entry holding the header fields
+NPZ_METADATA = "metadata"
+
+
+def columnar_format(filename):
+    """
+    :return: parquet, arrow or npz for a columnar output file name, None for anything else
+    """
+    return EXTENSIONS.get(os.path.splitext(filename)[1].lower())
+
+
+def header_fields(header_str):
+    """
+    :return: dict of the '# Key: value' lines of a CSV header
+    """
+    fields = {}
+    for line in header_str.splitlines():
+        line = line.lstrip("#").strip()
+        if ":" in line:
+            key, value = line.split(":", 1)
+            fields[key.strip()] = value.strip()
+    return fields
+
+
+def long_columns(outer_cols, inner_cols, grids, nodata=NODATA, block_rows=BLOCK_ROWS, mask=None):
+    """
+    Describe the columns of a long format table.
+
+    :param outer_cols: coordinate lists, one entry per grid column
+    :param inner_cols: coordinate lists, one entry per grid row
+    :param grids: list of 2D arrays, one per property
+    :param mask: bool array from csvwriter.valid_rows of the rows to keep, None keeps all
+    :return: list of (dtype, blocks) in column order, where blocks() iterates
+             over the column in blocks of block_rows rows
+    """
+    num_outer = len(outer_cols[0])
+    num_inner = len(inner_cols[0])
+
+    def coordinate(axis, outer):
+        def blocks():
+            for outer_idx, inner_idx in iter_blocks(num_outer, num_inner, block_rows, mask):
+                yield axis[outer_idx if outer else inner_idx]
+        return np.dtype(np.float64), blocks
+
+    def values(grid):
+        def blocks():
+            for outer_idx, inner_idx in iter_blocks(num_outer, num_inner, block_rows, mask):
+                yield read_values(grid, outer_idx, inner_idx, nodata).astype(np.float32, copy=False)
+        return np.dtype(np.float32), blocks
+
+    columns = [coordinate(np.asarray(c, dtype=np.float64), True) for c in outer_cols]
+    columns += [coordinate(np.asarray(c, dtype=np.float64), False) for c in inner_cols]
+    columns += [values(grid) for grid in grids]
+    return columns
+
+
+def _write_arrow(output_file_name, fmt, names, columns, fields):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("pyarrow is needed to write %s files, use a .npz output file instead" % fmt)
+
+    schema = pa.schema([pa.field(name, pa.from_numpy_dtype(dtype)) for name, (dtype, _) in zip(names, columns)],
+                       metadata={key: str(value) for key, value in fields.items()})
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(output_file_name, schema)
+        write = writer.write_table
+        make = pa.Table.from_arrays
+    else:
+        writer = pa.ipc.new_file(output_file_name, schema)
+        write = writer.write_batch
+        make = pa.RecordBatch.from_arrays
+    try:
+        for arrays in zip(*[blocks() for _, blocks in columns]):
+            write(make([pa.array(a) for a in arrays], schema=schema))
+    finally:
+        writer.close()
+
+
+def _write_npz(output_file_name, names, columns, num_rows, fields):
+    with zipfile.ZipFile(output_file_name, "w", allowZip64=True) as zf:
+        for name, (dtype, blocks) in zip(names, columns):
+            with zf.open(name + ".npy", "w", force_zip64=True) as fp:
+                np.lib.format.write_array_header_1_0(fp, {
+                    "descr": np.lib.format.dtype_to_descr(dtype),
+                    "fortran_order": False,
+                    "shape": (num_rows,)})
+                for block in blocks():
+                    fp.write(np.ascontiguousarray(block, dtype=dtype).tobytes())
+        with zf.open(NPZ_METADATA + ".npy", "w") as fp:
+            np.lib.format.write_array(fp, np.array(json.dumps(fields)))
+
+
+def write_columnar(output_file_name, header_str, names, outer_cols, inner_cols, grids,
+                   nodata=NODATA, block_rows=BLOCK_ROWS, mask=None):
+    """
+    Write grids as a long format table in a columnar binary file.
+
+    :param header_str: CSV header, its fields are stored as file metadata
+    :param names: column names, coordinates first then properties
+    :param mask: bool array from csvwriter.valid_rows of the rows to write, None writes all
+    :return: number of rows written
+    """
+    fmt = columnar_format(output_file_name)
+    if fmt is None:
+        raise ValueError("Not a columnar output file name:", output_file_name)
+    fields = header_fields(header_str)
+    columns = long_columns(outer_cols, inner_cols, grids, nodata, block_rows, mask)
+    num_rows = len(outer_cols[0]) * len(inner_cols[0]) if mask is None else int(np.count_nonzero(mask))
+    if fmt == "npz":
+        _write_npz(output_file_name, names, columns, num_rows, fields)
+    else:
+        _write_arrow(output_file_name, fmt, names, columns, fields)
+    return num_rows
+
+
+def read_columnar_metadata(filename):
+    """
+    :return: dict of the header fields stored in a columnar file
+    """
+    fmt = columnar_format(filename)
+    if fmt == "npz":
+        with np.load(filename) as npz:
+            return json.loads(str(npz[NPZ_METADATA]))
+    import pyarrow as pa
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        metadata = pq.read_schema(filename).metadata
+    else:
+        with pa.memory_map(filename) as source:
+            metadata = pa.ipc.open_file(source).schema.metadata
+    return {key.decode(): value.decode() for key, value in (metadata or {}).items()}
@@ -0,0 +1,133 @@
+"""
+compress.py
+
+Compressed output files, picked by the output file extension:
+
+    .gz     gzip
+    .bz2    bzip2
+    .xz     xz/lzma
+
+Output is compressed on the fly while it is written.  With more than one
+thread the output is cut into fixed size blocks which are compressed in
+parallel and written in order, each as a separate gzip member, bzip2
+stream or xz stream.  The result is a normal multi-member file that gzip,
+bzip2, xz, python and pandas all read as one stream.  zlib, bz2 and lzma
+release the GIL while compressing, so a thread pool is enough.
+"""
+import bz2
+import gzip
+import io
+import lzma
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# uncompressed bytes per block when compressing in parallel
+BLOCK_SIZE = 4 << 20
+
+COMPRESSIONS = {
+    ".gz": (gzip.open, lambda data, level: gzip.compress(data, compresslevel=level, mtime=0), 6),
+    ".bz2": (bz2.open, lambda data, level: bz2.compress(data, compresslevel=level), 9),
+    ".xz": (lzma.open, lambda data, level: lzma.compress(data, preset=level), 6),
+}
+
+
+def compression(filename):
+    """
+    :return: .gz, .bz2 or .xz for a compressed output file name, None otherwise
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    return ext if ext in COMPRESSIONS else None
+
+
+def strip_compression(filename):
+    """
+    :return: file name without a .gz, .bz2 or .xz extension
+    """
+    if compression(filename) is None:
+        return filename
+    return os.path.splitext(filename)[0]
+
+
+class ParallelCompressedFile(io.RawIOBase):
+    """
+    Binary file that compresses blocks of its output in a thread pool.
+
+    At most 2 * threads blocks are in flight, which bounds memory use to
+    about 2 * threads * block_size.
+    """
+
+    def __init__(self, filename, threads, level=None, block_size=BLOCK_SIZE):
+        ext = compression(filename)
+        if ext is None:
+            raise ValueError("Not a compressed output file name:", filename)
+        _, self._compress, default_level = COMPRESSIONS[ext]
+        self._level = default_level if level is None else level
+        self._file = open(filename, "wb")
+        self._pool = ThreadPoolExecutor(max_workers=threads)
+        self._pending = deque()
+        self._max_pending = 2 * threads
+        self._block_size = block_size
+        self._buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self._block_size:
+            self._submit(bytes(self._buffer[:self._block_size]))
+            del self._buffer[:self._block_size]
+        return len(data)
+
+    def _submit(self, block):
+        self._pending.append(self._pool.submit(self._compress, block, self._level))
+        while len(self._pending) >= self._max_pending:
+            self._file.write(self._pending.popleft().result())
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._buffer:
+                self._submit(bytes(self._buffer))
+                self._buffer = bytearray()
+            while self._pending:
+                self._file.write(self._pending.popleft().result())
+        finally:
+            self._pool.shutdown()
+            self._file.close()
+            super().close()
+
+
+def open_output(filename, threads=1, level=None):
+    """
+    Open an output text file, compressed if the name ends in .gz, .bz2 or .xz.
+
+    :param threads: number of compression threads, 1 compresses in the
+                    writing thread
+    :param level: compression level, defaults to the usual level of each format
+    :return: writable text file object
+    """
+    ext = compression(filename)
+    if ext is None:
+        return open(filename, "w")
+    opener, _, default_level = COMPRESSIONS[ext]
+    if threads <= 1:
+        if ext == ".xz":
+            return opener(filename, "wt", preset=default_level if level is None else level)
+        return opener(filename, "wt", compresslevel=default_level if level is None else level)
+    raw = ParallelCompressedFile(filename, threads, level)
+    return io.TextIOWrapper(io.BufferedWriter(raw, BLOCK_SIZE))
+
+
+def open_input(filename):
+    """
+    Open an input text file, decompressed if the name ends in .gz, .bz2 or .xz.
+
+    :return: readable text file object
+    """
+    ext = compression(filename)
+    if ext is None:
+        return open(filename)
+    return COMPRESSIONS[ext][0](filename, "rt")
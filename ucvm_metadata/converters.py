@@ -0,0 +1,443 @@
+"""
+converters.py
+
+The conversions done by the scripts in bin/, from UCVM plotting data and
+metadata files to CSV files, or for the long formats optionally to
+columnar binary files (see columnar.py).  Each function returns the name
+of the file it wrote.
+
+CSV output file names ending in .gz, .bz2 or .xz are compressed while they
+are written, with compress_threads threads (see compress.py).
+
+The vertical profile CSV is written the way pandas to_csv wrote it, without
+importing pandas.
+
+Given a Profiler (see profiling.py), the converters time their stages and
+write a <output>.profile.json sidecar next to the output file.
+
+The cross section and horizontal slice converters take a bbox and the
+cross section ones a depth_range, to convert only a window of the grid
+(see window.py), and decimate or block_mean to thin it (see decimate.py).
+They also take a part, (row slice, column slice) of the windowed grid
+before it is thinned, to write one shard of the output (see shards.py).
+
+CSV output is read, formatted and written by a pipeline of threads (see
+pipeline.py) with workers formatter threads, 0 runs the three one after
+the other.  The output is the same either way.
+
+The long format converters take skip_nodata to leave out the rows without
+data (see csvwriter.valid_rows), with nodata_policy all or any of the
+properties of a row NoData.  The header then records the policy, the
+NoData values and the number of rows written.
+"""
+import os
+
+from .columnar import columnar_format, write_columnar
+from .compress import open_output
+from .csvwriter import NODATA, valid_rows, write_columns_csv, write_line_csv, write_wide_csv
+from .decimate import (CROSS_SECTION_NODATA, HORIZONTAL_SLICE_NODATA, thin_cross_section,
+                       thin_horizontal_slice)
+from .floatfmt import DECIMALS
+from .gridio import load_grid
+from .headers import (ALL_PROPERTIES, cross_section_header, cross_section_line_header,
+                      cross_section_multi_header, horizontal_slice_header, horizontal_slice_line_header,
+                      horizontal_slice_multi_header, skip_nodata_header, vertical_profile_header)
+from .metadata import (MetadataError, check_cross_section, check_horizontal_slice, check_same_grid,
+                       check_vertical_profile, profile_depths, property_label, read_matprops, read_metadata)
+from .pipeline import PIPELINE_WORKERS
+from .profiling import file_sizes, stage
+from .window import part_cross_section, part_horizontal_slice, subset_cross_section, subset_horizontal_slice
+
+# values of points without data skipped by skip_nodata, besides nan, the
+# long format writes the -1 of horizontal slices as nan too
+SKIP_NODATA = {"c": (CROSS_SECTION_NODATA,), "h": (HORIZONTAL_SLICE_NODATA, float(NODATA))}
+
+# metadata the pairs of a multi property conversion have to agree on
+CROSS_SECTION_AXES = ("lon_list", "lat_list", "depth_list")
+HORIZONTAL_SLICE_AXES = ("lon_list", "lat_list", "depth")
+
+
+def _read_metadata(meta_file, profiler=None):
+    with stage(profiler, "read_metadata", file_sizes(meta_file)):
+        return read_metadata(meta_file)
+
+
+def _load_grid(data_file, profiler=None):
+    with stage(profiler, "load_grid"):
+        return load_grid(data_file)
+
+
+def _load(data_file, meta_file, check, profiler=None):
+    obj = _read_metadata(meta_file, profiler)
+    grid = _load_grid(data_file, profiler)
+    with stage(profiler, "check"):
+        check(obj, grid)
+    return obj, grid
+
+
+def _load_properties(pairs, check, keys, profiler=None):
+    """
+    Load the pairs of several properties of the same points.
+
+    :param keys: metadata keys all the pairs have to agree on
+    :return: (list of metadata, list of grids)
+    """
+    if not pairs:
+        raise MetadataError("No data and metadata pairs to convert")
+    objs, grids = [], []
+    for data_file, meta_file in pairs:
+        obj, grid = _load(data_file, meta_file, check, profiler)
+        objs.append(obj)
+        grids.append(grid)
+    with stage(profiler, "check"):
+        check_same_grid(objs, grids, keys)
+    return objs, grids
+
+
+def _property_names(objs, props=None):
+    """
+    :return: list of the property name of each metadata, props or their data_type
+    """
+    if props is None:
+        props = [obj.get("data_type") for obj in objs]
+    if len(props) != len(objs):
+        raise MetadataError("Expected one property name per pair", len(objs), len(props))
+    for prop in props:
+        property_label(prop)
+    if len(set(props)) != len(props):
+        raise MetadataError("Two pairs have the same data type", ",".join(props))
+    return list(props)
+
+
+def _cut(name, cut, obj, grids, profiler, *options):
+    """
+    :return: (obj, grids) cut by cut(obj, grids, *options) in stage name,
+             or as they are when no option is given
+    """
+    if all(option is None for option in options):
+        return obj, grids
+    with stage(profiler, name):
+        return cut(obj, grids, *options)
+
+
+def _cut_cross_section(obj, grids, profiler, bbox, depth_range, decimate, block_mean, part=None):
+    obj, grids = _cut("window", subset_cross_section, obj, grids, profiler, bbox, depth_range)
+    obj, grids = _cut("shard", part_cross_section, obj, grids, profiler, part)
+    return _cut("decimate", thin_cross_section, obj, grids, profiler, decimate, block_mean)
+
+
+def _cut_horizontal_slice(obj, grids, profiler, bbox, decimate, block_mean, part=None):
+    obj, grids = _cut("window", subset_horizontal_slice, obj, grids, profiler, bbox)
+    obj, grids = _cut("shard", part_horizontal_slice, obj, grids, profiler, part)
+    return _cut("decimate", thin_horizontal_slice, obj, grids, profiler, decimate, block_mean)
+
+
+def _finish(profiler, output_file_name, converter, inputs):
+    if profiler is not None:
+        profiler.write(output_file_name, converter, inputs)
+
+
+def _start_csv(output_file_name, header_str, verbose, compress_threads=1):
+    if verbose:
+        print("\nWriting CSV file: ", output_file_name)
+        print(header_str)
+    f = open_output(output_file_name, compress_threads)
+    f.write(header_str)
+    return f
+
+
+def _write_long(output_file_name, header_str, names, outer_cols, inner_cols, grids, verbose,
+                compress_threads=1, profiler=None, workers=PIPELINE_WORKERS, nodata_values=None,
+                nodata_policy="all", stack=False):
+    """
+    Write a long format table, as CSV or as a columnar file depending on
+    the output file name.
+
+    :param nodata_values: values of points without data, given these the
+                          rows without data are left out (see csvwriter.valid_rows)
+    :param stack: stack each block of rows of the grids into one array
+                  before writing CSV (see csvwriter.stacked_blocks)
+    """
+    mask = None
+    if nodata_values is not None:
+        with stage(profiler, "mask", sum(grid.nbytes for grid in grids)) as record:
+            mask = valid_rows(grids, len(outer_cols[0]), len(inner_cols[0]), nodata_values, nodata_policy)
+            record["rows"] = int(mask.sum())
+        header_str = skip_nodata_header(header_str, nodata_policy, nodata_values, record["rows"])
+    fmt = columnar_format(output_file_name)
+    with stage(profiler, "write", sum(grid.nbytes for grid in grids)) as record:
+        if fmt is None:
+            f = _start_csv(output_file_name, header_str, verbose, compress_threads)
+            record["rows"] = write_line_csv(f, outer_cols, inner_cols, grids, workers=workers, mask=mask,
+                                            stack=stack)
+            f.close()
+        else:
+            if verbose:
+                print("\nWriting %s file: " % fmt, output_file_name)
+                print(header_str)
+            record["rows"] = write_columnar(output_file_name, header_str, names, outer_cols, inner_cols, grids,
+                                            mask=mask)
+        record["bytes_written"] = os.path.getsize(output_file_name)
+
+
+def convert_vertical_profile(matprops_file, meta_file, output_file_name=None, verbose=False,
+                             compress_threads=1, profiler=None):
+    """
+    :input: v_matprops.json v_meta.json
+    :return: v_matprops.csv file name
+
+    Outputs a CSV file with header and
+    depth, vp, vs, rho columns
+    """
+    mobj = _read_metadata(meta_file, profiler)
+    with stage(profiler, "read_matprops", file_sizes(matprops_file)):
+        datalist = read_matprops(matprops_file)
+    with stage(profiler, "check"):
+        check_vertical_profile(mobj, datalist)
+    is_depth, ldlist = profile_depths(mobj)
+
+    names = ["# Depth(m)", "Vp(m/s)", "Vs(m/s)", "Density(kg/m^3)"]
+    columns = [list(ldlist)] + [[p[key] for p in datalist] for key in ("vp", "vs", "density")]
+    #
+    # Example filename: matprops_file = "UCVM_1618866062727vertical_matprops.json"
+    if output_file_name is None:
+        output_file_name = matprops_file.replace(".json", ".csv")
+    with stage(profiler, "write") as record:
+        f = _start_csv(output_file_name, vertical_profile_header(mobj, output_file_name),
+                       verbose, compress_threads)
+        record["rows"] = write_columns_csv(f, names, columns)
+        f.close()
+        record["bytes_written"] = os.path.getsize(output_file_name)
+    _finish(profiler, output_file_name, "vertical_profile", [matprops_file, meta_file])
+    return output_file_name
+
+
+def convert_cross_section(data_file, meta_file, output_file_name=None, verbose=False,
+                          compress_threads=1, decimals=DECIMALS, significant=None, profiler=None,
+                          bbox=None, depth_range=None, decimate=None, block_mean=None,
+                          workers=PIPELINE_WORKERS, part=None):
+    """
+    :input: c_data.bin c_meta.json
+    :return: c_data.csv file name
+
+    Wide format, one row per depth and one column per (lat,lon) point:
+        Depths[m],"(lat,lon)",...
+    Values are written with 4 decimals, or the given number of decimals or
+    significant digits (see floatfmt.py).
+    """
+    obj, datalist = _load(data_file, meta_file, check_cross_section, profiler)
+    obj, (datalist,) = _cut_cross_section(obj, [datalist], profiler, bbox, depth_range,
+                                           decimate, block_mean, part)
+    property_label(obj["data_type"])
+    depthlist = obj["depth_list"]
+    latlist = obj["lat_list"]
+    lonlist = obj["lon_list"]
+    mystrlist = ["(" + str(lat) + "," + str(lon) + ")" for lat, lon in zip(latlist, lonlist)]
+
+    if output_file_name is None:
+        output_file_name = data_file.replace(".bin", ".csv")
+    with stage(profiler, "write", datalist.nbytes) as record:
+        f = _start_csv(output_file_name, cross_section_header(obj), verbose, compress_threads)
+        record["rows"] = write_wide_csv(f, ["Depths[m]"] + mystrlist, depthlist, datalist,
+                                        decimals=decimals, significant=significant, workers=workers)
+        f.close()
+        record["bytes_written"] = os.path.getsize(output_file_name)
+    _finish(profiler, output_file_name, "cross_section", [data_file, meta_file])
+    return output_file_name
+
+
+def convert_cross_section_line(data_file, meta_file, output_file_name=None, verbose=False,
+                               compress_threads=1, profiler=None, bbox=None, depth_range=None,
+                               decimate=None, block_mean=None,
+                               workers=PIPELINE_WORKERS, skip_nodata=False, nodata_policy="all", part=None):
+    """
+    :input: c_data.bin c_meta.json
+    :return: c_data.csv file name
+
+    Long format, one row per point:
+        lon,lat,depth,val
+    .parquet, .arrow, .feather and .npz output file names write the same
+    table as a columnar binary file.
+    """
+    obj, datalist = _load(data_file, meta_file, check_cross_section, profiler)
+    obj, (datalist,) = _cut_cross_section(obj, [datalist], profiler, bbox, depth_range,
+                                           decimate, block_mean, part)
+    propstr = property_label(obj["data_type"])
+
+    if output_file_name is None:
+        output_file_name = data_file.replace(".bin", ".csv")
+    _write_long(output_file_name, cross_section_line_header(obj), ["Lon", "Lat", "Depth(m)", propstr],
+                [obj["lon_list"], obj["lat_list"]], [obj["depth_list"]], [datalist],
+                verbose, compress_threads, profiler, workers,
+                SKIP_NODATA["c"] if skip_nodata else None, nodata_policy)
+    _finish(profiler, output_file_name, "cross_section_line", [data_file, meta_file])
+    return output_file_name
+
+
+def _cross_section_multi(converter, pairs, output_file_name, props, verbose, compress_threads, profiler,
+                         bbox, depth_range, decimate, block_mean, workers, skip_nodata, nodata_policy, part):
+    objs, grids = _load_properties(pairs, check_cross_section, CROSS_SECTION_AXES, profiler)
+    props = _property_names(objs, props)
+    obj, grids = _cut_cross_section(objs[0], grids, profiler, bbox, depth_range, decimate, block_mean, part)
+
+    _write_long(output_file_name, cross_section_multi_header(obj, objs, props),
+                ["Lon", "Lat", "Depth(m)"] + [property_label(prop) for prop in props],
+                [obj["lon_list"], obj["lat_list"]], [obj["depth_list"]], grids,
+                verbose, compress_threads, profiler, workers,
+                SKIP_NODATA["c"] if skip_nodata else None, nodata_policy, stack=True)
+    _finish(profiler, output_file_name, converter, [name for pair in pairs for name in pair])
+    return output_file_name
+
+
+def convert_cross_section_multi(pairs, output_file_name, props=None, verbose=False, compress_threads=1,
+                                profiler=None, bbox=None, depth_range=None, decimate=None, block_mean=None,
+                                workers=PIPELINE_WORKERS, skip_nodata=False, nodata_policy="all", part=None):
+    """
+    :input: list of (c_data.bin, c_meta.json) pairs, one per property
+    :param props: property names of the pairs, defaults to the data_type of each metadata file
+    :return: output csv file name
+
+    Long format, one row per point:
+        lon,lat,depth,prop,prop,...
+    or a columnar binary file for .parquet, .arrow, .feather and .npz output file names.
+    All the pairs have to be on the same points.
+    """
+    return _cross_section_multi("cross_section_multi", pairs, output_file_name, props, verbose,
+                                compress_threads, profiler, bbox, depth_range, decimate, block_mean, workers,
+                                skip_nodata, nodata_policy, part)
+
+
+def convert_cross_section_all(vp_data_file, vp_metadata_file, vs_data_file, vs_metadata_file,
+                              density_data_file, density_metadata_file, output_file_name,
+                              verbose=False, compress_threads=1, profiler=None, bbox=None,
+                              depth_range=None, decimate=None, block_mean=None,
+                              workers=PIPELINE_WORKERS, skip_nodata=False, nodata_policy="all", part=None):
+    """
+    :input: vp_data.bin vp_meta.json vs_data.bin vs_meta.json density_data.bin density_meta.json
+    :return: output csv file name
+
+    Long format, one row per point:
+        lon,lat,depth,vp,vs,density
+    or a columnar binary file for .parquet, .arrow, .feather and .npz output file names.
+    """
+    return _cross_section_multi("cross_section_all",
+                                [(vp_data_file, vp_metadata_file), (vs_data_file, vs_metadata_file),
+                                 (density_data_file, density_metadata_file)],
+                                output_file_name, ALL_PROPERTIES, verbose, compress_threads, profiler,
+                                bbox, depth_range, decimate, block_mean, workers, skip_nodata, nodata_policy,
+                                part)
+
+
+def convert_horizontal_slice(data_file, meta_file, output_file_name=None, verbose=False,
+                             compress_threads=1, decimals=DECIMALS, significant=None, profiler=None,
+                             bbox=None, decimate=None, block_mean=None,
+                             workers=PIPELINE_WORKERS, part=None):
+    """
+    :input: h_data.bin h_meta.json
+    :return: h_data.csv file name
+
+    Wide format, one row per lat and one column per lon, points with
+    value 0.0 are left empty:
+        Lats,-126.4,-126.39,...
+        35.0200,,,,,,...
+    Values are written with 4 decimals, or the given number of decimals or
+    significant digits (see floatfmt.py).
+    """
+    obj, datalist = _load(data_file, meta_file, check_horizontal_slice, profiler)
+    obj, (datalist,) = _cut_horizontal_slice(obj, [datalist], profiler, bbox, decimate, block_mean, part)
+    property_label(obj["data_type"])
+    latlist = obj["lat_list"]
+    lonlist = obj["lon_list"]
+    mystrlist = [str(lon) for lon in lonlist]
+
+    if output_file_name is None:
+        output_file_name = data_file.replace(".bin", ".csv")
+    with stage(profiler, "write", datalist.nbytes) as record:
+        f = _start_csv(output_file_name, horizontal_slice_header(obj), verbose, compress_threads)
+        record["rows"] = write_wide_csv(f, ["Lats"] + mystrlist, latlist, datalist, empty=0.0,
+                                        decimals=decimals, significant=significant, workers=workers)
+        f.close()
+        record["bytes_written"] = os.path.getsize(output_file_name)
+    _finish(profiler, output_file_name, "horizontal_slice", [data_file, meta_file])
+    return output_file_name
+
+
+def convert_horizontal_slice_line(data_file, meta_file, output_file_name=None, verbose=False,
+                                  compress_threads=1, profiler=None, bbox=None,
+                                  decimate=None, block_mean=None,
+                                  workers=PIPELINE_WORKERS, skip_nodata=False, nodata_policy="all", part=None):
+    """
+    :input: h_data.bin h_meta.json
+    :return: h_data.csv file name
+
+    Long format, one row per point:
+        lon,lat,val
+    .parquet, .arrow, .feather and .npz output file names write the same
+    table as a columnar binary file.
+    """
+    obj, datalist = _load(data_file, meta_file, check_horizontal_slice, profiler)
+    obj, (datalist,) = _cut_horizontal_slice(obj, [datalist], profiler, bbox, decimate, block_mean, part)
+    propstr = property_label(obj["data_type"])
+
+    if output_file_name is None:
+        output_file_name = data_file.replace(".bin", ".csv")
+    _write_long(output_file_name, horizontal_slice_line_header(obj, propstr), ["Lon", "Lat", propstr],
+                [obj["lon_list"]], [obj["lat_list"]], [datalist],
+                verbose, compress_threads, profiler, workers,
+                SKIP_NODATA["h"] if skip_nodata else None, nodata_policy)
+    _finish(profiler, output_file_name, "horizontal_slice_line", [data_file, meta_file])
+    return output_file_name
+
+
+def _horizontal_slice_multi(converter, pairs, output_file_name, props, verbose, compress_threads, profiler,
+                            bbox, decimate, block_mean, workers, skip_nodata, nodata_policy, part):
+    objs, grids = _load_properties(pairs, check_horizontal_slice, HORIZONTAL_SLICE_AXES, profiler)
+    props = _property_names(objs, props)
+    obj, grids = _cut_horizontal_slice(objs[0], grids, profiler, bbox, decimate, block_mean, part)
+
+    _write_long(output_file_name, horizontal_slice_multi_header(obj, objs, props),
+                ["Lon", "Lat"] + [property_label(prop) for prop in props],
+                [obj["lon_list"]], [obj["lat_list"]], grids,
+                verbose, compress_threads, profiler, workers,
+                SKIP_NODATA["h"] if skip_nodata else None, nodata_policy, stack=True)
+    _finish(profiler, output_file_name, converter, [name for pair in pairs for name in pair])
+    return output_file_name
+
+
+def convert_horizontal_slice_multi(pairs, output_file_name, props=None, verbose=False, compress_threads=1,
+                                   profiler=None, bbox=None, decimate=None, block_mean=None,
+                                   workers=PIPELINE_WORKERS, skip_nodata=False, nodata_policy="all", part=None):
+    """
+    :input: list of (h_data.bin, h_meta.json) pairs, one per property
+    :param props: property names of the pairs, defaults to the data_type of each metadata file
+    :return: output csv file name
+
+    Long format, one row per point:
+        lon,lat,prop,prop,...
+    or a columnar binary file for .parquet, .arrow, .feather and .npz output file names.
+    All the pairs have to be on the same points.
+    """
+    return _horizontal_slice_multi("horizontal_slice_multi", pairs, output_file_name, props, verbose,
+                                   compress_threads, profiler, bbox, decimate, block_mean, workers,
+                                   skip_nodata, nodata_policy, part)
+
+
+def convert_horizontal_slice_all(vp_data_file, vp_metadata_file, vs_data_file, vs_metadata_file,
+                                 density_data_file, density_metadata_file, output_file_name,
+                                 verbose=False, compress_threads=1, profiler=None, bbox=None,
+                                 decimate=None, block_mean=None,
+                                 workers=PIPELINE_WORKERS, skip_nodata=False, nodata_policy="all", part=None):
+    """
+    :input: vp_data.bin vp_meta.json vs_data.bin vs_meta.json density_data.bin density_meta.json
+    :return: output csv file name
+
+    Long format, one row per point:
+        lon,lat,vp,vs,density
+    or a columnar binary file for .parquet, .arrow, .feather and .npz output file names.
+    """
+    return _horizontal_slice_multi("horizontal_slice_all",
+                                   [(vp_data_file, vp_metadata_file), (vs_data_file, vs_metadata_file),
+                                    (density_data_file, density_metadata_file)],
+                                   output_file_name, ALL_PROPERTIES, verbose, compress_threads, profiler,
+                                   bbox, decimate, block_mean, workers, skip_nodata, nodata_policy,
+                                   part)
@@ -0,0 +1,431 @@
+"""
+csvreader.py
+
+Reading the CSV files written by the converters back into UCVM plotting
+data/metadata pairs, the reverse of csvwriter.py:
+
+    wide        one row per depth (cross section) or lat (horizontal slice)
+    line        one row per point, lon,lat[,depth],val
+    all         one row per point, lon,lat[,depth],vp,vs,density, read back
+                as three pairs, one per property
+
+The format and the grid shape are found from the '# Key: value' header
+(see headers.py), which also gives the metadata fields: title, cvm,
+data_type, depths, spacings, min/max/mean and the end points.  The body
+is parsed a block of lines at a time by the pandas C parser and written
+straight into a memory mapped .npy file, so memory use does not grow with
+the size of the CSV.  Files compressed with gzip, bzip2 or xz are read
+through the decompressor.
+
+What comes back is what the CSV holds:
+
+    long formats    values are the shortest repr of each float32, so the
+                    grid is bit for bit the original, with nan (the -1
+                    NoData points) turned back into -1
+    wide formats    values are rounded to the decimals they were written
+                    with, empty cells are nan in cross sections and 0.0
+                    (NoData) in horizontal slices
+
+Long format rows have to be in the order the converters write them, every
+depth (lat) of a point before the next point, or reading fails.  The lats
+of a wide horizontal slice are written with 4 decimals, they are replaced
+by the regular axis of the header (see axes.py) when that rounds to them.
+Metadata fields the CSV does not hold (color, outfile, configfile,
+installdir) are left out.
+"""
+import csv
+import io
+import json
+import os
+
+import numpy as np
+
+from .axes import axis_values, regular_axes
+from .compress import open_input, strip_compression
+from .csvwriter import NODATA
+from .gridio import release_pages
+from .metadata import MetadataError
+
+# header key -> (metadata key, type of the value in the metadata files)
+HEADER_KEYS = {
+    "Title": ("title", str),
+    "CVM(abbr)": ("cvm", str),
+    "Data_type": ("data_type", str),
+    "Start_depth(m)": ("starting_depth", str),
+    "End_depth(m)": ("ending_depth", str),
+    "Vert_spacing(m)": ("vertical_spacing", str),
+    "Horizontal_spacing(m)": ("horizontal_spacing", str),
+    "Depth(m)": ("depth", str),
+    "Spacing(degree)": ("spacing", str),
+    "Total_pts": ("datapoints", int),
+    "Min_v": ("min", float),
+    "Max_v": ("max", float),
+    "Mean_v": ("mean", float),
+    "Num_x": ("num_x", int),
+    "Num_y": ("num_y", int),
+    "Lat1": ("lat1", str),
+    "Lon1": ("lon1", str),
+    "Lat2": ("lat2", str),
+    "Lon2": ("lon2", str),
+}
+
+# header keys of the grid shape, (rows, columns)
+SHAPE_KEYS = {"c": ("Depth_pts", "Horizontal_pts"), "h": ("Lat_pts", "Lon_pts")}
+
+# first header cell of the wide formats
+WIDE_NAMES = {"c": "Depths[m]", "h": "Lats"}
+
+# added to the default output prefix, see output_prefix
+OUTPUT_SUFFIX = "_csv2bin"
+
+# value of empty wide cells
+WIDE_EMPTY = {"c": np.nan, "h": 0.0}
+
+# CSV text parsed at a time, rows are never split between blocks
+BLOCK_BYTES = 16 << 20
+
+
+def read_header(f):
+    """
+    Read the comment header of a converter CSV.
+
+    :param f: open text file, left at the first line after the header
+    :return: (dict of header key -> value text, column names of a long
+             format file or None, first line after the header)
+    """
+    fields = {}
+    columns = None
+    line = f.readline()
+    while line.startswith("#"):
+        text = line[1:].strip()
+        key, colon, value = text.partition(":")
+        if colon:
+            fields[key.strip()] = value.strip()
+        elif text:
+            columns = text.split(",")
+        line = f.readline()
+    return fields, columns, line
+
+
+def csv_layout(fields, columns, first_line):
+    """
+    :return: (kind c or h, format wide, line or all, list of properties)
+    """
+    if "Start_depth(m)" in fields:
+        kind = "c"
+    elif "Depth(m)" in fields:
+        kind = "h"
+    else:
+        raise MetadataError("Not a cross section or horizontal slice CSV, the header has no depth")
+    props = [p.strip() for p in fields.get("Data_type", "").split(",") if p.strip()]
+    if columns is not None:
+        return kind, "all" if len(props) > 1 else "line", props
+    if not first_line.startswith(WIDE_NAMES[kind]):
+        raise MetadataError("Cannot find the column names of the CSV")
+    return kind, "wide", props[:1]
+
+
+def header_metadata(fields, prop=None):
+    """
+    :param prop: property of an _all file, whose min/max/mean are used
+    :return: metadata dict of the header fields, without coordinate lists
+    """
+    obj = {}
+    for key, value in fields.items():
+        if prop is not None and key.startswith(prop + " "):
+            key = key[len(prop) + 1:]
+        elif " " in key:
+            continue
+        if key not in HEADER_KEYS or value == "None":
+            continue
+        name, kind = HEADER_KEYS[key]
+        obj[name] = kind(value)
+    if prop is not None:
+        obj["data_type"] = prop
+    return obj
+
+
+def grid_shape(fields, kind):
+    """
+    :return: (rows, columns) of the grid, from the header point counts
+    """
+    try:
+        return tuple(int(fields[key]) for key in SHAPE_KEYS[kind])
+    except (KeyError, ValueError):
+        raise MetadataError("The header does not give the number of points", *SHAPE_KEYS[kind])
+
+
+def text_blocks(f, first_line="", block_bytes=BLOCK_BYTES):
+    """
+    :param first_line: line of the body already read from f
+    :return: generator of blocks of whole lines of f
+    """
+    rest = first_line
+    while True:
+        text = f.read(block_bytes)
+        if not text:
+            break
+        text = rest + text
+        cut = text.rfind("\n") + 1
+        rest = text[cut:]
+        if cut:
+            yield text[:cut]
+    if rest.strip():
+        yield rest + "\n"
+
+
+def _parse(text, num_columns, label_text=False):
+    """
+    :return: pandas DataFrame of the rows of a block of CSV text
+    """
+    import pandas as pd
+
+    dtype = {i: np.float64 for i in range(num_columns)}
+    if label_text:
+        dtype[0] = str
+    #
+    # the default 'high' precision parser is 3 times faster than
+    # 'round_trip' and off by one float64 step at most, which the float32
+    # grid values round away
+    return pd.read_csv(io.StringIO(text), header=None, names=list(range(num_columns)), dtype=dtype,
+                       keep_default_na=False, na_values=["", "nan"], float_precision="high")
+
+
+def _exact_cells(text, rows, num_columns, num_rows):
+    """
+    Parse the first cells of some rows of a block exactly, the way python does.
+
+    :return: (len(rows), num_columns) float64 array, None when the block
+             has blank lines and its rows cannot be found
+    """
+    data = text.encode()
+    ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord("\n"))
+    if len(ends) != num_rows:
+        return None
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    cells = [data[starts[r]:ends[r]].split(b",", num_columns)[:num_columns] for r in rows.tolist()]
+    return np.array(cells, dtype=np.float64).reshape(len(rows), num_columns)
+
+
+def _read_long(f, first_line, grids, outer_axes, inner_axes, block_bytes):
+    """
+    Fill grids and coordinate axes from long format rows.
+
+    :param first_line: first body line, already read from f
+    :param grids: list of (inner, outer) grids, one per property column
+    :param outer_axes: arrays of the coordinates of each grid column (lon, lat)
+    :param inner_axes: arrays of the coordinates of each grid row (depth or lat)
+    :return: number of rows read
+    """
+    num_inner, num_outer = grids[0].shape
+    total = num_inner * num_outer
+    num_coords = len(outer_axes) + len(inner_axes)
+    #
+    # the coordinates as parsed with the grid values, to check the rows against
+    parsed = [np.zeros(len(axis)) for axis in outer_axes + inner_axes]
+    start = 0
+    for text in text_blocks(f, first_line, block_bytes):
+        block = _parse(text, num_coords + len(grids)).to_numpy()
+        stop = start + len(block)
+        if stop > total:
+            raise MetadataError("The CSV has more rows than the header counts", total)
+        outer_idx, inner_idx = np.divmod(np.arange(start, stop), num_inner)
+        #
+        # the first row of each point gives its lon/lat, the rows of the
+        # first point give the depths (lats), every row has to agree
+        rows = np.flatnonzero((inner_idx == 0) | (outer_idx == 0))
+        exact = _exact_cells(text, rows, num_coords, len(block))
+        if exact is None:
+            exact = block[rows, :num_coords]
+        for j, index in enumerate([outer_idx] * len(outer_axes) + [inner_idx] * len(inner_axes)):
+            axis = (outer_axes + inner_axes)[j]
+            defines = (inner_idx if j < len(outer_axes) else outer_idx)[rows] == 0
+            axis[index[rows[defines]]] = exact[defines, j]
+            parsed[j][index[rows[defines]]] = block[rows[defines], j]
+            bad = np.flatnonzero(block[:, j] != parsed[j][index])
+            if bad.size:
+                raise MetadataError("CSV rows are not in the order the converters write them, row",
+                                    start + int(bad[0]) + 1)
+        for grid, column in zip(grids, block.T[num_coords:]):
+            values = column.astype(grid.dtype)
+            values[np.isnan(values)] = NODATA
+            grid[inner_idx, outer_idx] = values
+            release_pages(grid)
+        start = stop
+    if start != total:
+        raise MetadataError("The CSV has fewer rows than the header counts", start, total)
+    return start
+
+
+def _read_wide(f, grid, empty, block_bytes):
+    """
+    Fill a grid from wide format rows.
+
+    :return: list of the first cell of each row, as text
+    """
+    num_rows, num_cols = grid.shape
+    labels = []
+    start = 0
+    for text in text_blocks(f, "", block_bytes):
+        frame = _parse(text, num_cols + 1, label_text=True)
+        stop = start + len(frame)
+        if stop > num_rows:
+            raise MetadataError("The CSV has more rows than the header counts", num_rows)
+        labels += frame[0].tolist()
+        values = frame.iloc[:, 1:].to_numpy(dtype=grid.dtype)
+        if not np.isnan(empty):
+            values[np.isnan(values)] = empty
+        grid[start:stop] = values
+        release_pages(grid)
+        start = stop
+    if start != num_rows:
+        raise MetadataError("The CSV has fewer rows than the header counts", start, num_rows)
+    return labels
+
+
+def _wide_names(line, kind):
+    """
+    :return: list of coordinate arrays of the grid columns, [lon, lat] or [lon]
+    """
+    names = next(csv.reader([line]))[1:]
+    if kind == "h":
+        return [np.array(names, dtype=np.float64)]
+    lat, lon = zip(*(name.strip("()").split(",") for name in names)) if names else ((), ())
+    return [np.array(lon, dtype=np.float64), np.array(lat, dtype=np.float64)]
+
+
+def _decimals(text):
+    return len(text) - text.index(".") - 1 if "." in text else 0
+
+
+def slice_lats(labels, obj):
+    """
+    :param labels: lat labels of a wide horizontal slice, as text
+    :return: lat list, the regular axis of the metadata when it rounds to the labels
+    """
+    values = np.array(labels, dtype=np.float64)
+    try:
+        axis = axis_values(regular_axes(obj, {"lat_list": len(values), "lon_list": 0})["lat_list"])
+    except (MetadataError, KeyError):
+        return values
+    tolerance = 0.5 * 10.0 ** -min(_decimals(text) for text in labels) + 1e-9
+    if len(values) and np.abs(axis - values).max() <= tolerance:
+        return axis
+    return values
+
+
+def output_prefix(csv_file):
+    """
+    :return: default prefix of the pairs read from a CSV, the CSV name
+             without _c_data.csv or _h_data.csv and with _csv2bin, so the
+             pair the CSV was converted from is not overwritten
+    """
+    name = strip_compression(csv_file)
+    if name.endswith(".csv"):
+        name = name[:-len(".csv")]
+    for suffix in ("_data", "_c", "_h"):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name + OUTPUT_SUFFIX
+
+
+def pair_files(prefix, kind, prop=None):
+    """
+    :return: (data file, meta file) written for a property
+    """
+    base = prefix + ("_" + prop if prop else "") + "_" + kind
+    return base + "_data.bin", base + "_meta.json"
+
+
+def _read_grids(f, first_line, files, kind, fmt, num_rows, num_cols, block_bytes):
+    """
+    Write the grids of the CSV body to the data files.
+
+    :param files: list of (data file, meta file) to write
+
+    :return: (outer axes, inner axes, wide format row labels or None)
+    """
+    grids = [np.lib.format.open_memmap(data_file, mode="w+", dtype=np.float32, shape=(num_rows, num_cols))
+             for data_file, _ in files]
+    labels = None
+    if fmt == "wide":
+        outer_axes = _wide_names(first_line, kind)
+        if len(outer_axes[0]) != num_cols:
+            raise MetadataError("The CSV has a different number of columns than the header counts",
+                                len(outer_axes[0]), num_cols)
+        labels = _read_wide(f, grids[0], WIDE_EMPTY[kind], block_bytes)
+        inner_axes = [np.array(labels, dtype=np.float64)]
+    else:
+        outer_axes = [np.zeros(num_cols) for _ in range(2 if kind == "c" else 1)]
+        inner_axes = [np.zeros(num_rows)]
+        _read_long(f, first_line, grids, outer_axes, inner_axes, block_bytes)
+    for grid in grids:
+        grid.flush()
+    return outer_axes, inner_axes, labels
+
+
+def read_csv(csv_file, prefix=None, block_bytes=BLOCK_BYTES, force=False):
+    """
+    Convert a converter CSV back to data/metadata pairs.
+
+    The pairs are written to temporary files and renamed once the whole CSV
+    is read, so a CSV that fails to parse leaves no files behind and does
+    not touch the files already there.
+
+    :param prefix: output prefix, <prefix>_c_data.bin and <prefix>_c_meta.json
+                   (_h_ for horizontal slices, <prefix>_vp_c_... for _all files),
+                   defaults to output_prefix(csv_file)
+    :param block_bytes: CSV text parsed at a time
+    :param force: overwrite existing data and meta files
+    :return: list of (data file, meta file) written
+    """
+    if prefix is None:
+        prefix = output_prefix(csv_file)
+    with open_input(csv_file) as f:
+        fields, columns, first_line = read_header(f)
+        kind, fmt, props = csv_layout(fields, columns, first_line)
+        if "Skip_nodata" in fields:
+            raise MetadataError("The CSV was written without its NoData rows (--skip-nodata), "
+                                "it does not hold the whole grid")
+        num_rows, num_cols = grid_shape(fields, kind)
+        files = [pair_files(prefix, kind, prop if fmt == "all" else None) for prop in props]
+        existing = [name for pair in files for name in pair if os.path.exists(name)]
+        if existing and not force:
+            raise MetadataError("Not overwriting existing files", *existing)
+        tmp_files = [(data_file + ".tmp", meta_file + ".tmp") for data_file, meta_file in files]
+        try:
+            outer_axes, inner_axes, labels = _read_grids(f, first_line, tmp_files, kind, fmt, num_rows,
+                                                         num_cols, block_bytes)
+            for (_, meta_file), prop in zip(tmp_files, props):
+                obj = header_metadata(fields, prop if fmt == "all" else None)
+                obj["lon_list"] = outer_axes[0].tolist()
+                if kind == "c":
+                    obj["lat_list"] = outer_axes[1].tolist()
+                    obj["depth_list"] = inner_axes[0].tolist()
+                    obj.setdefault("num_x", num_cols)
+                    obj.setdefault("num_y", num_rows)
+                else:
+                    lat = inner_axes[0]
+                    if fmt == "wide":
+                        lat = slice_lats(labels, obj)
+                    obj["lat_list"] = lat.tolist()
+                    #
+                    # horizontal slice metadata counts one more point than the lists
+                    obj["num_x"] = num_cols + 1
+                    obj["num_y"] = num_rows + 1
+                obj["datapoints"] = num_rows * num_cols
+                with open(meta_file, "w") as mf:
+                    json.dump(obj, mf)
+        except BaseException:
+            #
+            # do not leave partly written files behind, only the temporary
+            # files of this run are removed
+            for name in (name for pair in tmp_files for name in pair):
+                if os.path.exists(name):
+                    os.remove(name)
+            raise
+
+    for pair, tmp_pair in zip(files, tmp_files):
+        for name, tmp in zip(pair, tmp_pair):
+            os.replace(tmp, name)
+    return files
@@ -0,0 +1,327 @@
+"""
+csvwriter.py
+
+Vectorized writer for the long CSV format produced by the _line and _all
+converters, one row per grid point:
+
+    lon,lat,depth,val[,val...]     (cross section)
+    lon,lat,val[,val...]           (horizontal slice)
+
+The grids are 2D numpy arrays indexed [inner][outer] (depth/lat by
+horizontal point/lon), and rows are written with the inner index varying
+fastest, which is the order of the original nested for loops.
+
+The wide format of the plain converters, one CSV row per grid row, is
+written by write_wide_csv with the fixed-point formatting of floatfmt.py.
+"""
+import csv
+
+import numpy as np
+
+from .floatfmt import DECIMALS, WIDTH, fixed_chars, join_rows, text_chars
+from .gridio import iter_row_blocks, release_pages
+from .pipeline import run_pipeline
+
+# value UCVM plotting uses for points outside of the model
+NODATA = -1
+
+# number of CSV rows formatted and written per block
+BLOCK_ROWS = 1 << 16
+
+# number of values formatted and written per block of wide rows, formatting
+# takes about 100 bytes of temporary arrays per value
+WIDE_BLOCK_POINTS = 1 << 18
+
+# which properties of a row have to be NoData for valid_rows to skip it
+NODATA_POLICIES = ("all", "any")
+
+
+def format_values(values):
+    """
+    Render every value of a float array as text.
+
+    Values are rendered exactly like '{0}'.format(v) renders a numpy
+    float32 scalar, that is as the shortest repr of the value promoted to
+    a python float.  Each distinct value is only formatted once.
+
+    :param values: numpy float array
+    :return: list of str, one per value in C order
+    """
+    values = np.ascontiguousarray(values).ravel()
+    # unique on the bit pattern keeps -0.0 and 0.0 apart
+    if values.dtype == np.float32:
+        bits = values.view(np.int32)
+    else:
+        values = values.astype(np.float64)
+        bits = values.view(np.int64)
+    uniq, first, inverse = np.unique(bits, return_index=True, return_inverse=True)
+    text = np.array(list(map(repr, values[first].astype(np.float64).tolist())), dtype=object)
+    return text[inverse.ravel()].tolist()
+
+
+def mask_nodata(values, nodata=NODATA):
+    """
+    :return: copy of values with the nodata points replaced by nan
+    """
+    return np.where(values == nodata, values.dtype.type(np.nan), values)
+
+
+def iter_blocks(num_outer, num_inner, block_rows=BLOCK_ROWS, mask=None):
+    """
+    Split the rows of a long format table into blocks.
+
+    :param mask: bool array from valid_rows, only its True rows are
+                 returned, a block then holds at most block_rows rows
+    :return: generator of (outer_idx, inner_idx) index arrays, one pair per block
+    """
+    total = num_outer * num_inner
+    for start in range(0, total, block_rows):
+        stop = min(start + block_rows, total)
+        rows = np.arange(start, stop)
+        if mask is not None:
+            rows = rows[mask[start:stop]]
+            if not len(rows):
+                continue
+        yield np.divmod(rows, num_inner)
+
+
+def valid_rows(grids, num_outer, num_inner, nodata_values=(NODATA,), policy="all"):
+    """
+    Find the long format rows to write when the NoData rows are skipped.
+
+    A value is NoData when it is nan or one of nodata_values.  Policy all
+    skips a row when all of its properties are NoData, the others are
+    written as nan, and policy any skips it when any one is.  The grids are
+    compared a block of grid rows at a time.
+
+    :param grids: list of 2D arrays, one per property column, may be memory mapped
+    :param nodata_values: values of points without data
+    :param policy: all or any
+    :return: bool array, True for the rows to write, in long format row order
+    """
+    if policy not in NODATA_POLICIES:
+        raise ValueError("NoData policy is not one of %s: %s" % ("/".join(NODATA_POLICIES), policy))
+    mask = np.full(num_outer * num_inner, policy == "any")
+    #
+    # long format rows are grid columns of grid rows, the transpose of the grid
+    rows = mask.reshape(num_outer, num_inner)
+    for grid in grids:
+        for start, block in iter_row_blocks(grid, num_rows=num_inner, num_cols=num_outer):
+            valid = ~np.isnan(block)
+            for value in nodata_values:
+                valid &= block != value
+            if policy == "any":
+                rows[:, start:start + len(block)] &= valid.T
+            else:
+                rows[:, start:start + len(block)] |= valid.T
+    return mask
+
+
+def read_values(grid, outer_idx, inner_idx, nodata=NODATA):
+    """
+    :return: values of grid at one block of rows, with nodata points replaced by nan
+    """
+    #
+    # only the part of the grid this block covers is read, so memory
+    # mapped grids are streamed a block at a time
+    outer_lo = outer_idx[0]
+    outer_hi = outer_idx[-1] + 1
+    if outer_hi - outer_lo > 1:
+        inner_lo, inner_hi = 0, inner_idx.max() + 1
+    else:
+        inner_lo, inner_hi = inner_idx[0], inner_idx[-1] + 1
+    window = np.asarray(grid[inner_lo:inner_hi, outer_lo:outer_hi])
+    values = mask_nodata(window[inner_idx - inner_lo, outer_idx - outer_lo], nodata)
+    release_pages(grid)
+    return values
+
+
+def line_blocks(outer_cols, inner_cols, grids, nodata=NODATA, block_rows=BLOCK_ROWS, mask=None):
+    """
+    Read the values of the long format rows a block at a time.
+
+    :param mask: bool array from valid_rows of the rows to read, None reads all
+    :return: generator of (outer_idx, inner_idx, list of value arrays, one per grid)
+    """
+    for outer_idx, inner_idx in iter_blocks(len(outer_cols[0]), len(inner_cols[0]), block_rows, mask):
+        yield outer_idx, inner_idx, [read_values(grid, outer_idx, inner_idx, nodata) for grid in grids]
+
+
+def stacked_blocks(grids, num_outer, num_inner, nodata=NODATA, block_rows=BLOCK_ROWS, mask=None):
+    """
+    Read the values of the long format rows a block at a time, the values
+    of every grid of a block copied into one array with one row per grid
+    point in row order and one column per grid, so a row and all of its
+    properties are contiguous.
+
+    :param grids: list of 2D arrays of the same shape, may be memory mapped
+    :return: generator of (outer_idx, inner_idx, list of value arrays, one per grid)
+    """
+    dtype = np.result_type(*grids)
+    total = num_outer * num_inner
+    for start in range(0, total, block_rows):
+        stop = min(start + block_rows, total)
+        if mask is None:
+            rows = np.arange(start, stop)
+        else:
+            rows = start + np.flatnonzero(mask[start:stop])
+            if not len(rows):
+                continue
+        #
+        # long format rows are grid columns of grid rows, the transpose of
+        # the grid, a block within one grid column only reads its rows
+        outer_lo, outer_hi = start // num_inner, (stop - 1) // num_inner + 1
+        if outer_hi - outer_lo > 1:
+            inner_lo, inner_hi = 0, num_inner
+        else:
+            inner_lo, inner_hi = start % num_inner, (stop - 1) % num_inner + 1
+        stack = np.empty((outer_hi - outer_lo, inner_hi - inner_lo, len(grids)), dtype=dtype)
+        for p, grid in enumerate(grids):
+            stack[:, :, p] = np.asarray(grid[inner_lo:inner_hi, outer_lo:outer_hi]).T
+            release_pages(grid)
+        outer_idx, inner_idx = np.divmod(rows, num_inner)
+        values = stack.reshape(-1, len(grids))[(outer_idx - outer_lo) * (inner_hi - inner_lo) + inner_idx - inner_lo]
+        yield outer_idx, inner_idx, list(mask_nodata(values, nodata).T)
+
+
+def format_line_block(outer_str, inner_str, block):
+    """
+    :param outer_str, inner_str: coordinate columns as object arrays of text
+    :param block: (outer_idx, inner_idx, list of value arrays) from line_blocks
+    :return: text of the CSV rows of a block
+    """
+    outer_idx, inner_idx, values = block
+    #
+    # coordinate columns are broadcast from the axes
+    columns = [c[outer_idx].tolist() for c in outer_str]
+    columns += [c[inner_idx].tolist() for c in inner_str]
+    for v in values:
+        columns.append(format_values(v))
+    return '\n'.join(map(','.join, zip(*columns)))
+
+
+def write_line_csv(f, outer_cols, inner_cols, grids, nodata=NODATA, block_rows=BLOCK_ROWS, workers=0,
+                   mask=None, stack=False):
+    """
+    Write grids as long format CSV rows.
+
+    :param f: open text file
+    :param outer_cols: coordinate lists, one entry per grid column
+                       ([lonlist, latlist] for a cross section, [lonlist] for a slice)
+    :param inner_cols: coordinate lists, one entry per grid row
+                       ([depthlist] for a cross section, [latlist] for a slice)
+    :param grids: list of 2D arrays, one per property column, may be memory mapped
+    :param nodata: value written out as nan
+    :param block_rows: number of rows formatted per write
+    :param workers: formatter threads of a read/format/write pipeline (see
+                    pipeline.py), 0 runs the stages one after the other
+    :param mask: bool array from valid_rows of the rows to write, None writes all
+    :param stack: read more than one grid with stacked_blocks
+    :return: number of rows written
+    """
+    num_outer = len(outer_cols[0])
+    num_inner = len(inner_cols[0])
+    if num_outer == 0 or num_inner == 0:
+        return 0
+    outer_str = [np.array(list(map(str, c)), dtype=object) for c in outer_cols]
+    inner_str = [np.array(list(map(str, c)), dtype=object) for c in inner_cols]
+
+    def write(text):
+        f.write(text)
+        f.write('\n')
+
+    if stack and len(grids) > 1:
+        blocks = stacked_blocks(grids, num_outer, num_inner, nodata, block_rows, mask)
+    else:
+        blocks = line_blocks(outer_cols, inner_cols, grids, nodata, block_rows, mask)
+    run_pipeline(blocks, lambda block: format_line_block(outer_str, inner_str, block), write, workers)
+    return num_outer * num_inner if mask is None else int(np.count_nonzero(mask))
+
+
+def format_column(values):
+    """
+    Render a list of json values as text the way pandas to_csv renders the
+    column they make: whole numbers as is when the list has nothing else,
+    otherwise numbers as the repr of a python float, None and nan as an
+    empty cell and anything else with str.
+
+    :return: list of str, one per value
+    """
+    def number(v):
+        return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+    if all(isinstance(v, int) and number(v) for v in values):
+        return [str(v) for v in values]
+    if all(v is None or number(v) for v in values):
+        return ["" if v is None or v != v else repr(float(v)) for v in values]
+    return ["" if v is None else str(v) for v in values]
+
+
+def write_columns_csv(f, names, columns):
+    """
+    Write lists of values as CSV columns, with a header of the column names.
+
+    :param f: open text file
+    :param names: header names, one per column
+    :param columns: lists of json values of the same length, one per column
+    :return: number of rows written
+    """
+    writer = csv.writer(f, lineterminator="\n")
+    writer.writerow(names)
+    rows = list(zip(*map(format_column, columns)))
+    writer.writerows(rows)
+    return len(rows)
+
+
+def label_chars(labels, decimals=DECIMALS, significant=None, width=0):
+    """
+    :return: (chars, lengths) of the first column of a wide table, floats
+             are formatted like the grid values and integers as is
+    """
+    values = np.asarray(labels)
+    if values.dtype.kind in "iu":
+        return text_chars([str(v) for v in labels])
+    return fixed_chars(values.astype(np.float64), decimals, significant, width)
+
+
+def write_wide_csv(f, names, labels, grid, empty=None, decimals=DECIMALS, significant=None,
+                   block_points=WIDE_BLOCK_POINTS, workers=0):
+    """
+    Write a grid as wide format CSV rows, one per grid row.
+
+    :param f: open text file
+    :param names: header names, the first column followed by one per grid column
+    :param labels: first column values, one per grid row
+    :param grid: 2D array, may be memory mapped, only the first len(labels)
+                 rows and len(names) - 1 columns are written
+    :param empty: grid value written as an empty cell, nan always is
+    :param decimals: number of decimals of the values
+    :param significant: write enough decimals for this many significant digits instead
+    :param block_points: approximate number of values formatted per write
+    :param workers: formatter threads of a read/format/write pipeline (see
+                    pipeline.py), 0 runs the stages one after the other
+    :return: number of rows written
+    """
+    csv.writer(f, lineterminator="\n").writerow(names)
+    num_rows = len(labels)
+    num_cols = len(names) - 1
+    if num_rows == 0:
+        return 0
+    #
+    # the default is exactly the '{:5.4f}' the converters always used,
+    # other formats are not padded
+    width = WIDTH if decimals == DECIMALS and significant is None else 0
+    label_text = label_chars(labels, decimals, significant, width)
+
+    def format_block(block):
+        start, block = block
+        stop = start + len(block)
+        if empty is not None:
+            block[block == empty] = np.nan
+        columns = [(label_text[0][start:stop], label_text[1][start:stop])]
+        if num_cols:
+            columns.append(fixed_chars(block, decimals, significant, width))
+        return join_rows(columns, stop - start)
+
+    run_pipeline(iter_row_blocks(grid, block_points, num_rows, num_cols), format_block, f.write, workers)
+    return num_rows
@@ -0,0 +1,145 @@
+"""
+decimate.py
+
+Lighter preview versions of cross sections and horizontal slices.
+
+Two ways of thinning a grid:
+
+    decimate      keep every Nth row and column, a strided view of the
+                  memory mapped grid, so the rows in between are not read
+    block mean    average blocks of N rows by M columns into one point,
+                  skipping NoData points (-1 in cross sections, 0.0 in
+                  horizontal slices, and nan) so they do not pull the
+                  average down.  A block without any data is NoData.
+
+Grid rows are depths for cross sections and lats for horizontal slices,
+columns are the horizontal points and lons.  Blocks at the end of the
+grid that are cut short average the points they have.
+
+The metadata is thinned to match: the coordinate lists hold the kept
+points, or the mean coordinate of each block, the point counts and
+spacings are updated and min, max and mean are left as the statistics of
+the whole grid.
+"""
+import numpy as np
+
+from .gridio import BLOCK_POINTS, release_pages
+from .window import coordinate_text, cut_counts
+
+# NoData value of each kind of grid
+CROSS_SECTION_NODATA = -1.0
+HORIZONTAL_SLICE_NODATA = 0.0
+
+
+def block_mean(grid, factors, nodata, block_points=BLOCK_POINTS):
+    """
+    :param grid: 2D array, may be memory mapped
+    :param factors: (rows, cols) of grid points averaged into one
+    :param nodata: value of points without data
+    :param block_points: approximate number of grid points read at a time
+    :return: float32 array of the block means, nodata where a block has no data
+    """
+    fr, fc = factors
+    num_rows, num_cols = grid.shape
+    out_rows, out_cols = -(-num_rows // fr), -(-num_cols // fc)
+    out = np.empty((out_rows, out_cols), dtype=np.float32)
+    step = max(1, block_points // max(1, fr * num_cols))
+    for start in range(0, out_rows, step):
+        stop = min(start + step, out_rows)
+        values = np.array(grid[start * fr:stop * fr], dtype=np.float64)
+        valid = (values != nodata) & ~np.isnan(values)
+        #
+        # pad the last rows and columns up to whole blocks, padding is not valid
+        padded = np.zeros(((stop - start) * fr, out_cols * fc))
+        padded[:values.shape[0], :num_cols] = np.where(valid, values, 0.0)
+        count = np.zeros(padded.shape)
+        count[:values.shape[0], :num_cols] = valid
+        shape = (stop - start, fr, out_cols, fc)
+        sums = padded.reshape(shape).sum(axis=(1, 3))
+        counts = count.reshape(shape).sum(axis=(1, 3))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[start:stop] = np.where(counts > 0, sums / counts, nodata)
+        release_pages(grid)
+    return out
+
+
+def axis_mean(values, factor):
+    """
+    :return: list of the means of each group of factor values, the last
+             group may be shorter
+    """
+    values = np.asarray(values, dtype=np.float64)
+    groups = -(-len(values) // factor)
+    padded = np.zeros(groups * factor)
+    padded[:len(values)] = values
+    counts = np.full(groups, float(factor))
+    counts[-1] = len(values) - (groups - 1) * factor
+    return (padded.reshape(groups, factor).sum(axis=1) / counts).tolist()
+
+
+def _spacing(value, factor):
+    return coordinate_text(round(float(value) * factor, 10))
+
+
+def _thin(values, factor, mean):
+    return axis_mean(values, factor) if mean else values[::factor]
+
+
+def _factors(decimate, block):
+    if block is not None:
+        return tuple(block), True
+    return (decimate, decimate), False
+
+
+def _grids(grids, factors, mean, nodata):
+    if mean:
+        return [block_mean(grid, factors, nodata) for grid in grids]
+    return [grid[::factors[0], ::factors[1]] for grid in grids]
+
+
+def thin_cross_section(obj, grids, decimate=None, block=None):
+    """
+    :param grids: list of grids sharing the metadata obj
+    :param decimate: keep every decimate-th depth and horizontal point
+    :param block: (depths, points) averaged into one point, instead of decimate
+    :return: (thinned metadata, list of thinned grids)
+    """
+    factors, mean = _factors(decimate, block)
+    fr, fc = factors
+    thin = dict(obj)
+    thin["depth_list"] = _thin(obj["depth_list"], fr, mean)
+    thin["lat_list"] = _thin(obj["lat_list"], fc, mean)
+    thin["lon_list"] = _thin(obj["lon_list"], fc, mean)
+    cut_counts(obj, thin, len(thin["depth_list"]), len(thin["lat_list"]))
+    thin["starting_depth"] = coordinate_text(thin["depth_list"][0])
+    thin["ending_depth"] = coordinate_text(thin["depth_list"][-1])
+    thin["vertical_spacing"] = _spacing(obj["vertical_spacing"], fr)
+    if "horizontal_spacing" in obj:
+        thin["horizontal_spacing"] = _spacing(obj["horizontal_spacing"], fc)
+    thin["lat1"], thin["lon1"] = coordinate_text(thin["lat_list"][0]), coordinate_text(thin["lon_list"][0])
+    thin["lat2"], thin["lon2"] = coordinate_text(thin["lat_list"][-1]), coordinate_text(thin["lon_list"][-1])
+    return thin, _grids(grids, factors, mean, CROSS_SECTION_NODATA)
+
+
+def thin_horizontal_slice(obj, grids, decimate=None, block=None):
+    """
+    :param grids: list of grids sharing the metadata obj
+    :param decimate: keep every decimate-th lat and lon
+    :param block: (lats, lons) averaged into one point, instead of decimate
+    :return: (thinned metadata, list of thinned grids)
+
+    The spacing becomes "lat spacing,lon spacing" when the two differ.
+    lat2 and lon2, the end of the slice, do not change.
+    """
+    factors, mean = _factors(decimate, block)
+    fr, fc = factors
+    thin = dict(obj)
+    thin["lat_list"] = _thin(obj["lat_list"], fr, mean)
+    thin["lon_list"] = _thin(obj["lon_list"], fc, mean)
+    cut_counts(obj, thin, len(thin["lat_list"]), len(thin["lon_list"]))
+    thin["lat1"], thin["lon1"] = coordinate_text(thin["lat_list"][0]), coordinate_text(thin["lon_list"][0])
+    if fr == fc:
+        thin["spacing"] = _spacing(obj["spacing"], fr)
+    else:
+        thin["spacing"] = _spacing(obj["spacing"], fr) + "," + _spacing(obj["spacing"], fc)
+    return thin, _grids(grids, factors, mean, HORIZONTAL_SLICE_NODATA)
@@ -0,0 +1,224 @@
+"""
+floatfmt.py
+
+Vectorized fixed-point formatting of float arrays, the replacement for
+passing float_format='{:5.4f}'.format to DataFrame.to_csv, which calls
+python once per cell.
+
+Values are turned into a right aligned character matrix with numpy integer
+arithmetic: each value is scaled by 10**decimals, rounded half to even and
+its digits are peeled off one column at a time.  Cells that are nan or
+padding are masked out by their text length.  For float32 data (the UCVM
+grids) the scaled value is exact for up to 12 decimals, so the text is
+identical to '{:.{decimals}f}'.format(value).  Values that cannot be done
+exactly this way (float64 values that are not float32 values, inf, very
+large magnitudes) fall back to python formatting.  nan is written as an
+empty cell, like pandas does.
+
+    decimals=4              fixed number of decimals, '{:.4f}'
+    significant=5           enough decimals for 5 significant digits,
+                            '{:.{d}f}' with d = max(0, 5 - integer digits)
+"""
+import numpy as np
+
+# default cell format of the wide converters, '{:5.4f}'
+DECIMALS = 4
+WIDTH = 5
+
+# scaled values below this are exact integers in a float64
+_EXACT_LIMIT = 2.0 ** 53
+
+# most decimals for which float32 * 10**decimals is exact in a float64
+_MAX_EXACT_DECIMALS = 12
+
+_INT_POW10 = 10 ** np.arange(19, dtype=np.int64)
+_FLOAT_POW10 = 10.0 ** np.arange(-45, 40)
+
+_SPACE, _MINUS, _DOT, _ZERO = ord(" "), ord("-"), ord("."), ord("0")
+
+# text of every 4 digit group as one uint32, digits are peeled off 4 at a time
+_GROUP = 4
+_GROUP_TEXT = np.frombuffer("".join("%04d" % i for i in range(10 ** _GROUP)).encode(),
+                            dtype=np.uint32)
+
+
+def integer_digits(values):
+    """
+    :return: int array, position of the leading digit of each value,
+             e.g. 1 for 3.2, 4 for 3056.5, -1 for 0.02, -2 for 0.002, 1 for 0.0
+    """
+    ax = np.abs(np.asarray(values, dtype=np.float64))
+    e = np.searchsorted(_FLOAT_POW10, ax, side="right") - 45
+    return np.where(ax == 0.0, 1, e)
+
+
+def value_decimals(values, decimals=DECIMALS, significant=None):
+    """
+    :return: int array, number of decimals used for each value
+    """
+    if significant is None:
+        return np.full(np.shape(values), decimals, dtype=np.int64)
+    d = significant - integer_digits(values)
+    return np.clip(d, 0, _MAX_EXACT_DECIMALS).astype(np.int64)
+
+
+def python_fixed(value, decimals, width=0):
+    """
+    :return: text of one value, the reference the vectorized path matches
+    """
+    return '{:{w}.{d}f}'.format(value, w=width, d=decimals)
+
+
+def _digit_block(n, ndig, neg, decimals, num_cols):
+    """
+    :return: (len(n), num_cols) uint8 array of the right aligned text of
+             the scaled integers n, all with the same number of decimals,
+             columns in front of the text are not blanked
+    """
+    chars = np.full((n.size, num_cols), _SPACE, dtype=np.uint8)
+    nint = int(ndig.max())
+    #
+    # peel off the digits, least significant first, a 4 digit group per divmod
+    num_digits = nint + decimals
+    num_groups = -(-num_digits // _GROUP)
+    groups = np.empty((n.size, num_groups), dtype=np.uint32)
+    for k in range(num_groups - 1, -1, -1):
+        q = n // 10 ** _GROUP
+        groups[:, k] = _GROUP_TEXT[n - q * 10 ** _GROUP]
+        n = q
+    digits = groups.view(np.uint8)[:, num_groups * _GROUP - num_digits:]
+    end = num_cols
+    if decimals:
+        chars[:, end - decimals:] = digits[:, nint:]
+        chars[:, end - decimals - 1] = _DOT
+        end -= decimals + 1
+    #
+    # leading zeros of the integer part are left in place, they fall
+    # outside the text length, the sign goes in front of the digits
+    chars[:, end - nint:end] = digits[:, :nint]
+    rows = np.flatnonzero(neg)
+    chars[rows, end - ndig[rows] - 1] = _MINUS
+    return chars
+
+
+def fixed_chars(values, decimals=DECIMALS, significant=None, width=WIDTH):
+    """
+    Format a float array in fixed-point notation.
+
+    :param values: float array, any shape, formatted in C order
+    :param decimals: number of decimals
+    :param significant: use enough decimals for this many significant digits instead
+    :param width: minimum text width, shorter text is padded on the left
+    :return: (chars, lengths), chars is a (N, W) uint8 array holding the text
+             of each value right aligned in its last lengths[i] columns,
+             lengths the length of each text, 0 for nan
+    """
+    v = np.ascontiguousarray(values).ravel()
+    with np.errstate(invalid="ignore"):
+        x = v.astype(np.float64)
+    nan = np.isnan(x)
+    if significant is None:
+        d = decimals
+    else:
+        d = value_decimals(x, decimals, significant)
+
+    with np.errstate(invalid="ignore", over="ignore"):
+        scaled = np.rint(np.abs(x) * _FLOAT_POW10[np.minimum(d, 39) + 45])
+        slow = ~nan & ~(scaled < _EXACT_LIMIT)
+    if np.any(d > _MAX_EXACT_DECIMALS):
+        slow |= ~nan & (d > _MAX_EXACT_DECIMALS)
+    if v.dtype != np.float32:
+        slow |= ~nan & (x.astype(np.float32).astype(np.float64) != x)
+    fast = ~(nan | slow)
+
+    n = np.where(fast, scaled, 0.0).astype(np.int64)
+    ndig = np.maximum(1, np.searchsorted(_INT_POW10, n // _INT_POW10[np.minimum(d, 18)], side="right"))
+    neg = np.signbit(x) & fast
+    natural = neg + ndig + (d > 0) + d
+    lengths = np.where(fast, np.maximum(natural, width), 0)
+
+    slow_idx = np.flatnonzero(slow)
+    slow_text = [python_fixed(x[i], np.broadcast_to(d, x.shape)[i], width).encode() for i in slow_idx]
+    if slow_text:
+        lengths[slow_idx] = [len(t) for t in slow_text]
+
+    num_cols = int(lengths.max()) if lengths.size else 0
+    if significant is None:
+        if v.size:
+            chars = _digit_block(n, ndig, neg, decimals, num_cols)
+        else:
+            chars = np.empty((0, 0), dtype=np.uint8)
+    else:
+        chars = np.full((v.size, num_cols), _SPACE, dtype=np.uint8)
+        for dv in np.unique(d[fast]):
+            rows = np.flatnonzero(fast & (d == dv))
+            chars[rows] = _digit_block(n[rows], ndig[rows], neg[rows], int(dv), num_cols)
+    #
+    # text padded to the width gets blank columns in front
+    padded = fast & (natural < width)
+    for length in np.unique(natural[padded]):
+        chars[np.flatnonzero(padded & (natural == length)), :num_cols - length] = _SPACE
+    for i, text in zip(slow_idx, slow_text):
+        chars[i] = _SPACE
+        chars[i, num_cols - len(text):] = np.frombuffer(text, dtype=np.uint8)
+    return chars, lengths
+
+
+def format_fixed(values, decimals=DECIMALS, significant=None, width=WIDTH):
+    """
+    :return: list of str, the fixed-point text of each value, '' for nan
+    """
+    chars, lengths = fixed_chars(values, decimals, significant, width)
+    num_cols = chars.shape[1]
+    return [row[num_cols - n:].tobytes().decode() if n else "" for row, n in zip(chars, lengths)]
+
+
+def text_chars(strings):
+    """
+    :return: (chars, lengths) right aligned character matrix of a list of str
+    """
+    encoded = [s.encode() for s in strings]
+    lengths = np.array([len(s) for s in encoded], dtype=np.int64)
+    num_cols = int(lengths.max()) if lengths.size else 0
+    chars = np.full((len(encoded), num_cols), _SPACE, dtype=np.uint8)
+    flat = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    rows = np.repeat(np.arange(len(encoded)), lengths)
+    ends = np.cumsum(lengths)
+    cols = np.arange(flat.size) - np.repeat(ends - lengths, lengths) + num_cols - np.repeat(lengths, lengths)
+    chars[rows, cols] = flat
+    return chars, lengths
+
+
+def join_rows(columns, num_rows):
+    """
+    Join right aligned cells into CSV rows.
+
+    :param columns: list of (chars, lengths) per column, chars has num_rows
+                    rows for a single column or num_rows * k rows for a
+                    block of k columns stored row major
+    :return: str of the CSV rows, each ending in a newline
+    """
+    parts = []
+    widths = []
+    for chars, lengths in columns:
+        ncol = chars.shape[0] // num_rows if num_rows else 0
+        parts.append((chars.reshape(num_rows, ncol, chars.shape[1]), lengths.reshape(num_rows, ncol)))
+        widths.append(chars.shape[1])
+    width = max(widths) if widths else 0
+    total = sum(p[0].shape[1] for p in parts)
+    #
+    # every cell is padded to the same width with a separator after it,
+    # then the padding is masked out
+    cells = np.full((num_rows, total, width + 1), _SPACE, dtype=np.uint8)
+    lengths = np.empty((num_rows, total), dtype=np.int64)
+    start = 0
+    for chars, lens in parts:
+        ncol = chars.shape[1]
+        cells[:, start:start + ncol, width - chars.shape[2]:width] = chars
+        lengths[:, start:start + ncol] = lens
+        start += ncol
+    cells[:, :, width] = ord(",")
+    cells[:, -1, width] = ord("\n")
+    pos = np.arange(width + 1)
+    keep = (pos >= width - lengths[:, :, None]) | (pos == width)
+    return cells[keep].tobytes().decode()
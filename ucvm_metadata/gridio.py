@@ -0,0 +1,60 @@
+"""
+gridio.py
+
+Access to the UCVM plotting data files (*_data.bin).  These are plain .npy
+float32 arrays, 2D for cross sections and horizontal slices.
+
+Grids are memory mapped by default so that only the blocks being converted
+are resident, which keeps peak memory flat however large the input is.
+"""
+import mmap
+
+import numpy as np
+
+# number of grid points read per block when streaming a grid
+BLOCK_POINTS = 1 << 20
+
+
+def load_grid(datafile, mmap_mode='r'):
+    """
+    :param datafile: .npy data file (*_data.bin)
+    :param mmap_mode: numpy memory map mode, None reads the whole array in
+    :return: numpy array of the grid
+    """
+    return np.load(datafile, mmap_mode=mmap_mode)
+
+
+def release_pages(grid):
+    """
+    Hand the resident pages of a memory mapped grid back to the OS.
+
+    The pages stay in the page cache, so touching them again is cheap, but
+    they no longer count against this process.  Does nothing for arrays
+    that are not memory mapped or where madvise is not available.
+    """
+    base = grid
+    while base is not None and not isinstance(base, mmap.mmap):
+        base = getattr(base, "base", None)
+    if base is not None and hasattr(base, "madvise") and hasattr(mmap, "MADV_DONTNEED"):
+        base.madvise(mmap.MADV_DONTNEED)
+
+
+def iter_row_blocks(grid, block_points=BLOCK_POINTS, num_rows=None, num_cols=None):
+    """
+    Iterate over a 2D grid in blocks of whole rows.
+
+    :param grid: 2D numpy array, possibly memory mapped
+    :param block_points: approximate number of points per block
+    :param num_rows: only iterate over the first num_rows rows
+    :param num_cols: only return the first num_cols columns of each row
+    :return: generator of (start_row, block) tuples
+    """
+    if num_rows is None:
+        num_rows = grid.shape[0]
+    if num_cols is None:
+        num_cols = grid.shape[1]
+    step = max(1, block_points // max(1, num_cols))
+    for start in range(0, num_rows, step):
+        stop = min(start + step, num_rows)
+        yield start, np.array(grid[start:stop, :num_cols])
+        release_pages(grid)
@@ -0,0 +1,264 @@
+"""
+headers.py
+
+The '# Key: value' comment headers written at the top of each CSV file.
+"""
+from .metadata import property_label
+
+# properties of the _all converters, in column order
+ALL_PROPERTIES = ("vp", "vs", "density")
+
+CROSS_SECTION_HEADER = '''\
+# Title: {title}
+# CVM(abbr): {cvm}
+# Data_type: {data_type}
+# Start_depth(m): {starting_depth} 
+# End_depth(m): {ending_depth} 
+# Vert_spacing(m): {vertical_spacing}
+# Depth_pts: {depth_pts} 
+# Horizontal_pts: {horizontal_pts} 
+# Total_pts: {datapoints}
+# Min_v: {min}
+# Max_v: {max}
+# Mean_v: {mean}
+# Num_x: {num_x}
+# Num_y: {num_y}
+# Lat1: {lat1}
+# Lon1: {lon1}
+# Lat2: {lat2}
+# Lon2: {lon2}
+'''
+
+CROSS_SECTION_LINE_HEADER = '''\
+# Title: {title}
+# CVM(abbr): {cvm}
+# Data_type: {data_type}
+# Start_depth(m): {starting_depth} 
+# End_depth(m): {ending_depth} 
+# Vert_spacing(m): {vertical_spacing}
+# Horizontal_spacing(m): {horizontal_spacing}
+# Depth_pts: {depth_pts} 
+# Horizontal_pts: {horizontal_pts} 
+# Total_pts: {datapoints}
+# Min_v: {min}
+# Max_v: {max}
+# Mean_v: {mean}
+# Num_x: {num_x}
+# Num_y: {num_y}
+# Lat1: {lat1}
+# Lon1: {lon1}
+# Lat2: {lat2}
+# Lon2: {lon2}
+# Lon,Lat,Depth(m),{data_type}(m/s)
+'''
+
+CROSS_SECTION_MULTI_HEADER = '''\
+# Title: {title}
+# CVM(abbr): {cvm}
+# Data_type: {data_types}
+# Start_depth(m): {starting_depth} 
+# End_depth(m): {ending_depth} 
+# Vert_spacing(m): {vertical_spacing}
+# Horizontal_spacing(m): {horizontal_spacing}
+# Depth_pts: {depth_pts} 
+# Horizontal_pts: {horizontal_pts} 
+# Total_pts: {datapoints}
+{property_stats}# Num_x: {num_x}
+# Num_y: {num_y}
+# Lat1: {lat1}
+# Lon1: {lon1}
+# Lat2: {lat2}
+# Lon2: {lon2}
+# Lon,Lat,Depth(m),{labels}
+'''
+
+HORIZONTAL_SLICE_HEADER = '''\
+# Title: {title}
+# CVM(abbr): {cvm}
+# Data_type: {data_type}
+# Depth(m): {depth} 
+# Spacing(degree): {spacing}
+# Lon_pts: {lon_pts} 
+# Lat_pts: {lat_pts} 
+# Total_pts: {datapoints}
+# Min_v: {min}
+# Max_v: {max}
+# Mean_v: {mean}
+# Lat1: {lat1}
+# Lon1: {lon1}
+# Lat2: {lat2}
+# Lon2: {lon2}
+'''
+
+HORIZONTAL_SLICE_LINE_HEADER = HORIZONTAL_SLICE_HEADER + '''\
+# Lon,Lat,{label}
+'''
+
+HORIZONTAL_SLICE_MULTI_HEADER = '''\
+# Title: {title}
+# CVM(abbr): {cvm}
+# Data_type: {data_types} 
+# Depth(m): {depth} 
+# Spacing(degree): {spacing}
+# Lon_pts: {lon_pts} 
+# Lat_pts: {lat_pts} 
+# Total_pts: {datapoints}
+{property_stats}# Lat1: {lat1}
+# Lon1: {lon1}
+# Lat2: {lat2}
+# Lon2: {lon2}
+# Lon,Lat,{labels}
+'''
+
+# min, max and mean lines of one property of a multi property header
+PROPERTY_STATS = '''\
+# {name} Min_v: {min}
+# {name} Max_v: {max}
+# {name} Mean_v: {mean}
+'''
+
+VERTICAL_PROFILE_HEADER = '''\
+# Title:{title}
+# CVM(abbr):{cvm} 
+# Lat:{lat1}
+# Lon:{lon1}
+# Start_{kind}(m):{start}
+# End_{kind}(m):{end} 
+# Vert_spacing(m):{vertical_spacing}
+'''
+
+VERTICAL_PROFILE_COMMENT_HEADER = '''\
+# Title:{title}
+# CVM(abbr):{cvm} 
+# Lat:{lat1}
+# Lon:{lon1}
+# Start_{kind}(m):{start}
+# End_{kind}(m):{end}  
+# Vert_spacing(m):{vertical_spacing}
+# Comment:{comment}
+'''
+
+SKIP_NODATA_HEADER = '''\
+# Skip_nodata: {policy}
+# NoData: {nodata}
+# Rows: {rows}
+'''
+
+
+def _multi_fields(objs, props):
+    """
+    :return: dict of the data_types, property_stats and labels fields of a
+             multi property header, the stats from the metadata of each property
+    """
+    return {
+        "data_types": ",".join(props),
+        "property_stats": "".join(PROPERTY_STATS.format(name=name, min=obj["min"], max=obj["max"], mean=obj["mean"])
+                                  for name, obj in zip(props, objs)),
+        "labels": ",".join(property_label(prop) for prop in props),
+    }
+
+
+def cross_section_header(obj):
+    """
+    :return: header of the wide format cross section csv
+    """
+    return CROSS_SECTION_HEADER.format(
+        depth_pts=len(obj["depth_list"]),
+        horizontal_pts=len(obj["lat_list"]),
+        **obj)
+
+
+def cross_section_line_header(obj):
+    """
+    :return: header of the long format (lon,lat,depth,val) cross section csv
+    """
+    return CROSS_SECTION_LINE_HEADER.format(
+        depth_pts=len(obj["depth_list"]),
+        horizontal_pts=len(obj["lat_list"]),
+        **obj)
+
+
+def cross_section_multi_header(obj, objs, props):
+    """
+    :param obj: metadata of the points written, e.g. cut to a window
+    :param objs: metadata of each property, for its min/max/mean
+    :param props: property names, in column order
+    :return: header of the long format (lon,lat,depth,prop,prop,...) cross section csv
+    """
+    fields = dict(obj)
+    fields.update(_multi_fields(objs, props))
+    return CROSS_SECTION_MULTI_HEADER.format(
+        depth_pts=len(obj["depth_list"]),
+        horizontal_pts=len(obj["lat_list"]),
+        **fields)
+
+
+def horizontal_slice_header(obj):
+    """
+    :return: header of the wide format horizontal slice csv
+    """
+    return HORIZONTAL_SLICE_HEADER.format(
+        lon_pts=len(obj["lon_list"]),
+        lat_pts=len(obj["lat_list"]),
+        **obj)
+
+
+def horizontal_slice_line_header(obj, label):
+    """
+    :return: header of the long format (lon,lat,val) horizontal slice csv
+    """
+    return HORIZONTAL_SLICE_LINE_HEADER.format(
+        lon_pts=len(obj["lon_list"]),
+        lat_pts=len(obj["lat_list"]),
+        label=label,
+        **obj)
+
+
+def horizontal_slice_multi_header(obj, objs, props):
+    """
+    :param obj: metadata of the points written, e.g. cut to a window
+    :param objs: metadata of each property, for its min/max/mean
+    :param props: property names, in column order
+    :return: header of the long format (lon,lat,prop,prop,...) horizontal slice csv
+    """
+    fields = dict(obj)
+    fields.update(_multi_fields(objs, props))
+    return HORIZONTAL_SLICE_MULTI_HEADER.format(
+        lon_pts=len(obj["lon_list"]),
+        lat_pts=len(obj["lat_list"]),
+        **fields)
+
+
+def vertical_profile_header(mobj, title):
+    """
+    :param title: title line, the scripts use the output file name
+    :return: header of the vertical profile csv
+    """
+    if "starting_depth" in mobj:
+        kind, start, end = "depth", mobj["starting_depth"], mobj["ending_depth"]
+    else:
+        kind, start, end = "elevation", mobj["starting_elevation"], mobj["ending_elevation"]
+    template = VERTICAL_PROFILE_COMMENT_HEADER if "comment" in mobj else VERTICAL_PROFILE_HEADER
+    return template.format(
+        title=title,
+        kind=kind,
+        cvm=mobj["cvm"],
+        lat1=mobj["lat1"],
+        lon1=mobj["lon1"],
+        start=start,
+        end=end,
+        vertical_spacing=mobj["vertical_spacing"],
+        comment=mobj.get("comment"))
+
+
+def skip_nodata_header(header_str, policy, nodata_values, rows):
+    """
+    Add the fields of a long format file written without its NoData rows:
+    the policy (all or any property NoData skips a row), the values taken
+    as NoData and the number of rows written, before the column names line.
+
+    :return: header of the long format csv with the skipped NoData fields
+    """
+    lines = header_str.splitlines(True)
+    nodata = ",".join([repr(float(v)) for v in nodata_values] + ["nan"])
+    return "".join(lines[:-1]) + SKIP_NODATA_HEADER.format(policy=policy, nodata=nodata, rows=rows) + lines[-1]
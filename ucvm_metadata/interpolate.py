@@ -0,0 +1,175 @@
+"""
+interpolate.py
+
+Values of cross sections, horizontal slices and vertical profiles (see
+loader.py) at arbitrary points, vectorized over millions of points:
+
+    horizontal slice    bilinear in lat and lon
+    cross section       bilinear in depth and the position along the path
+    vertical profile    linear in depth
+
+Coordinates are turned into fractional indexes along the metadata axes
+with one np.interp per axis.  Cross section points are placed on the path
+by their lon, or their lat when the path runs more north-south than
+east-west; how far a point is off the path is not checked.
+
+NoData points (-1 in cross sections, 0.0 in horizontal slices, and nan)
+are left out and the weights of the other points around a position are
+rescaled to add up to 1, so a point next to the edge of the data gets the
+value of the data next to it.  A point with no data around it is nan, and
+so are points outside the axes.  With strict=True a point is nan as soon
+as one of the points it is interpolated from is NoData.
+
+    >>> from ucvm_metadata import load_horizontal_slice, interpolate_horizontal_slice
+    >>> hs = load_horizontal_slice("h_data.bin", "h_meta.json")
+    >>> interpolate_horizontal_slice(hs, lon, lat)
+
+Points are processed a chunk at a time, so temporary memory does not grow
+with the number of points, and grids stay memory mapped: only the pages
+around the points are read.
+"""
+import numpy as np
+
+from .axes import axis_values
+
+# NoData value of the grids
+CROSS_SECTION_NODATA = -1.0
+HORIZONTAL_SLICE_NODATA = 0.0
+
+# points interpolated at a time
+CHUNK_POINTS = 1 << 18
+
+
+def axis_position(axis, x):
+    """
+    :param axis: increasing or decreasing coordinates
+    :param x: coordinates to look up, a number or an array
+    :return: float64 array of the fractional index of x along axis, nan outside of it
+    """
+    axis = np.asarray(axis, dtype=np.float64)
+    x = np.atleast_1d(np.asarray(x, dtype=np.float64))
+    if len(axis) > 1 and axis[-1] < axis[0]:
+        axis = axis[::-1]
+        flip = True
+    else:
+        flip = False
+    position = np.interp(x, axis, np.arange(len(axis), dtype=np.float64))
+    position[(x < axis[0]) | (x > axis[-1]) | np.isnan(x)] = np.nan
+    if flip:
+        position = len(axis) - 1 - position
+    return position
+
+
+def path_axis(lon, lat):
+    """
+    :return: (coordinates, 0 for lon or 1 for lat) of the coordinate a
+             cross section path changes most in
+    """
+    lon, lat = axis_values(lon), axis_values(lat)
+    if abs(lon[-1] - lon[0]) >= abs(lat[-1] - lat[0]):
+        return lon, 0
+    return lat, 1
+
+
+def _interpolate_chunk(data, index, nodata, strict):
+    """
+    :param index: list of fractional index arrays, one per axis of data, without nan
+    :return: float64 interpolated values
+    """
+    lows = []
+    weights = []
+    for i, n in zip(index, data.shape):
+        low = np.minimum(np.floor(i).astype(np.intp), max(n - 2, 0))
+        lows.append(low)
+        weights.append(i - low)
+    total = np.zeros(len(index[0]))
+    weight_sum = np.zeros(len(index[0]))
+    bad = np.zeros(len(index[0]), dtype=bool)
+    for corner in np.ndindex(*(2 if n > 1 else 1 for n in data.shape)):
+        values = np.asarray(data[tuple(low + c for low, c in zip(lows, corner))], dtype=np.float64)
+        w = np.ones(len(values))
+        for c, weight in zip(corner, weights):
+            w *= weight if c else 1.0 - weight
+        missing = np.isnan(values)
+        if nodata is not None:
+            missing |= values == nodata
+        bad |= missing & (w > 0)
+        w[missing] = 0.0
+        total += w * np.where(missing, 0.0, values)
+        weight_sum += w
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result = total / weight_sum
+    result[weight_sum <= 0] = np.nan
+    if strict:
+        result[bad] = np.nan
+    return result
+
+
+def interpolate(data, positions, nodata=None, strict=False, chunk_points=CHUNK_POINTS):
+    """
+    Linear interpolation of a 1D or 2D array at fractional indexes.
+
+    :param data: array, may be memory mapped
+    :param positions: list of fractional index arrays, one per axis of data,
+                      nan for points outside
+    :param nodata: value of points without data, nan always is
+    :param strict: nan for points next to NoData instead of leaving it out
+    :return: float64 array of values, nan for no value
+    """
+    positions = [np.asarray(p, dtype=np.float64) for p in positions]
+    result = np.full(len(positions[0]), np.nan)
+    for start in range(0, len(result), chunk_points):
+        stop = min(start + chunk_points, len(result))
+        chunk = [p[start:stop] for p in positions]
+        inside = np.logical_and.reduce([~np.isnan(p) for p in chunk])
+        if inside.any():
+            result[start:stop][inside] = _interpolate_chunk(data, [p[inside] for p in chunk], nodata, strict)
+    return result
+
+
+def horizontal_slice_positions(hs, lon, lat):
+    """
+    :return: (row, column) fractional indexes of lon, lat points in a HorizontalSlice
+    """
+    return axis_position(axis_values(hs.lat), lat), axis_position(axis_values(hs.lon), lon)
+
+
+def cross_section_positions(cs, lon, lat, depth):
+    """
+    :return: (row, column) fractional indexes of lon, lat, depth points in a CrossSection
+    """
+    axis, column = path_axis(cs.lon, cs.lat)
+    return axis_position(axis_values(cs.depth), depth), axis_position(axis, (lon, lat)[column])
+
+
+def interpolate_horizontal_slice(hs, lon, lat, strict=False):
+    """
+    :param hs: HorizontalSlice
+    :param lon, lat: arrays of point coordinates, numbers are broadcast
+    :return: float64 array of bilinear interpolated values, nan for no value
+    """
+    lon, lat = np.broadcast_arrays(*(np.atleast_1d(np.asarray(a, dtype=np.float64)) for a in (lon, lat)))
+    return interpolate(hs.data, horizontal_slice_positions(hs, lon, lat), HORIZONTAL_SLICE_NODATA, strict)
+
+
+def interpolate_cross_section(cs, lon, lat, depth, strict=False):
+    """
+    :param cs: CrossSection
+    :param lon, lat, depth: arrays of point coordinates, lon and lat place
+                            the point along the path, numbers are broadcast
+    :return: float64 array of values interpolated bilinearly in depth and
+             along the path, nan for no value
+    """
+    lon, lat, depth = np.broadcast_arrays(*(np.atleast_1d(np.asarray(a, dtype=np.float64))
+                                            for a in (lon, lat, depth)))
+    return interpolate(cs.data, cross_section_positions(cs, lon, lat, depth), CROSS_SECTION_NODATA, strict)
+
+
+def interpolate_vertical_profile(vp, depth, prop="vs"):
+    """
+    :param vp: VerticalProfile
+    :param depth: array of depths, or elevations for an elevation profile, or one number
+    :param prop: vp, vs or density
+    :return: float64 array of values interpolated linearly in depth, nan outside the profile
+    """
+    return interpolate(vp.data[prop], [axis_position(axis_values(vp.depth), depth)])
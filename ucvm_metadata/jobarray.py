@@ -0,0 +1,210 @@
+"""
+jobarray.py
+
+Run a batch conversion (see batch.py) as the tasks of a cluster job
+array, like a Slurm --array, without a coordinator.  Every task discovers
+the same pairs and takes shard K of N of them:
+
+    ucvm_batch2csv.py --shard $SLURM_ARRAY_TASK_ID/100 -o csv 2ddata
+
+The pairs are split by input bytes, not by count: the largest pair goes
+to the shard with the fewest bytes so far, ties go to the lower shard and
+pairs of the same size are taken in data file order, so every task works
+out the same partition from the file names and sizes alone.
+
+Each task keeps a result manifest of its shard, rewritten after every
+pair so a task that is killed leaves the pairs it finished behind:
+
+    {"version": 1, "shard": 3, "shards": 100, "complete": true,
+     "directory": "2ddata", "recursive": false, "format": "wide", "compress": null, "output_dir": "csv",
+     "partition": {"pairs": 5000, "bytes": 81234567890},
+     "pairs": [{"kind": "c", "name": "la", "data_file": "2ddata/la_c_data.bin",
+                "meta_file": "2ddata/la_c_meta.json", "bytes": 16123456}, ...],
+     "results": [{"data_file": "2ddata/la_c_data.bin", "ok": true, "output": "csv/la_c_data.csv",
+                  "error": null, "seconds": 1.9, "bytes_in": 16123456, "bytes_out": 40123456}, ...],
+     "up_to_date": [...]}
+
+merge combines the result manifests of a run and reports the shards
+without a manifest, the pairs that were not converted (of unfinished
+tasks, or of the missing shards, found again by discovering the
+directory) and the pairs that failed.
+"""
+import heapq
+import json
+import os
+
+from .batch import discover
+from .metadata import MetadataError
+from .shards import shard_file
+
+RESULTS_NAME = "ucvm_batch_results.json"
+
+RESULTS_VERSION = 1
+
+
+def job_bytes(job):
+    """
+    :return: input bytes of a job, its data and meta file sizes
+    """
+    return os.path.getsize(job.data_file) + os.path.getsize(job.meta_file)
+
+
+def partition(jobs, count):
+    """
+    Split jobs into count shards of about the same input bytes.
+
+    :return: list of count lists of (job, bytes), each sorted by data file
+    """
+    shards = [[] for _ in range(count)]
+    heap = [(0, index) for index in range(count)]
+    sized = sorted(((job, job_bytes(job)) for job in jobs), key=lambda item: (-item[1], item[0].data_file))
+    for job, size in sized:
+        total, index = heapq.heappop(heap)
+        shards[index].append((job, size))
+        heapq.heappush(heap, (total + size, index))
+    return [sorted(shard, key=lambda item: item[0].data_file) for shard in shards]
+
+
+def results_file(directory, index, count, output_dir=None):
+    """
+    :return: default result manifest file name of shard index of count
+    """
+    return shard_file(os.path.join(output_dir if output_dir is not None else directory, RESULTS_NAME),
+                      index, count)
+
+
+def start_results(index, shards, directory, recursive=False, fmt="wide", compress=None, output_dir=None):
+    """
+    :param shards: every shard of the run, from partition
+    :return: result manifest of shard index, with no results yet
+    """
+    return {
+        "version": RESULTS_VERSION,
+        "shard": index,
+        "shards": len(shards),
+        "complete": False,
+        "directory": directory,
+        "recursive": recursive,
+        "format": fmt,
+        "compress": compress,
+        "output_dir": output_dir,
+        "partition": {"pairs": sum(len(shard) for shard in shards),
+                      "bytes": sum(size for shard in shards for _, size in shard)},
+        "pairs": [dict(job._asdict(), bytes=size) for job, size in shards[index]],
+        "results": [],
+        "up_to_date": [],
+    }
+
+
+def add_result(manifest, result):
+    """
+    Add a batch.Result to a result manifest.
+    """
+    manifest["results"].append({"data_file": result.job.data_file, "ok": result.ok, "output": result.output,
+                                "error": result.error, "seconds": result.seconds,
+                                "bytes_in": result.bytes_in, "bytes_out": result.bytes_out})
+
+
+def load_results(filename):
+    """
+    :return: result manifest dict
+    """
+    with open(filename) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != RESULTS_VERSION:
+        raise MetadataError("Unsupported batch result manifest version", filename, manifest.get("version"))
+    return manifest
+
+
+def _shard_jobs(manifest, missing):
+    """
+    :return: dict of shard index -> list of data files of the missing
+             shards, from the partition of the directory as it is now
+    """
+    jobs, _ = discover(manifest["directory"], manifest["recursive"])
+    shards = partition(jobs, manifest["shards"])
+    return {index: [job.data_file for job, _ in shards[index]] for index in missing}
+
+
+def merge(manifests):
+    """
+    Combine the result manifests of the tasks of one run.
+
+    :param manifests: list of result manifest dicts
+    :return: dict with the counts, missing shards, and the data files of
+             the pairs not converted, failed or converted by several tasks
+    """
+    if not manifests:
+        raise MetadataError("No batch result manifests to merge")
+    count = manifests[0]["shards"]
+    by_shard = {}
+    for manifest in manifests:
+        if manifest["shards"] != count:
+            raise MetadataError("Result manifests of different job arrays", count, manifest["shards"])
+        if manifest["shard"] in by_shard:
+            raise MetadataError("Two result manifests of shard", manifest["shard"])
+        by_shard[manifest["shard"]] = manifest
+
+    partitions = sorted({(m["partition"]["pairs"], m["partition"]["bytes"]) for m in manifests})
+    missing_shards = [index for index in range(count) if index not in by_shard]
+    not_converted = []
+    if missing_shards:
+        for index, data_files in sorted(_shard_jobs(manifests[0], missing_shards).items()):
+            not_converted.extend(data_files)
+
+    done = {}
+    for index in sorted(by_shard):
+        manifest = by_shard[index]
+        for result in manifest["results"]:
+            done.setdefault(result["data_file"], []).append(result)
+        for data_file in manifest["up_to_date"]:
+            done.setdefault(data_file, []).append({"data_file": data_file, "ok": True, "bytes_in": 0,
+                                                   "bytes_out": 0})
+        finished = set(r["data_file"] for r in manifest["results"]) | set(manifest["up_to_date"])
+        not_converted.extend(pair["data_file"] for pair in manifest["pairs"] if pair["data_file"] not in finished)
+
+    #
+    # a pair converted by two tasks, after the partition changed, is done
+    # when either one converted it
+    failed = [{"data_file": data_file, "error": results[-1]["error"]}
+              for data_file, results in sorted(done.items()) if not any(r["ok"] for r in results)]
+    return {
+        "shards": count,
+        "manifests": len(manifests),
+        "missing_shards": missing_shards,
+        "incomplete_shards": [index for index in sorted(by_shard) if not by_shard[index]["complete"]],
+        "partitions": [{"pairs": pairs, "bytes": size} for pairs, size in partitions],
+        "pairs": manifests[0]["partition"]["pairs"],
+        "succeeded": sum(1 for results in done.values() if any(r["ok"] for r in results)),
+        "failed": failed,
+        "not_converted": sorted(not_converted),
+        "duplicates": sorted(data_file for data_file, results in done.items() if len(results) > 1),
+        "bytes_in": sum(r["bytes_in"] for results in done.values() for r in results),
+        "bytes_out": sum(r["bytes_out"] for results in done.values() for r in results if r["ok"]),
+    }
+
+
+def format_merge(merged):
+    """
+    :return: the merge of a run as printable text
+    """
+    lines = []
+    for index in merged["missing_shards"]:
+        lines.append("MISSING SHARD: %d of %d" % (index, merged["shards"]))
+    for index in merged["incomplete_shards"]:
+        lines.append("INCOMPLETE SHARD: %d of %d" % (index, merged["shards"]))
+    for failure in merged["failed"]:
+        lines.append("FAILED: %s %s" % (failure["data_file"], failure["error"]))
+    for data_file in merged["not_converted"]:
+        lines.append("NOT CONVERTED: %s" % data_file)
+    for data_file in merged["duplicates"]:
+        lines.append("DUPLICATE: %s" % data_file)
+    if len(merged["partitions"]) > 1:
+        lines.append("WARNING: the tasks found different pairs: %s" % ", ".join(
+            "%(pairs)d pairs of %(bytes)d bytes" % p for p in merged["partitions"]))
+    lines.append("Merged %d of %d shards: converted %d of %d pairs, %d failed, %d not converted" % (
+        merged["manifests"], merged["shards"], merged["succeeded"], merged["pairs"], len(merged["failed"]),
+        len(merged["not_converted"])))
+    lines.append("In(MB): %.2f  Out(MB): %.2f" % (merged["bytes_in"] / 1e6, merged["bytes_out"] / 1e6))
+    return "\n".join(lines)
+
@@ -0,0 +1,133 @@
+"""
+loader.py
+
+In-process access to UCVM plotting data, without going through a CSV file.
+
+    >>> from ucvm_metadata import load_cross_section
+    >>> cs = load_cross_section("UCVM_71396357_c_data.bin", "UCVM_71396357_c_meta.json")
+    >>> cs.data.shape, cs.depth[:3]
+    ((101, 164), array([  0.,  50., 100.]))
+
+The grid is returned as a read-only memory mapped view of the data file,
+nothing is copied until it is used, so the returned objects can be shared
+between threads.  Coordinate axes are float64 numpy arrays, or with
+regular=True RegularAxis(start, step, count) tuples for the axes the
+metadata defines (see axes.py), which axis_values turns into arrays.
+regular=True assumes the stored lists follow the scalar fields and only
+compares sampled entries, a list that is off is returned as an array,
+verify=True compares every entry and raises MetadataError instead.
+
+cross_section_frame and horizontal_slice_frame return the wide table of
+the plain converters as a pandas DataFrame, built from the grid with a
+single constructor call.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from .axes import axis_values, read_axes
+from .gridio import load_grid
+from .metadata import (check_cross_section, check_horizontal_slice, check_vertical_profile,
+                       profile_depths, read_matprops, read_metadata)
+
+# data is depth by horizontal point, lon/lat are per horizontal point
+CrossSection = namedtuple("CrossSection", ["data", "lon", "lat", "depth", "meta"])
+
+# data is lat by lon
+HorizontalSlice = namedtuple("HorizontalSlice", ["data", "lon", "lat", "depth", "meta"])
+
+# data maps vp, vs, density to arrays along depth (or elevation)
+VerticalProfile = namedtuple("VerticalProfile", ["data", "lon", "lat", "depth", "is_depth", "meta"])
+
+
+def _axis(values):
+    return np.asarray(values, dtype=np.float64)
+
+
+def _read(meta_file, regular, verify):
+    """
+    :return: (metadata dict, dict of list key -> axis, dict of list key -> length or None)
+    """
+    if regular:
+        return read_axes(meta_file, verify)
+    obj = read_metadata(meta_file)
+    return obj, {key: _axis(obj[key]) for key in ("lon_list", "lat_list", "depth_list") if key in obj}, None
+
+
+def load_cross_section(data_file, meta_file, mmap_mode='r', regular=False, verify=False):
+    """
+    :param mmap_mode: numpy memory map mode, None reads the grid into memory
+    :param regular: keep the depth axis as a RegularAxis, without parsing depth_list
+    :param verify: with regular, check the derived axes against the stored lists
+    :return: CrossSection
+    """
+    obj, axes, lengths = _read(meta_file, regular, verify)
+    grid = load_grid(data_file, mmap_mode)
+    check_cross_section(obj, grid, lengths)
+    return CrossSection(grid, axes["lon_list"], axes["lat_list"], axes["depth_list"], obj)
+
+
+def load_horizontal_slice(data_file, meta_file, mmap_mode='r', regular=False, verify=False):
+    """
+    :param mmap_mode: numpy memory map mode, None reads the grid into memory
+    :param regular: keep the lat and lon axes as RegularAxis, without parsing the lists
+    :param verify: with regular, check the derived axes against the stored lists
+    :return: HorizontalSlice
+    """
+    obj, axes, lengths = _read(meta_file, regular, verify)
+    grid = load_grid(data_file, mmap_mode)
+    check_horizontal_slice(obj, grid, lengths)
+    return HorizontalSlice(grid, axes["lon_list"], axes["lat_list"], float(obj["depth"]), obj)
+
+
+def load_vertical_profile(matprops_file, meta_file, regular=False, verify=False):
+    """
+    :param regular: keep the depth (elevation) axis as a RegularAxis, without parsing the list
+    :param verify: with regular, check the derived axis against the stored list
+    :return: VerticalProfile
+    """
+    matprops = read_matprops(matprops_file)
+    if regular:
+        obj, axes, lengths = read_axes(meta_file, verify)
+        check_vertical_profile(obj, matprops, lengths)
+        is_depth = "starting_depth" in obj
+        ldlist = axes["depth" if is_depth else "elevation"]
+    else:
+        obj = read_metadata(meta_file)
+        check_vertical_profile(obj, matprops)
+        is_depth, ldlist = profile_depths(obj)
+        ldlist = _axis(ldlist)
+    data = {}
+    for key in ("vp", "vs", "density"):
+        data[key] = np.array([p[key] for p in matprops], dtype=np.float64)
+    return VerticalProfile(data, float(obj["lon1"]), float(obj["lat1"]), ldlist, is_depth, obj)
+
+
+def cross_section_frame(cs):
+    """
+    :param cs: CrossSection
+    :return: pandas DataFrame, one row per depth indexed by Depths[m] and
+             one "(lat,lon)" column per horizontal point
+    """
+    import pandas as pd
+
+    depth = axis_values(cs.depth)
+    names = ["(" + str(lat) + "," + str(lon) + ")"
+             for lat, lon in zip(axis_values(cs.lat).tolist(), axis_values(cs.lon).tolist())]
+    values = np.array(cs.data[:len(depth), :len(names)])
+    return pd.DataFrame(values, index=pd.Index(depth, name="Depths[m]"), columns=names, copy=False)
+
+
+def horizontal_slice_frame(hs):
+    """
+    :param hs: HorizontalSlice
+    :return: pandas DataFrame, one row per lat indexed by Lats and one
+             column per lon, points with value 0.0 are nan
+    """
+    import pandas as pd
+
+    lat = axis_values(hs.lat)
+    names = [str(lon) for lon in axis_values(hs.lon).tolist()]
+    grid = hs.data[:len(lat), :len(names)]
+    values = np.where(grid == 0.0, grid.dtype.type(np.nan), grid)
+    return pd.DataFrame(values, index=pd.Index(lat, name="Lats"), columns=names, copy=False)
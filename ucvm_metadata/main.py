@@ -0,0 +1,156 @@
+"""
+main.py
+
+The ucvm-meta command, one entry point for the converters of the scripts
+in bin/:
+
+    ucvm-meta profile v_matprops.json v_meta.json [output]
+    ucvm-meta cross [--format wide|line|all] c_data.bin c_meta.json [output]
+    ucvm-meta slice [--format wide|line|all] h_data.bin h_meta.json [output]
+
+--format all takes the vp, vs and density pairs and a required output file:
+
+    ucvm-meta cross --format all vp_data.bin vp_meta.json vs_data.bin vs_meta.json
+                                 density_data.bin density_meta.json all.csv
+
+and --format multi any number of pairs, named by their data_type, or a
+--glob pattern of them, and the output file:
+
+    ucvm-meta slice --format multi --glob 'la_*_h_meta.json' la_all.csv
+
+--shards N writes the output of cross and slice as N shard files and a
+manifest of them (see shards.py):
+
+    ucvm-meta slice --format line --shards 8 --shard-by lon h_data.bin h_meta.json la.csv
+
+Parsing the command line imports only argparse and cli.py.  A subcommand
+imports the converters when it runs, so startup stays short and the
+converters never import pandas (benchmarks/bench_startup.py checks both).
+"""
+import argparse
+import sys
+
+from .cli import add_converter_options, multi_pairs, profiler_from_args, run_converter
+
+FORMATS = ("wide", "line", "all", "multi")
+
+# (subcommand, format) -> converter function name in converters.py
+CONVERTERS = {
+    ("cross", "wide"): "convert_cross_section",
+    ("cross", "line"): "convert_cross_section_line",
+    ("cross", "all"): "convert_cross_section_all",
+    ("cross", "multi"): "convert_cross_section_multi",
+    ("slice", "wide"): "convert_horizontal_slice",
+    ("slice", "line"): "convert_horizontal_slice_line",
+    ("slice", "all"): "convert_horizontal_slice_all",
+    ("slice", "multi"): "convert_horizontal_slice_multi",
+}
+
+# short name of the data file of each grid subcommand, for the help text
+GRID_FILES = {"cross": "c", "slice": "h"}
+
+
+def _profile(args):
+    from .converters import convert_vertical_profile
+    convert_vertical_profile(args.matprops_file, args.meta_file, args.output_file,
+                             verbose=True, compress_threads=args.compress_threads,
+                             profiler=profiler_from_args(args))
+
+
+def _grid(args):
+    from . import converters
+    convert = getattr(converters, CONVERTERS[args.command, args.format])
+    options = dict(verbose=True, compress_threads=args.compress_threads, profiler=profiler_from_args(args),
+                   bbox=args.bbox, decimate=args.decimate, block_mean=args.block_mean,
+                   workers=args.pipeline_workers)
+    if args.command == "cross":
+        options["depth_range"] = args.depth_range
+    if args.format == "wide":
+        options.update(decimals=args.decimals, significant=args.significant)
+    else:
+        options.update(skip_nodata=args.skip_nodata, nodata_policy=args.nodata_policy)
+    if args.format == "multi":
+        pairs, output_file = multi_pairs(args.parser, args, GRID_FILES[args.command])
+        run_converter(convert, [pairs], output_file, args, **options)
+    elif args.format == "all":
+        run_converter(convert, args.files[:6], args.files[6], args, **options)
+    else:
+        run_converter(convert, args.files[:2], args.files[2] if len(args.files) > 2 else None, args, **options)
+
+
+def _check_grid_args(parser, args):
+    """
+    Check the number of files and the options of the format.
+    """
+    if args.glob and args.format != "multi":
+        parser.error("--glob only applies to --format multi")
+    counts = (7,) if args.format == "all" else (2, 3)
+    if args.format != "multi" and len(args.files) not in counts:
+        parser.error("--format %s takes %s files, got %d" % (args.format, " or ".join(map(str, counts)),
+                                                             len(args.files)))
+    if args.format != "wide" and (args.significant is not None or args.decimals != parser.get_default("decimals")):
+        parser.error("--decimals and --significant only apply to --format wide")
+    if args.format == "wide" and args.skip_nodata:
+        parser.error("--skip-nodata only applies to --format line and all")
+
+
+def build_parser():
+    """
+    :return: argparse.ArgumentParser of the ucvm-meta command
+    """
+    parser = argparse.ArgumentParser(prog="ucvm-meta", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", metavar="command", required=True)
+
+    profile = commands.add_parser("profile", help="vertical profile to CSV",
+                                  description="Convert a vertical profile to CSV.")
+    profile.add_argument("matprops_file", help="v_matprops.json")
+    profile.add_argument("meta_file", help="v_meta.json")
+    profile.add_argument("output_file", nargs="?",
+                         help="output file, defaults to the matprops file name with a .csv extension")
+    add_converter_options(profile)
+    profile.set_defaults(run=_profile)
+
+    for name, title in (("cross", "cross section"), ("slice", "horizontal slice")):
+        kind = GRID_FILES[name]
+        command = commands.add_parser(name, help="%s to CSV" % title,
+                                      description="Convert a %s to CSV, or a columnar file for the "
+                                                  "line and all formats." % title)
+        command.add_argument("files", nargs="+", metavar="file",
+                             help="%s_data.bin %s_meta.json [output], with --format all the vp, vs and "
+                                  "density data and meta files and the output, with --format multi "
+                                  "data and meta file pairs and the output" % (kind, kind))
+        command.add_argument("--format", choices=FORMATS, default="wide",
+                             help="wide: one row per grid row, line: one row per point, "
+                                  "all: one row per point with vp, vs and density, "
+                                  "multi: one row per point with the property of each pair (default: wide)")
+        command.add_argument("--glob", metavar="PATTERN",
+                             help="with --format multi, convert the pairs whose data or meta file names "
+                                  "match PATTERN, the files are then only the output file")
+        add_converter_options(command, wide=True, bbox=True, depth_range=name == "cross", thin=True,
+                              pipeline=True, skip_nodata=True, shards=True)
+        command.set_defaults(run=_grid, check=_check_grid_args, parser=command)
+    return parser
+
+
+def main(argv=None):
+    """
+    Run the ucvm-meta command.
+
+    :param argv: arguments without the program name, defaults to sys.argv[1:]
+    :return: exit status
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if "check" in args:
+        args.check(args.parser, args)
+    from .metadata import MetadataError
+    try:
+        args.run(args)
+    except MetadataError as e:
+        print("FAILED: %s" % " ".join(map(str, e.args)), file=sys.stderr)
+        return 1
+    except OSError as e:
+        print("FAILED: %s" % e, file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,206 @@
+"""
+metadata.py
+
+Reading and checking the metadata (json) files produced by the UCVM
+plotting routines.
+
+cross section _meta.json keys:
+    ['depth_list', 'color', 'horizontal_spacing', 'datapoints',
+     'starting_depth', 'title', 'vertical_spacing', 'data_type', 'max', 'outfile',
+     'lat1', 'lat2', 'ending_depth', 'lon_list', 'num_x', 'num_y', 'cvm', 'min',
+     'lon1', 'lat_list', 'lon2', 'mean']
+
+horizontal slice _meta.json keys:
+    ['num_y', 'lat1', 'data_type', 'lat2', 'color', 'max',
+     'title', 'spacing', 'configfile', 'lon_list', 'num_x',
+     'outfile', 'depth', 'cvm', 'min', 'datapoints', 'lon1',
+     'lat_list', 'lon2', 'installdir', 'mean']
+
+vertical profile _meta.json keys:
+    ['comment', 'lat1', 'lon1', 'data_type', 'starting_depth', 'ending_depth',
+     'depth', 'vertical_spacing', 'cvm', ...]
+    with starting_elevation, ending_elevation, elevation in place of
+    the depth keys for elevation profiles.
+"""
+import json
+import re
+
+# data_type -> column label
+PROPERTY_LABELS = {
+    "vp": "Vp(m/s)",
+    "vs": "Vs(m/s)",
+    "density": "Density(kg/m^3)",
+    "poisson": "PoissionRatio",
+}
+
+
+# keys of the per point coordinate lists, "depth" is a list in vertical
+# profiles and a single value in horizontal slices
+LIST_KEYS = ("lat_list", "lon_list", "depth_list", "depth", "elevation")
+
+_LIST_RE = re.compile(r'"(%s)"\s*:\s*\[' % "|".join(LIST_KEYS))
+
+
+class MetadataError(Exception):
+    """
+    Raised when a metadata file does not agree with its data file.
+    """
+    pass
+
+
+def read_metadata(file):
+    """
+    :return: the metadata json object as a dict
+    """
+    with open(file) as json_data:
+        return json.load(json_data)
+
+
+def read_metadata_lists(file):
+    """
+    Read a metadata file without parsing its coordinate lists.
+
+    The lists are cut out of the json text before it is parsed, so the
+    cost of reading the file no longer grows with the number of points.
+
+    :return: (metadata dict without the coordinate lists,
+              dict of list key -> json text of the list)
+    """
+    with open(file) as json_data:
+        text = json_data.read()
+    parts = []
+    lists = {}
+    pos = 0
+    for m in _LIST_RE.finditer(text):
+        if m.start() < pos:
+            continue
+        end = text.index("]", m.end()) + 1
+        lists[m.group(1)] = text[m.end() - 1:end]
+        parts.append(text[pos:m.end() - 1])
+        parts.append("null")
+        pos = end
+    parts.append(text[pos:])
+    obj = json.loads("".join(parts))
+    for key in lists:
+        del obj[key]
+    return obj, lists
+
+
+def list_length(text):
+    """
+    :return: number of entries of a json list of numbers, without parsing it
+    """
+    if text[1:-1].strip() == "":
+        return 0
+    return text.count(",") + 1
+
+
+def read_matprops(file):
+    """
+    :return: This returns a list of values as a dict, with vp, vs, density keys
+    """
+    with open(file) as json_data:
+        obj = json.load(json_data)
+        #
+        # vertical profile data is a list of objects, each object has vp, vs, rho
+        #
+        return obj["matprops"]
+
+
+def property_label(data_type):
+    """
+    :return: column label for a data_type, e.g. vs -> Vs(m/s)
+    """
+    if data_type not in PROPERTY_LABELS:
+        raise MetadataError("Unknown propertype type error type:", data_type)
+    return PROPERTY_LABELS[data_type]
+
+
+def _lengths(obj, keys, lengths):
+    if lengths is None:
+        return [len(obj[key]) for key in keys]
+    return [lengths[key] for key in keys]
+
+
+def check_cross_section(obj, grid, lengths=None):
+    """
+    Check a cross section grid against its metadata.
+
+    The lat and lon lists are the same length, one entry per horizontal
+    point, and the grid is depth by horizontal point.
+
+    :param lengths: dict of list key -> number of entries, for metadata
+                    read without its coordinate lists
+    """
+    num_depth, num_lat, num_lon = _lengths(obj, ["depth_list", "lat_list", "lon_list"], lengths)
+    npts = obj["datapoints"]
+    if num_lon != num_lat:
+        raise MetadataError("lat and lon lists are not the same list, which is assumption for these data files")
+    datasizes = grid.shape
+    if npts != datasizes[0] * datasizes[1]:
+        raise MetadataError("Number of depth points does not each number of 1ddata points. Exiting",
+                            npts, datasizes[0] * datasizes[1])
+    if num_lat * num_depth != npts:
+        raise MetadataError("Total points should equal the number of latlons times the number of data points",
+                            num_lat * num_depth, npts)
+
+
+def check_horizontal_slice(obj, grid, lengths=None):
+    """
+    Check a horizontal slice grid against its metadata.
+
+    The grid is lat by lon.
+
+    :param lengths: dict of list key -> number of entries, for metadata
+                    read without its coordinate lists
+    """
+    num_lat, num_lon = _lengths(obj, ["lat_list", "lon_list"], lengths)
+    npts = obj["datapoints"]
+    datasizes = grid.shape
+    if npts != datasizes[0] * datasizes[1]:
+        raise MetadataError("Number of depth points does not each number of 1ddata points. Exiting",
+                            npts, datasizes[0] * datasizes[1])
+    if num_lon * num_lat != npts:
+        raise MetadataError("Total points should equal the number of lats times the number of lons",
+                            num_lon * num_lat, npts)
+
+
+def check_same_grid(objs, grids, keys):
+    """
+    Check that the grids of several properties are on the same points.
+
+    :param objs: metadata of each grid, the first one is compared with the others
+    :param keys: metadata keys that have to be equal, e.g. the coordinate lists
+    """
+    for obj, grid in zip(objs[1:], grids[1:]):
+        if grid.shape != grids[0].shape:
+            raise MetadataError("Grids are not the same shape", grids[0].shape, grid.shape)
+        for key in keys:
+            if obj.get(key) != objs[0].get(key):
+                raise MetadataError("%s of %s does not match %s" % (key, obj.get("data_type"),
+                                                                    objs[0].get("data_type")))
+
+
+def profile_depths(obj):
+    """
+    :return: (is_depth, list of depth or elevation points) of a vertical profile
+    """
+    if "starting_depth" in obj:
+        return True, obj["depth"]
+    return False, obj["elevation"]
+
+
+def check_vertical_profile(obj, matprops, lengths=None):
+    """
+    Check a vertical profile matprops list against its metadata.
+
+    :param lengths: dict of list key -> number of entries, for metadata
+                    read without its coordinate lists
+    """
+    if lengths is None:
+        num_depth = len(profile_depths(obj)[1])
+    else:
+        num_depth = lengths["depth" if "starting_depth" in obj else "elevation"]
+    if num_depth != len(matprops):
+        raise MetadataError("Number of depth points does not each number of data points. Exiting",
+                            num_depth, len(matprops))
@@ -0,0 +1,207 @@
+"""
+pipeline.py
+
+Running a conversion as three overlapping stages joined by bounded queues:
+
+    reader      a thread that reads blocks of the grid (memory mapped row
+                blocks, see gridio.py)
+    formatter   turns each block into text, in the calling thread or with
+                more than one worker in a thread pool
+    writer      a thread that writes the text of the blocks in the order
+                they were read
+
+so reading the next block from a slow file system, formatting this one
+and writing the previous one happen at the same time.  The writer takes
+the blocks in read order whatever order the workers finish them in, so the
+output is the same as when the stages run one after the other.
+
+At most about QUEUE_BYTES of blocks and their text wait between the
+stages, whatever the number of workers: the reader waits for the budget
+before it reads another block, and a block counts against it until its
+text is written.  The formatter workers are threads, not processes, which
+would have to copy every block and its text between them.  Only reading a
+memory mapped grid, writing and compressing files and the numpy fixed-point
+formatting of the wide format release the GIL and overlap; the long format
+values are formatted with repr and joined in Python, so more workers only
+help it hide read and write latency.
+
+An exception in any stage stops the other two and is raised by run_pipeline.
+"""
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# bytes of blocks and text waiting between the stages
+QUEUE_BYTES = 8 << 20
+
+# formatter workers of the converters, 0 runs the stages one after the other
+PIPELINE_WORKERS = 1
+
+# seconds between checks for a stopped pipeline while waiting on a queue
+_POLL = 0.1
+
+_DONE = object()
+
+
+class _Budget:
+    """
+    Bytes of the blocks and text in flight between the stages.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.changed = threading.Condition()
+
+    def wait(self, stop):
+        """
+        :return: True once the bytes in flight are under the limit, False
+                 if the pipeline stopped first
+        """
+        with self.changed:
+            while self.used >= self.limit and not stop.is_set():
+                self.changed.wait(_POLL)
+        return not stop.is_set()
+
+    def add(self, size):
+        with self.changed:
+            self.used += size
+            self.changed.notify_all()
+
+
+def _item_bytes(item):
+    """
+    :return: bytes of the arrays and text of a block or its text, nested
+             in tuples and lists
+    """
+    if isinstance(item, (tuple, list)):
+        return sum(_item_bytes(i) for i in item)
+    if isinstance(item, str):
+        return len(item)
+    return getattr(item, "nbytes", 0)
+
+
+def _put(q, item, stop):
+    """
+    :return: True once item is queued, False if the pipeline stopped first
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(q, stop):
+    """
+    :return: next item of q, _DONE if the pipeline stopped first
+    """
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL)
+        except queue.Empty:
+            pass
+    return _DONE
+
+
+def _read(blocks, out, budget, stop, errors):
+    try:
+        for block in blocks:
+            budget.add(_item_bytes(block))
+            if not _put(out, block, stop) or not budget.wait(stop):
+                return
+        _put(out, _DONE, stop)
+    except BaseException as e:
+        errors.append(e)
+        stop.set()
+
+
+def _write(pending, write, budget, stop, errors):
+    try:
+        while True:
+            item = _get(pending, stop)
+            if item is _DONE:
+                return
+            text = item.result()
+            write(text)
+            budget.add(-_item_bytes(text))
+    except BaseException as e:
+        errors.append(e)
+        stop.set()
+
+
+def _formatted(text):
+    future = Future()
+    future.set_result(text)
+    return future
+
+
+def _format(format_block, block, budget):
+    """
+    :return: text of a block, which counts against the budget instead of the block
+    """
+    text = format_block(block)
+    budget.add(_item_bytes(text) - _item_bytes(block))
+    return text
+
+
+def run_pipeline(blocks, format_block, write, workers=PIPELINE_WORKERS, queue_bytes=QUEUE_BYTES):
+    """
+    :param blocks: iterable of blocks, iterated in the reader thread
+    :param format_block: function of a block returning its text
+    :param write: function writing the text of a block, called in block order
+    :param workers: formatter threads, 0 runs the three stages one after
+                    the other in the calling thread
+    :param queue_bytes: bytes of blocks and text waiting between the stages
+    :return: number of blocks written
+    """
+    if workers <= 0:
+        count = 0
+        for block in blocks:
+            write(format_block(block))
+            count += 1
+        return count
+
+    #
+    # the budget bounds the queues, one block or text is let through
+    # whatever its size
+    read_queue = queue.Queue()
+    write_queue = queue.Queue()
+    budget = _Budget(queue_bytes)
+    stop = threading.Event()
+    errors = []
+    reader = threading.Thread(target=_read, args=(blocks, read_queue, budget, stop, errors), daemon=True)
+    writer = threading.Thread(target=_write, args=(write_queue, write, budget, stop, errors), daemon=True)
+    pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    reader.start()
+    writer.start()
+    count = 0
+    try:
+        while True:
+            block = _get(read_queue, stop)
+            if block is _DONE:
+                break
+            #
+            # the writer waits on the futures in the order they are queued
+            if pool is not None:
+                item = pool.submit(_format, format_block, block, budget)
+            else:
+                item = _formatted(_format(format_block, block, budget))
+            if not _put(write_queue, item, stop):
+                break
+            count += 1
+        _put(write_queue, _DONE, stop)
+        writer.join()
+    except BaseException as e:
+        errors.append(e)
+    finally:
+        stop.set()
+        writer.join()
+        reader.join()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    if errors:
+        raise errors[0]
+    return count
@@ -0,0 +1,135 @@
+"""
+profiling.py
+
+Per stage timing of a conversion, for the --profile option of the scripts.
+
+Each converter runs in named stages:
+
+    read_metadata   json.load of the _meta.json file(s)
+    read_matprops   json.load of the vertical profile matprops file
+    load_grid       np.load of the .bin file(s), memory mapped
+    check           checking the grids against the metadata
+    window          cutting the grids to --bbox/--depth-range, if given
+    shard           cutting the grids to the part of one shard, for --shards
+    decimate        thinning the grids for --decimate/--block-mean, if given
+    mask            finding the rows with data for --skip-nodata, if given
+    write           formatting and writing the output, including reading
+                    the memory mapped grid pages
+
+and a Profiler records the wall time, CPU time, bytes read, bytes written
+and rows emitted of each.  The results are written to a json sidecar next
+to the output file, <output>.profile.json.  With cprofile_stage set that
+stage also runs under cProfile and its stats are dumped to
+<output>.<stage>.prof, to be read with pstats or snakeviz.
+"""
+import cProfile
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+SIDECAR_EXTENSION = ".profile.json"
+
+# stage with most of the run time, the default for cProfile
+HOT_STAGE = "write"
+
+
+class Profiler:
+    """
+    Records the wall and CPU time, bytes and rows of the stages of a conversion.
+    """
+
+    def __init__(self, cprofile_stage=None):
+        """
+        :param cprofile_stage: name of a stage to run under cProfile
+        """
+        self.stages = []
+        self.cprofile_stage = cprofile_stage
+        self._cprofile = None
+        self._start = (time.perf_counter(), time.process_time())
+
+    @contextmanager
+    def stage(self, name, bytes_read=0):
+        """
+        Time a stage.  The yielded dict can be updated with the bytes_read,
+        bytes_written and rows of the stage.
+        """
+        record = {"name": name, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                  "bytes_read": bytes_read, "bytes_written": 0, "rows": 0}
+        profile = None
+        if name == self.cprofile_stage:
+            if self._cprofile is None:
+                self._cprofile = cProfile.Profile()
+            profile = self._cprofile
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            if profile is not None:
+                profile.disable()
+            record["wall_seconds"] = time.perf_counter() - wall
+            record["cpu_seconds"] = time.process_time() - cpu
+            self._add(record)
+
+    def _add(self, record):
+        #
+        # a stage that runs more than once, like read_metadata of the _all
+        # converters, is added up into one entry
+        for previous in self.stages:
+            if previous["name"] == record["name"]:
+                for key in ("wall_seconds", "cpu_seconds", "bytes_read", "bytes_written", "rows"):
+                    previous[key] += record[key]
+                previous["calls"] += 1
+                return
+        record["calls"] = 1
+        self.stages.append(record)
+
+    def summary(self, converter=None, inputs=(), output=None):
+        """
+        :return: dict of the stages and totals of a conversion
+        """
+        wall, cpu = self._start
+        totals = {"wall_seconds": time.perf_counter() - wall, "cpu_seconds": time.process_time() - cpu}
+        for key in ("bytes_read", "bytes_written", "rows"):
+            totals[key] = sum(s[key] for s in self.stages)
+        return {
+            "converter": converter,
+            "inputs": list(inputs),
+            "output": output,
+            "stages": self.stages,
+            "total": totals,
+        }
+
+    def write(self, output_file_name, converter=None, inputs=()):
+        """
+        Write the json sidecar, and the cProfile stats if a stage was profiled.
+
+        :return: sidecar file name
+        """
+        summary = self.summary(converter, inputs, output_file_name)
+        if self._cprofile is not None:
+            summary["cprofile"] = "%s.%s.prof" % (output_file_name, self.cprofile_stage)
+            self._cprofile.dump_stats(summary["cprofile"])
+        sidecar = output_file_name + SIDECAR_EXTENSION
+        with open(sidecar, "w") as f:
+            json.dump(summary, f, indent=2)
+        return sidecar
+
+
+def stage(profiler, name, bytes_read=0):
+    """
+    :return: profiler.stage(name), or a context that records nothing when
+             profiler is None
+    """
+    if profiler is None:
+        return nullcontext({})
+    return profiler.stage(name, bytes_read)
+
+
+def file_sizes(*filenames):
+    """
+    :return: total size of the files
+    """
+    return sum(os.path.getsize(f) for f in filenames)
@@ -0,0 +1,158 @@
+"""
+query.py
+
+Point lookups in cross sections, horizontal slices and vertical profiles
+loaded with loader.py, for the query server (see server.py).
+
+A query point is (lon, lat, depth).  It is turned into a fractional
+position along each axis of the dataset:
+
+    horizontal slice    row from lat, column from lon, depth is ignored
+    cross section       row from depth, column from the position along
+                        the path, found from lon or lat, whichever the path
+                        changes most in, lat and lon off the path are ignored
+    vertical profile    row from depth, lon and lat are ignored
+
+and the value is the nearest grid point, or the linear (bilinear for the
+grids) interpolation of the points around it, see interpolate.py.  Points
+outside the axes and nearest points on NoData (-1 in cross sections, 0.0
+in horizontal slices) are nan, linear values leave NoData points out.
+
+Everything is vectorized over the points, a batch of points costs little
+more than one, and grids stay memory mapped: only the pages around the
+points are read.
+"""
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from .axes import axis_values
+from .interpolate import (CROSS_SECTION_NODATA, HORIZONTAL_SLICE_NODATA, axis_position,
+                          cross_section_positions, horizontal_slice_positions, interpolate)
+from .loader import load_cross_section, load_horizontal_slice, load_vertical_profile
+
+# a loaded dataset, source is a CrossSection, HorizontalSlice or VerticalProfile
+Dataset = namedtuple("Dataset", ["name", "kind", "source"])
+
+KINDS = {"c": "cross_section", "h": "horizontal_slice", "v": "vertical_profile"}
+
+METHODS = ("nearest", "linear")
+
+NODATA = {"cross_section": CROSS_SECTION_NODATA, "horizontal_slice": HORIZONTAL_SLICE_NODATA}
+
+# vertical profile property returned when none is asked for
+PROFILE_PROPERTY = "vs"
+
+
+def load_dataset(job):
+    """
+    :param job: batch.Job of a data/metadata pair
+    :return: Dataset, named by the metadata title
+    """
+    kind = KINDS[job.kind]
+    if kind == "cross_section":
+        source = load_cross_section(job.data_file, job.meta_file)
+    elif kind == "horizontal_slice":
+        source = load_horizontal_slice(job.data_file, job.meta_file)
+    else:
+        source = load_vertical_profile(job.data_file, job.meta_file)
+    #
+    # vertical profiles have no title, they are named after their files
+    name = source.meta.get("title") or os.path.basename(job.name)
+    return Dataset(name, kind, source)
+
+
+def load_datasets(jobs):
+    """
+    Load a list of pairs, a name used twice gets the file name added.
+
+    :return: (list of Dataset, list of (job, error text) of the pairs that failed to load)
+    """
+    datasets = []
+    failed = []
+    names = set()
+    for job in jobs:
+        try:
+            dataset = load_dataset(job)
+        except Exception as e:
+            failed.append((job, "%s: %s" % (type(e).__name__, e)))
+            continue
+        if dataset.name in names:
+            dataset = dataset._replace(name="%s (%s)" % (dataset.name, os.path.basename(job.name)))
+        names.add(dataset.name)
+        datasets.append(dataset)
+    return datasets, failed
+
+
+def describe(dataset):
+    """
+    :return: dict of the name, kind, cvm, data_type and extent of a dataset
+    """
+    source = dataset.source
+    info = {"name": dataset.name, "kind": dataset.kind, "cvm": source.meta.get("cvm"),
+            "title": source.meta.get("title"), "data_type": source.meta.get("data_type")}
+    depth = axis_values(source.depth) if dataset.kind != "horizontal_slice" else np.array([source.depth])
+    info["depth"] = [float(depth.min()), float(depth.max())]
+    if dataset.kind == "vertical_profile":
+        info["lon"], info["lat"] = [source.lon] * 2, [source.lat] * 2
+        info["shape"] = [len(depth)]
+    else:
+        lon, lat = axis_values(source.lon), axis_values(source.lat)
+        info["lon"] = [float(lon.min()), float(lon.max())]
+        info["lat"] = [float(lat.min()), float(lat.max())]
+        info["shape"] = list(source.data.shape)
+    return info
+
+
+def positions(dataset, points):
+    """
+    :param points: (N, 3) array of lon, lat, depth
+    :return: tuple of fractional indexes along each axis of the dataset's data
+    """
+    source = dataset.source
+    if dataset.kind == "horizontal_slice":
+        return horizontal_slice_positions(source, points[:, 0], points[:, 1])
+    if dataset.kind == "vertical_profile":
+        return (axis_position(axis_values(source.depth), points[:, 2]),)
+    return cross_section_positions(source, points[:, 0], points[:, 1], points[:, 2])
+
+
+def _values(dataset, prop):
+    if dataset.kind != "vertical_profile":
+        if prop is not None and prop != dataset.source.meta.get("data_type"):
+            raise ValueError("Dataset %s has no property %s" % (dataset.name, prop))
+        return dataset.source.data
+    prop = prop or PROFILE_PROPERTY
+    if prop not in dataset.source.data:
+        raise ValueError("Dataset %s has no property %s" % (dataset.name, prop))
+    return dataset.source.data[prop]
+
+
+def _nodata(values, dataset):
+    nodata = NODATA.get(dataset.kind)
+    if nodata is not None:
+        values[values == nodata] = np.nan
+    return values
+
+
+def query(dataset, points, method="nearest", prop=None):
+    """
+    :param points: (N, 3) array of lon, lat, depth
+    :param method: nearest or linear
+    :param prop: property of a vertical profile, vp, vs (default) or density
+    :return: float64 array of N values, nan outside the data or at NoData
+    """
+    if method not in METHODS:
+        raise ValueError("Unknown method:", method)
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    data = _values(dataset, prop)
+    if method == "linear":
+        return interpolate(data, positions(dataset, points), NODATA.get(dataset.kind))
+    index = positions(dataset, points)
+    inside = np.logical_and.reduce([~np.isnan(i) for i in index])
+    result = np.full(len(points), np.nan)
+    if inside.any():
+        values = np.asarray(data[tuple(np.rint(i[inside]).astype(np.intp) for i in index)], dtype=np.float64)
+        result[inside] = _nodata(values, dataset)
+    return result
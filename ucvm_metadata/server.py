@@ -0,0 +1,185 @@
+"""
+server.py
+
+A local HTTP server answering point queries on loaded datasets (see
+query.py), on a localhost port or a Unix socket.  The datasets are loaded
+once when the server starts and their grids stay memory mapped.
+
+    GET  /datasets      json list of the loaded datasets: name, kind, cvm,
+                        title, data_type, shape and lon/lat/depth extent
+
+    POST /query         json request
+                            {"dataset": name, "points": [[lon, lat, depth], ...],
+                             "method": "nearest" or "linear", "property": "vs"}
+                        json response
+                            {"values": [value or null, ...]}
+
+    POST /query?dataset=name&method=nearest&property=vs
+                        with Content-Type application/octet-stream: the
+                        body is the points as little endian float64 lon,
+                        lat, depth triples and the response the values as
+                        little endian float64, nan for no value
+
+Method and property are optional, nearest and the property of the
+dataset (vs for vertical profiles) by default.  Errors are returned with
+status 400 or 404 and a json {"error": message} body.  Connections are
+kept alive, so a client pays for the connection once.
+
+QueryClient talks to a server, at "http://host:port" or "unix:/path".
+"""
+import http.client
+import json
+import os
+import socket
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+import numpy as np
+
+from .query import describe, query
+
+BINARY = "application/octet-stream"
+
+DEFAULT_PORT = 8765
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Handles the requests of one connection, server.datasets maps names to Datasets.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self):
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        if getattr(self.server, "verbose", False):
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def _send(self, status, body, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/datasets":
+            self._send(404, {"error": "Unknown path: %s" % self.path})
+            return
+        self._send(200, [describe(d) for d in self.server.datasets.values()])
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if url.path != "/query":
+            self._send(404, {"error": "Unknown path: %s" % self.path})
+            return
+        binary = self.headers.get("Content-Type") == BINARY
+        try:
+            if binary:
+                request = {k: v[0] for k, v in parse_qs(url.query).items()}
+                points = np.frombuffer(body, dtype="<f8")
+            else:
+                request = json.loads(body)
+                if not isinstance(request, dict):
+                    raise ValueError("The query is a json object")
+                points = np.asarray(request.get("points", []), dtype=np.float64)
+            dataset = self.server.datasets.get(request.get("dataset"))
+            if dataset is None:
+                self._send(404, {"error": "Unknown dataset: %s" % request.get("dataset")})
+                return
+            if points.size % 3:
+                raise ValueError("Points are lon, lat, depth triples")
+            values = query(dataset, points.reshape(-1, 3), request.get("method", "nearest"),
+                           request.get("property"))
+        except (ValueError, TypeError) as e:
+            self._send(400, {"error": " ".join(str(a) for a in e.args)})
+            return
+        if binary:
+            self._send(200, values.astype("<f8").tobytes(), BINARY)
+        else:
+            self._send(200, {"values": [None if np.isnan(v) else v for v in values.tolist()]})
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    ThreadingHTTPServer on a Unix socket.
+    """
+    daemon_threads = True
+
+
+def make_server(datasets, host="127.0.0.1", port=DEFAULT_PORT, socket_path=None, verbose=False):
+    """
+    :param datasets: list of Dataset
+    :param socket_path: listen on this Unix socket instead of host:port
+    :return: server, call serve_forever() to run it
+    """
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, QueryHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.datasets = {d.name: d for d in datasets}
+    server.verbose = verbose
+    return server
+
+
+class _UnixConnection(http.client.HTTPConnection):
+
+    def __init__(self, path):
+        http.client.HTTPConnection.__init__(self, "localhost")
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+class QueryClient:
+    """
+    Client of a query server, keeping one connection open.
+    """
+
+    def __init__(self, address):
+        """
+        :param address: "http://host:port" or "unix:/path/to/socket"
+        """
+        if address.startswith("unix:"):
+            self.connection = _UnixConnection(address[len("unix:"):])
+        else:
+            url = urlparse(address)
+            self.connection = http.client.HTTPConnection(url.hostname, url.port or DEFAULT_PORT)
+
+    def _request(self, method, path, body=None, content_type="application/json"):
+        headers = {"Content-Type": content_type} if body is not None else {}
+        self.connection.request(method, path, body, headers)
+        response = self.connection.getresponse()
+        data = response.read()
+        if response.status != 200:
+            raise ValueError(json.loads(data).get("error"))
+        return data
+
+    def datasets(self):
+        """
+        :return: list of dataset dicts
+        """
+        return json.loads(self._request("GET", "/datasets"))
+
+    def query(self, dataset, points, method="nearest", prop=None):
+        """
+        :param points: (N, 3) array of lon, lat, depth
+        :return: float64 array of N values, nan for no value
+        """
+        params = "dataset=%s&method=%s" % (quote(dataset, safe=""), method)
+        if prop is not None:
+            params += "&property=" + prop
+        body = np.ascontiguousarray(points, dtype="<f8").tobytes()
+        return np.frombuffer(self._request("POST", "/query?" + params, body, BINARY), dtype="<f8")
+
+    def close(self):
+        self.connection.close()
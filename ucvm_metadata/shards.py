@@ -0,0 +1,305 @@
+"""
+shards.py
+
+Split the output of a cross section or horizontal slice converter into
+shard files, so ingest jobs that only read files in parallel can read it
+in parallel, and readers can fetch only the shards they need.
+
+The converted grid, after any window and thinning, is cut into N parts
+along one axis:
+
+    rows    N ranges of about as many output rows, read in order the
+            shards hold the rows of the unsharded file: ranges of grid
+            rows (depths or lats) for the wide format, of horizontal
+            points or lons for the long formats
+    lon     N tiles of horizontal points for cross sections, of lons for
+            horizontal slices
+    depth   N bands of depths, cross sections only
+
+The parts are cut out of the windowed grid before it is thinned, on whole
+decimate or block mean steps, so the shards hold the same points and
+values as the unsharded output.  Each shard is written by the converter,
+with its own header, in a pool of worker processes, and named after the
+output file:
+
+    la.csv.gz -> la-00000-of-00004.csv.gz, la-00001-of-00004.csv.gz, ...
+
+A manifest next to them, <output>.shards.json, lists the file, row count,
+size, sha256, grid rows and columns and lon/lat/depth bounds of each shard:
+
+    {"version": 1, "converter": "convert_horizontal_slice_line", "inputs": [...],
+     "output": "la.csv.gz", "shard_by": "lon", "rows": 494538,
+     "shards": [{"file": "la-00000-of-00004.csv.gz", "rows": 124254, "bytes": 1380411,
+                 "sha256": "...", "grid": {"rows": [0, 649], "cols": [0, 191]},
+                 "bounds": {"lon": [-126.4, -124.5], "lat": [35.02, 41.5], "depth": [0.0, 0.0]}}, ...]}
+
+The manifest is written last, a run that fails leaves none behind.
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .batch import available_cores
+from .cache import file_hash, save_manifest
+from .compress import strip_compression
+from .decimate import thin_cross_section, thin_horizontal_slice
+from .metadata import MetadataError, read_metadata
+from .profiling import Profiler
+from .window import EDGE, subset_cross_section, subset_horizontal_slice
+
+SHARD_AXES = ("rows", "lon", "depth")
+
+MANIFEST_EXTENSION = ".shards.json"
+
+MANIFEST_VERSION = 1
+
+# converter -> (kind, layout), layout wide has one row per grid row and
+# long one row per point
+LAYOUTS = {
+    "convert_cross_section": ("c", "wide"),
+    "convert_cross_section_line": ("c", "long"),
+    "convert_cross_section_all": ("c", "long"),
+    "convert_cross_section_multi": ("c", "long"),
+    "convert_horizontal_slice": ("h", "wide"),
+    "convert_horizontal_slice_line": ("h", "long"),
+    "convert_horizontal_slice_all": ("h", "long"),
+    "convert_horizontal_slice_multi": ("h", "long"),
+}
+
+# metadata list of the grid rows of each kind, the columns are lon_list
+_ROW_LIST = {"c": "depth_list", "h": "lat_list"}
+
+
+class _RowCounter(Profiler):
+    """
+    Profiler of a shard conversion that keeps the rows written without writing a sidecar.
+    """
+
+    def write(self, output_file_name, converter=None, inputs=()):
+        return None
+
+
+def shard_file(output_file_name, index, count):
+    """
+    :return: file name of shard index of count, la.csv.gz -> la-00001-of-00004.csv.gz
+    """
+    stem = strip_compression(output_file_name)
+    base, ext = os.path.splitext(stem)
+    return "%s-%05d-of-%05d%s%s" % (base, index, count, ext, output_file_name[len(stem):])
+
+
+def manifest_file(output_file_name):
+    """
+    :return: file name of the shard manifest of an output file
+    """
+    return output_file_name + MANIFEST_EXTENSION
+
+
+def converted_grid(kind, meta_file, bbox=None, depth_range=None, decimate=None, block_mean=None):
+    """
+    Work out the grid a converter writes from the metadata alone.
+
+    :param kind: c or h
+    :return: (metadata of the converted grid, (rows, cols) of the windowed
+             grid, (rows, cols) thinning factors, 1 without thinning)
+    """
+    obj = read_metadata(meta_file)
+    if kind == "c":
+        obj, _ = subset_cross_section(obj, [], bbox, depth_range)
+    else:
+        obj, _ = subset_horizontal_slice(obj, [], bbox)
+    shape = (len(obj[_ROW_LIST[kind]]), len(obj["lon_list"]))
+    if decimate is None and block_mean is None:
+        return obj, shape, (1, 1)
+    thin = thin_cross_section if kind == "c" else thin_horizontal_slice
+    factors = tuple(block_mean) if block_mean is not None else (decimate, decimate)
+    return thin(obj, [], decimate, block_mean)[0], shape, factors
+
+
+def _bounds(obj, kind, rows, cols):
+    if kind == "c":
+        values = {"lon": obj["lon_list"][cols], "lat": obj["lat_list"][cols], "depth": obj["depth_list"][rows]}
+    else:
+        values = {"lon": obj["lon_list"][cols], "lat": obj["lat_list"][rows], "depth": [obj["depth"]]}
+    return {key: [min(map(float, v)), max(map(float, v))] for key, v in values.items()}
+
+
+def plan_shards(obj, kind, layout, shape, factors, count, shard_by="rows"):
+    """
+    :param obj: metadata of the converted grid, see converted_grid
+    :param shape: (rows, cols) of the windowed grid
+    :param factors: (rows, cols) thinning factors
+    :param count: number of shards, at most one per grid row or column
+    :return: list of (part, grid, bounds) of each shard: the (row slice,
+             column slice) of the windowed grid given to the converter,
+             {"rows": [start, stop], "cols": [start, stop]} of the converted
+             grid and {"lon", "lat", "depth": [min, max]}
+    """
+    if shard_by not in SHARD_AXES:
+        raise MetadataError("Unknown shard axis", shard_by)
+    if shard_by == "depth" and kind != "c":
+        raise MetadataError("Only cross sections have depths to shard by")
+    axis = 0 if shard_by == "depth" or (shard_by == "rows" and layout == "wide") else 1
+    sizes = (len(obj[_ROW_LIST[kind]]), len(obj["lon_list"]))
+    count = min(count, sizes[axis])
+    edges = [sizes[axis] * i // count for i in range(count + 1)]
+    plan = []
+    for start, stop in zip(edges[:-1], edges[1:]):
+        ranges = [(0, sizes[0]), (0, sizes[1])]
+        ranges[axis] = (start, stop)
+        #
+        # converted point i comes from windowed points i * factor to
+        # (i + 1) * factor, the last block may be cut short
+        part = tuple(slice(a * f, min(b * f, n)) for (a, b), f, n in zip(ranges, factors, shape))
+        rows, cols = (slice(a, b) for a, b in ranges)
+        plan.append((part, {"rows": list(ranges[0]), "cols": list(ranges[1])}, _bounds(obj, kind, rows, cols)))
+    return plan
+
+
+def _write_shard(convert, inputs, output_file_name, part, profile, options):
+    """
+    Convert one shard.
+
+    :param profile: (profile, cprofile stage), profile writes the profile
+                    sidecar of the shard
+    :return: manifest entry of the shard without its grid and bounds
+    """
+    start = time.perf_counter()
+    profiler = Profiler(profile[1]) if profile[0] else _RowCounter()
+    convert(*inputs, output_file_name=output_file_name, profiler=profiler, part=part, **options)
+    return {"file": os.path.basename(output_file_name),
+            "rows": sum(s["rows"] for s in profiler.stages if s["name"] == "write"),
+            "bytes": os.path.getsize(output_file_name),
+            "sha256": file_hash(output_file_name),
+            "seconds": time.perf_counter() - start}
+
+
+def _input_files(inputs):
+    """
+    :return: list of the input files of converter arguments, the files or a list of pairs
+    """
+    if isinstance(inputs[0], str):
+        return list(inputs)
+    return [name for pair in inputs[0] for name in pair]
+
+
+def write_shards(convert, inputs, output_file_name, count, shard_by="rows", processes=None, verbose=False,
+                 profiler=None, **options):
+    """
+    Write the output of a converter as count shards and their manifest.
+
+    :param convert: cross section or horizontal slice converter in converters.py
+    :param inputs: list of the positional input arguments of convert, the
+                   data and meta files, or the list of pairs of a multi converter
+    :param output_file_name: output file the shards are named after, None
+                             for the data file name with a .csv extension
+    :param shard_by: rows, lon or depth
+    :param processes: worker processes, defaults to the number of available cores
+    :param profiler: given a Profiler, each shard writes a profile sidecar
+    :param options: keyword arguments of convert, like bbox or skip_nodata
+    :return: manifest file name
+    """
+    kind, layout = LAYOUTS[convert.__name__]
+    files = _input_files(inputs)
+    if output_file_name is None:
+        output_file_name = files[0].replace(".bin", ".csv")
+    obj, shape, factors = converted_grid(kind, files[1], options.get("bbox"), options.get("depth_range"),
+                                         options.get("decimate"), options.get("block_mean"))
+    plan = plan_shards(obj, kind, layout, shape, factors, count, shard_by)
+    names = [shard_file(output_file_name, i, len(plan)) for i in range(len(plan))]
+    profile = (profiler is not None, profiler.cprofile_stage if profiler is not None else None)
+    options["verbose"] = False
+    if verbose:
+        print("\nWriting %d shards of %s by %s" % (len(plan), output_file_name, shard_by))
+
+    def done(index, entry):
+        entries[index] = entry
+        if verbose:
+            print("  %s: %d rows, %d bytes" % (entry["file"], entry["rows"], entry["bytes"]), flush=True)
+
+    entries = {}
+    processes = max(1, min(processes or available_cores(), len(plan)))
+    if processes == 1:
+        for i, (part, _, _) in enumerate(plan):
+            done(i, _write_shard(convert, inputs, names[i], part, profile, options))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {pool.submit(_write_shard, convert, inputs, names[i], part, profile, options): i
+                       for i, (part, _, _) in enumerate(plan)}
+            for future in as_completed(futures):
+                done(futures[future], future.result())
+
+    shards = []
+    for i, (_, grid, bounds) in enumerate(plan):
+        entry = entries[i]
+        del entry["seconds"]
+        entry.update(grid=grid, bounds=bounds)
+        shards.append(entry)
+    manifest = {"version": MANIFEST_VERSION, "converter": convert.__name__, "inputs": files,
+                "output": os.path.basename(output_file_name), "shard_by": shard_by,
+                "rows": sum(entry["rows"] for entry in shards), "shards": shards}
+    filename = manifest_file(output_file_name)
+    save_manifest(filename, manifest)
+    if verbose:
+        print("Wrote shard manifest: ", filename)
+    return filename
+
+
+def read_shard_manifest(filename):
+    """
+    :return: the shard manifest as a dict
+    """
+    with open(filename) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise MetadataError("Unsupported shard manifest version", filename, manifest.get("version"))
+    return manifest
+
+
+def _overlaps(bounds, lo, hi):
+    return bounds[0] <= hi + EDGE and bounds[1] >= lo - EDGE
+
+
+def select_shards(manifest, bbox=None, depth_range=None):
+    """
+    :param bbox: (lon_min, lat_min, lon_max, lat_max) or None for all points
+    :param depth_range: (depth_min, depth_max) in meters or None for all depths
+    :return: list of the manifest entries of the shards with points in the window
+    """
+    found = []
+    for entry in manifest["shards"]:
+        bounds = entry["bounds"]
+        if bbox is not None and not (_overlaps(bounds["lon"], bbox[0], bbox[2]) and
+                                     _overlaps(bounds["lat"], bbox[1], bbox[3])):
+            continue
+        if depth_range is not None and not _overlaps(bounds["depth"], *depth_range):
+            continue
+        found.append(entry)
+    return found
+
+
+def shard_path(filename, entry):
+    """
+    :param filename: shard manifest file name
+    :return: path of the shard file of a manifest entry
+    """
+    return os.path.join(os.path.dirname(filename), entry["file"])
+
+
+def verify_shards(filename):
+    """
+    Check the shard files of a manifest against their recorded size and sha256.
+
+    :return: list of (shard file, problem), empty when every shard is intact
+    """
+    problems = []
+    for entry in read_shard_manifest(filename)["shards"]:
+        path = shard_path(filename, entry)
+        if not os.path.exists(path):
+            problems.append((path, "missing"))
+        elif os.path.getsize(path) != entry["bytes"]:
+            problems.append((path, "size %d, expected %d" % (os.path.getsize(path), entry["bytes"])))
+        elif file_hash(path) != entry["sha256"]:
+            problems.append((path, "sha256 differs"))
+    return problems
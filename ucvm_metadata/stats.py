@@ -0,0 +1,285 @@
+"""
+stats.py
+
+Statistics of cross section and horizontal slice grids, computed in one
+pass over the memory mapped grid, and checked against the min, max, mean
+and point counts stored in the metadata.
+
+For the whole grid and for each grid row (each depth of a cross section,
+each lat of a horizontal slice) the pass counts the points with data, the
+NoData points (-1 in cross sections, 0.0 in horizontal slices) and the nan
+points, and computes min, max, mean and standard deviation of the points
+with data.
+
+Percentiles and histograms need the value range before the pass, so the
+pass instead counts values into a fine histogram over the float32 bit
+patterns: the sign, exponent and top 11 mantissa bits of a value pick one
+of 2^20 bins, each 1/2048 of its value wide.  Percentiles are interpolated
+in their bin and histograms are rebinned from it, both to within that
+relative precision.
+"""
+import numpy as np
+
+from .gridio import BLOCK_POINTS, iter_row_blocks
+
+# NoData value of each kind of grid
+NODATA = {"cross_section": -1.0, "horizontal_slice": 0.0}
+
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+HISTOGRAM_BINS = 20
+
+# relative difference allowed between the metadata and the data statistics
+TOLERANCE = 1e-4
+
+# low bits of the float32 patterns dropped to get the fine histogram bin
+_HIST_SHIFT = 12
+
+_HIST_SIZE = 1 << (32 - _HIST_SHIFT)
+
+_SIGN = np.uint32(0x80000000)
+
+
+def grid_kind(obj):
+    """
+    :return: "cross_section" or "horizontal_slice" for a grid metadata dict
+    """
+    return "cross_section" if "depth_list" in obj else "horizontal_slice"
+
+
+def _bins(values):
+    """
+    :return: fine histogram bin of float32 values, in value order
+    """
+    bits = values.astype(np.float32, copy=False).view(np.uint32)
+    keys = np.where(bits & _SIGN, ~bits, bits | _SIGN)
+    return keys >> _HIST_SHIFT
+
+
+def _bin_edges(bins):
+    """
+    :return: float64 lowest value of fine histogram bins
+    """
+    keys = np.asarray(bins, dtype=np.uint32) << _HIST_SHIFT
+    bits = np.where(keys & _SIGN, keys & ~_SIGN, ~keys).astype(np.uint32)
+    return bits.view(np.float32).astype(np.float64)
+
+
+class GridStats:
+    """
+    Accumulates the statistics of a grid one block of rows at a time.
+    """
+
+    def __init__(self, num_rows, nodata):
+        """
+        :param num_rows: number of grid rows
+        :param nodata: value of points without data
+        """
+        self.nodata = nodata
+        self.count = np.zeros(num_rows, dtype=np.int64)
+        self.nodata_count = np.zeros(num_rows, dtype=np.int64)
+        self.nan_count = np.zeros(num_rows, dtype=np.int64)
+        self.min = np.full(num_rows, np.nan)
+        self.max = np.full(num_rows, np.nan)
+        self.mean = np.full(num_rows, np.nan)
+        self.m2 = np.zeros(num_rows)
+        self.histogram = np.zeros(_HIST_SIZE, dtype=np.int64)
+
+    def add(self, start, block):
+        """
+        Add the float32 grid rows start:start + len(block).
+        """
+        stop = start + len(block)
+        isnan = np.isnan(block)
+        isnodata = block == self.nodata
+        valid = ~(isnan | isnodata)
+        count = valid.sum(axis=1)
+        values = block.astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(valid, values, 0.0).sum(axis=1) / count
+            self.m2[start:stop] = np.where(valid, (values - mean[:, None]) ** 2, 0.0).sum(axis=1)
+        self.count[start:stop] = count
+        self.nodata_count[start:stop] = isnodata.sum(axis=1)
+        self.nan_count[start:stop] = isnan.sum(axis=1)
+        self.mean[start:stop] = mean
+        has_data = count > 0
+        self.min[start:stop] = np.where(has_data, np.where(valid, values, np.inf).min(axis=1), np.nan)
+        self.max[start:stop] = np.where(has_data, np.where(valid, values, -np.inf).max(axis=1), np.nan)
+        self.histogram += np.bincount(_bins(block[valid]), minlength=_HIST_SIZE)
+
+    def rows(self):
+        """
+        :return: dict of per row count, nodata, nan, min, max, mean, std lists
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(self.m2 / self.count)
+        return {
+            "count": self.count.tolist(),
+            "nodata": self.nodata_count.tolist(),
+            "nan": self.nan_count.tolist(),
+            "min": _floats(self.min),
+            "max": _floats(self.max),
+            "mean": _floats(self.mean),
+            "std": _floats(std),
+        }
+
+    def total(self):
+        """
+        :return: dict of the statistics of the whole grid
+        """
+        n = int(self.count.sum())
+        result = {
+            "points": n + int(self.nodata_count.sum()) + int(self.nan_count.sum()),
+            "count": n,
+            "nodata": int(self.nodata_count.sum()),
+            "nan": int(self.nan_count.sum()),
+            "min": None, "max": None, "mean": None, "std": None,
+        }
+        if n == 0:
+            return result
+        has_data = self.count > 0
+        counts = self.count[has_data]
+        means = self.mean[has_data]
+        mean = float((counts * means).sum() / n)
+        #
+        # the row variances are combined with Chan's parallel formula
+        m2 = float(self.m2[has_data].sum() + (counts * (means - mean) ** 2).sum())
+        result.update({
+            "min": float(np.nanmin(self.min)),
+            "max": float(np.nanmax(self.max)),
+            "mean": mean,
+            "std": (m2 / n) ** 0.5,
+        })
+        return result
+
+    def percentiles(self, percentiles=PERCENTILES):
+        """
+        :return: dict of percentile -> value, interpolated like numpy's
+                 default within the fine histogram bins
+        """
+        n = int(self.count.sum())
+        if n == 0:
+            return {str(p): None for p in percentiles}
+        bins = np.flatnonzero(self.histogram)
+        counts = self.histogram[bins]
+        before = np.cumsum(counts) - counts
+        lo = _bin_edges(bins)
+        hi = _bin_edges(bins + 1)
+        vmin, vmax = float(np.nanmin(self.min)), float(np.nanmax(self.max))
+        result = {}
+        for p in percentiles:
+            rank = p / 100.0 * (n - 1)
+            i = min(int(np.searchsorted(before + counts, rank, side="right")), len(bins) - 1)
+            fraction = (rank - before[i] + 0.5) / counts[i]
+            value = lo[i] + min(1.0, fraction) * (hi[i] - lo[i])
+            result[str(p)] = min(vmax, max(vmin, float(value)))
+        return result
+
+    def binned(self, num_bins=HISTOGRAM_BINS):
+        """
+        :return: dict of num_bins + 1 "edges" and num_bins "counts" of a
+                 histogram from min to max, rebinned from the fine histogram
+        """
+        n = int(self.count.sum())
+        if n == 0:
+            return {"edges": [], "counts": []}
+        vmin, vmax = float(np.nanmin(self.min)), float(np.nanmax(self.max))
+        edges = np.linspace(vmin, vmax, num_bins + 1)
+        bins = np.flatnonzero(self.histogram)
+        middle = (_bin_edges(bins) + _bin_edges(bins + 1)) / 2
+        index = np.clip(np.searchsorted(edges, middle, side="right") - 1, 0, num_bins - 1)
+        counts = np.bincount(index, weights=self.histogram[bins], minlength=num_bins)
+        return {"edges": edges.tolist(), "counts": counts.astype(np.int64).tolist()}
+
+
+def _floats(values):
+    return [None if np.isnan(v) else float(v) for v in values]
+
+
+def _close(a, b, tolerance):
+    return abs(a - b) <= tolerance * max(abs(a), abs(b), 1.0)
+
+
+def check_metadata(obj, total, shape, tolerance=TOLERANCE):
+    """
+    :param total: statistics of the whole grid, from GridStats.total
+    :param shape: shape of the grid
+    :return: list of mismatch dicts (key, metadata, data), with the
+             data/metadata ratio for the statistics
+    """
+    mismatches = []
+    kind = grid_kind(obj)
+    rows, cols = ("depth_list", "lat_list") if kind == "cross_section" else ("lat_list", "lon_list")
+    for key, value in ((rows, shape[0]), (cols, shape[1])):
+        if key in obj and len(obj[key]) != value:
+            mismatches.append({"key": key, "metadata": len(obj[key]), "data": value})
+    if "datapoints" in obj and obj["datapoints"] != total["points"]:
+        mismatches.append({"key": "datapoints", "metadata": obj["datapoints"], "data": total["points"]})
+    for key in ("min", "max", "mean"):
+        if key not in obj or total[key] is None:
+            continue
+        stored = float(obj[key])
+        if not _close(stored, total[key], tolerance):
+            mismatches.append({"key": key, "metadata": stored, "data": total[key],
+                               "ratio": total[key] / stored if stored else None})
+    return mismatches
+
+
+def grid_stats(obj, grid, percentiles=PERCENTILES, num_bins=HISTOGRAM_BINS, tolerance=TOLERANCE,
+               rows=True, block_points=BLOCK_POINTS):
+    """
+    Compute the statistics report of a grid in one pass.
+
+    :param obj: metadata dict of the grid
+    :param grid: 2D float32 array, may be memory mapped
+    :param rows: include the per row statistics
+    :return: report dict
+    """
+    kind = grid_kind(obj)
+    stats = GridStats(grid.shape[0], NODATA[kind])
+    for start, block in iter_row_blocks(grid, block_points):
+        stats.add(start, block)
+    total = stats.total()
+    report = {
+        "kind": kind,
+        "title": obj.get("title"),
+        "cvm": obj.get("cvm"),
+        "data_type": obj.get("data_type"),
+        "shape": list(grid.shape),
+        "nodata_value": stats.nodata,
+        "total": total,
+        "percentiles": stats.percentiles(percentiles),
+        "histogram": stats.binned(num_bins),
+        "mismatches": check_metadata(obj, total, grid.shape, tolerance),
+    }
+    if rows:
+        report["rows"] = stats.rows()
+        label = "depth_list" if kind == "cross_section" else "lat_list"
+        if len(obj.get(label, ())) == grid.shape[0]:
+            report["rows"]["label"] = list(obj[label])
+    return report
+
+
+def format_report(report):
+    """
+    :return: the report as printable text, without the per row statistics
+    """
+    total = report["total"]
+    lines = ["%s %s %s %s" % (report["kind"], report["cvm"], report["data_type"],
+                              "x".join(str(n) for n in report["shape"]))]
+    lines.append("Points: %d  Data: %d  NoData(%s): %d  nan: %d" % (
+        total["points"], total["count"], report["nodata_value"], total["nodata"], total["nan"]))
+    if total["count"]:
+        lines.append("Min: %.4f  Max: %.4f  Mean: %.4f  Std: %.4f" % (
+            total["min"], total["max"], total["mean"], total["std"]))
+        lines.append("Percentiles: " + "  ".join("p%s=%.4f" % (p, v) for p, v in report["percentiles"].items()))
+        histogram = report["histogram"]
+        for lo, hi, count in zip(histogram["edges"], histogram["edges"][1:], histogram["counts"]):
+            lines.append("  %12.4f %12.4f %10d" % (lo, hi, count))
+    for m in report["mismatches"]:
+        ratio = m.get("ratio")
+        lines.append("MISMATCH %s: metadata %s data %s%s" % (
+            m["key"], m["metadata"], m["data"], "" if ratio is None else " (ratio %.6g)" % ratio))
+    if not report["mismatches"]:
+        lines.append("Metadata matches the data")
+    return "\n".join(lines)
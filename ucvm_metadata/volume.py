@@ -0,0 +1,269 @@
+"""
+volume.py
+
+Horizontal slices of the same region at many depths, stacked into a 3D
+volume on disk that can be read a piece at a time.
+
+The volume is a directory of .npy chunks and a volume.json index:
+
+    volume.json                 shape (depth, lat, lon), chunk shape, dtype,
+                                the depth, lat and lon axes, and the
+                                metadata of every slice
+    chunk_<d>_<r>_<c>.npy       points [d*D:(d+1)*D, r*R:(r+1)*R, c*C:(c+1)*C]
+                                for a chunk shape (D, R, C), smaller at the
+                                ends of the axes
+
+Depths are sorted increasing.  The slices must have the same data_type
+and the same lat and lon lists, to within axes.TOLERANCE.  NoData stays
+0.0, like in the slices.
+
+    >>> from ucvm_metadata.volume import Volume
+    >>> volume = Volume("la_basin_vs")
+    >>> volume.column(-118.2, 34.05)            # values at every depth
+    >>> volume.depth_slice(1000)                # lat by lon grid nearest 1000m
+    >>> volume.subvolume((-118.3, 34.0, -118.1, 34.2), (0, 2000))
+
+Chunks are memory mapped when they are first read, a read only touches the
+chunks it intersects: a depth column reads one point from each chunk down
+the stack, a depth slice one chunk layer.  The index is written last, so a
+directory without one is an incomplete volume.
+"""
+import json
+import os
+import re
+
+import numpy as np
+
+from .axes import TOLERANCE, axis_values
+from .gridio import release_pages
+from .interpolate import HORIZONTAL_SLICE_NODATA, axis_position
+from .metadata import MetadataError
+from .window import axis_range
+
+INDEX_NAME = "volume.json"
+
+VOLUME_VERSION = 1
+
+# default (depth, lat, lon) points per chunk
+CHUNKS = (16, 256, 256)
+
+# metadata of each slice kept in the index
+SLICE_KEYS = ("title", "cvm", "data_type", "depth", "min", "max", "mean")
+
+
+def chunk_name(d, r, c):
+    """
+    :return: file name of chunk (d, r, c) of a volume
+    """
+    return "chunk_%d_%d_%d.npy" % (d, r, c)
+
+
+_CHUNK_NAME = re.compile(r"chunk_\d+_\d+_\d+\.npy$")
+
+
+def _clear_volume(directory):
+    """
+    Remove the index and chunks of an earlier volume, which may have had
+    other chunks, leaving any other files.
+    """
+    for name in os.listdir(directory):
+        if name in (INDEX_NAME, INDEX_NAME + ".tmp") or _CHUNK_NAME.match(name):
+            os.remove(os.path.join(directory, name))
+
+
+def _same_axis(a, b, tolerance):
+    return len(a) == len(b) and bool(np.all(np.abs(a - b) <= tolerance))
+
+
+def check_slices(slices, tolerance=TOLERANCE):
+    """
+    Check that horizontal slices can be stacked.
+
+    :param slices: list of HorizontalSlice
+    :return: the slices sorted by depth
+    """
+    if not slices:
+        raise MetadataError("No horizontal slices to stack")
+    slices = sorted(slices, key=lambda hs: hs.depth)
+    first = slices[0]
+    lat, lon = axis_values(first.lat), axis_values(first.lon)
+    for previous, hs in zip(slices, slices[1:]):
+        if hs.depth == previous.depth:
+            raise MetadataError("Two slices have the same depth", hs.depth)
+        if hs.meta.get("data_type") != first.meta.get("data_type"):
+            raise MetadataError("Slices have different data types", first.meta.get("data_type"),
+                                hs.meta.get("data_type"))
+        if hs.data.dtype != first.data.dtype:
+            raise MetadataError("Slices have different dtypes", str(first.data.dtype), str(hs.data.dtype))
+        if not _same_axis(axis_values(hs.lat), lat, tolerance):
+            raise MetadataError("Slice lat list does not match the slice at depth", first.depth, hs.depth)
+        if not _same_axis(axis_values(hs.lon), lon, tolerance):
+            raise MetadataError("Slice lon list does not match the slice at depth", first.depth, hs.depth)
+    return slices
+
+
+def write_volume(directory, slices, chunks=CHUNKS, tolerance=TOLERANCE, progress=None, force=False):
+    """
+    Stack horizontal slices into a chunked volume.
+
+    :param directory: volume directory, created if needed
+    :param slices: list of HorizontalSlice, in any order
+    :param chunks: (depth, lat, lon) points per chunk
+    :param progress: called with (depths written, number of depths)
+    :param force: write into a directory that is not empty, replacing the
+                  index and chunks of the volume in it
+    :return: the index dict written to volume.json
+    """
+    slices = check_slices(slices, tolerance)
+    lat, lon = axis_values(slices[0].lat), axis_values(slices[0].lon)
+    shape = (len(slices), len(lat), len(lon))
+    chunks = tuple(min(c, n) for c, n in zip(chunks, shape))
+    dtype = slices[0].data.dtype
+    os.makedirs(directory, exist_ok=True)
+    index_file = os.path.join(directory, INDEX_NAME)
+    if os.listdir(directory):
+        if not force:
+            raise MetadataError("The volume directory is not empty", directory)
+        _clear_volume(directory)
+
+    num_depth, num_rows, num_cols = chunks
+    for d, d0 in enumerate(range(0, shape[0], num_depth)):
+        layer = slices[d0:d0 + num_depth]
+        for r, r0 in enumerate(range(0, shape[1], num_rows)):
+            r1 = min(r0 + num_rows, shape[1])
+            #
+            # read a strip of rows of every slice in the layer once and cut
+            # the chunks of the strip from it
+            strip = np.empty((len(layer), r1 - r0, shape[2]), dtype=dtype)
+            for i, hs in enumerate(layer):
+                strip[i] = hs.data[r0:r1, :shape[2]]
+            for c, c0 in enumerate(range(0, shape[2], num_cols)):
+                np.save(os.path.join(directory, chunk_name(d, r, c)), strip[:, :, c0:c0 + num_cols])
+        for hs in layer:
+            release_pages(hs.data)
+        if progress is not None:
+            progress(d0 + len(layer), shape[0])
+
+    index = {
+        "version": VOLUME_VERSION,
+        "shape": list(shape),
+        "chunks": list(chunks),
+        "dtype": dtype.str,
+        "nodata": HORIZONTAL_SLICE_NODATA,
+        "data_type": slices[0].meta.get("data_type"),
+        "cvm": slices[0].meta.get("cvm"),
+        "depth": [hs.depth for hs in slices],
+        "lat_list": lat.tolist(),
+        "lon_list": lon.tolist(),
+        "slices": [{key: hs.meta.get(key) for key in SLICE_KEYS} for hs in slices],
+    }
+    tmp = index_file + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp, index_file)
+    return index
+
+
+def _nearest(axis, x, name):
+    position = axis_position(axis, np.array([x], dtype=np.float64))[0]
+    if np.isnan(position):
+        raise ValueError("%s %s is outside of the volume" % (name, x))
+    return int(np.rint(position))
+
+
+def _range(index, n):
+    """
+    :return: (start, stop) of an int or slice index along an axis of n points
+    """
+    if isinstance(index, slice):
+        start, stop, step = index.indices(n)
+        if step != 1:
+            raise ValueError("Volume reads take contiguous ranges")
+        return start, max(start, stop)
+    index = int(index)
+    if index < 0:
+        index += n
+    if not 0 <= index < n:
+        raise IndexError("Index %d is outside of an axis of %d points" % (index, n))
+    return index, index + 1
+
+
+class Volume:
+    """
+    A chunked volume written by write_volume.
+
+    depth, lat and lon are float64 axes, meta is the volume.json index.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_NAME)) as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != VOLUME_VERSION:
+            raise MetadataError("Unknown volume version", self.meta.get("version"))
+        self.shape = tuple(self.meta["shape"])
+        self.chunks = tuple(self.meta["chunks"])
+        self.dtype = np.dtype(self.meta["dtype"])
+        self.depth = np.array(self.meta["depth"], dtype=np.float64)
+        self.lat = np.array(self.meta["lat_list"], dtype=np.float64)
+        self.lon = np.array(self.meta["lon_list"], dtype=np.float64)
+        self._open = {}
+
+    def _chunk(self, key):
+        chunk = self._open.get(key)
+        if chunk is None:
+            chunk = np.load(os.path.join(self.directory, chunk_name(*key)), mmap_mode='r')
+            self._open[key] = chunk
+        return chunk
+
+    def read(self, depths=slice(None), rows=slice(None), cols=slice(None)):
+        """
+        :param depths, rows, cols: index or contiguous slice along the depth, lat and lon axes
+        :return: array of the points, an int index drops its axis like numpy does
+        """
+        ranges = [_range(i, n) for i, n in zip((depths, rows, cols), self.shape)]
+        out = np.empty([stop - start for start, stop in ranges], dtype=self.dtype)
+        if out.size:
+            spans = []
+            for (start, stop), size in zip(ranges, self.chunks):
+                spans.append(range(start // size, (stop - 1) // size + 1))
+            for key in np.ndindex(*(len(s) for s in spans)):
+                key = tuple(s[k] for s, k in zip(spans, key))
+                source = []
+                target = []
+                for k, (start, stop), size in zip(key, ranges, self.chunks):
+                    lo, hi = max(start, k * size), min(stop, (k + 1) * size)
+                    source.append(slice(lo - k * size, hi - k * size))
+                    target.append(slice(lo - start, hi - start))
+                out[tuple(target)] = self._chunk(key)[tuple(source)]
+        drop = tuple(0 if not isinstance(i, slice) else slice(None) for i in (depths, rows, cols))
+        return out[drop]
+
+    def depth_slice(self, depth):
+        """
+        :return: lat by lon grid of the depth nearest to depth
+        """
+        return self.read(_nearest(self.depth, depth, "Depth"))
+
+    def column(self, lon, lat):
+        """
+        :return: values at every depth of the grid point nearest to lon, lat
+        """
+        return self.read(slice(None), _nearest(self.lat, lat, "Lat"), _nearest(self.lon, lon, "Lon"))
+
+    def subvolume(self, bbox=None, depth_range=None):
+        """
+        :param bbox: (lon_min, lat_min, lon_max, lat_max) or None for all points
+        :param depth_range: (depth_min, depth_max) in meters or None for all depths
+        :return: (depth by lat by lon array, depth axis, lat axis, lon axis)
+        """
+        depths = slice(0, self.shape[0])
+        rows = slice(0, self.shape[1])
+        cols = slice(0, self.shape[2])
+        if depth_range is not None:
+            depths = axis_range(self.depth, *depth_range)
+        if bbox is not None:
+            lon_min, lat_min, lon_max, lat_max = bbox
+            rows = axis_range(self.lat, lat_min, lat_max)
+            cols = axis_range(self.lon, lon_min, lon_max)
+        return self.read(depths, rows, cols), self.depth[depths], self.lat[rows], self.lon[cols]
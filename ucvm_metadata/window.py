@@ -0,0 +1,167 @@
+"""
+window.py
+
+Cutting a lon/lat box or depth range out of a cross section or horizontal
+slice before it is converted.
+
+The window is turned into a range of rows and columns using the metadata
+coordinate lists, and the grids are sliced to it.  Slicing a memory mapped
+grid does not read it, so a conversion only reads the pages of the rows
+and columns in the window and its cost grows with the window, not the
+file.
+
+The metadata is cut to the window too, so the headers count the points
+written: the coordinate lists, datapoints, num_x and num_y, lat1/lon1/
+lat2/lon2 and for cross sections starting_depth and ending_depth.  min,
+max and mean are left as the statistics of the whole grid.
+"""
+import numpy as np
+
+# slack allowed at the window edges, in degrees or meters, for coordinates
+# like 34.568200000000004 in the metadata lists
+EDGE = 1e-9
+
+
+def coordinate_text(value):
+    """
+    :return: a coordinate as text, the way the metadata files write them
+    """
+    text = str(value)
+    return text[:-2] if text.endswith(".0") else text
+
+
+def _span(mask):
+    """
+    :return: slice from the first to the last True entry of mask
+    """
+    index = np.flatnonzero(mask)
+    if index.size == 0:
+        raise ValueError("The window does not contain any points")
+    return slice(int(index[0]), int(index[-1]) + 1)
+
+
+def _inside(values, lo, hi):
+    values = np.asarray(values, dtype=np.float64)
+    return (values >= lo - EDGE) & (values <= hi + EDGE)
+
+
+def axis_range(values, lo, hi):
+    """
+    :return: slice of the entries of values from lo to hi
+    """
+    return _span(_inside(values, lo, hi))
+
+
+def cross_section_window(obj, bbox=None, depth_range=None):
+    """
+    :param bbox: (lon_min, lat_min, lon_max, lat_max) or None for all points
+    :param depth_range: (depth_min, depth_max) in meters or None for all depths
+    :return: (row slice, column slice) of the grid inside the window
+
+    The horizontal points follow a path, the columns run from the first to
+    the last point of the path inside the box.
+    """
+    rows = slice(0, len(obj["depth_list"]))
+    cols = slice(0, len(obj["lat_list"]))
+    if depth_range is not None:
+        rows = axis_range(obj["depth_list"], *depth_range)
+    if bbox is not None:
+        lon_min, lat_min, lon_max, lat_max = bbox
+        cols = _span(_inside(obj["lon_list"], lon_min, lon_max) & _inside(obj["lat_list"], lat_min, lat_max))
+    return rows, cols
+
+
+def horizontal_slice_window(obj, bbox=None):
+    """
+    :param bbox: (lon_min, lat_min, lon_max, lat_max) or None for all points
+    :return: (row slice, column slice) of the grid inside the window
+    """
+    rows = slice(0, len(obj["lat_list"]))
+    cols = slice(0, len(obj["lon_list"]))
+    if bbox is not None:
+        lon_min, lat_min, lon_max, lat_max = bbox
+        rows = axis_range(obj["lat_list"], lat_min, lat_max)
+        cols = axis_range(obj["lon_list"], lon_min, lon_max)
+    return rows, cols
+
+
+def cut_counts(obj, cut, num_rows, num_cols):
+    """
+    Set the point counts of metadata cut down to num_rows by num_cols grid points.
+    """
+    #
+    # num_x and num_y are not always the list lengths (horizontal slices
+    # count one more), so they lose as many points as the lists do
+    cut["num_x"] = obj["num_x"] - (len(obj["lon_list"]) - num_cols)
+    cut["num_y"] = obj["num_y"] - (len(obj["depth_list" if "depth_list" in obj else "lat_list"]) - num_rows)
+    cut["datapoints"] = num_rows * num_cols
+
+
+def cut_cross_section(obj, rows, cols):
+    """
+    :return: copy of cross section metadata cut to rows and cols of the grid
+    """
+    cut = dict(obj)
+    cut["depth_list"] = obj["depth_list"][rows]
+    cut["lat_list"] = obj["lat_list"][cols]
+    cut["lon_list"] = obj["lon_list"][cols]
+    cut_counts(obj, cut, len(cut["depth_list"]), len(cut["lat_list"]))
+    cut["starting_depth"] = coordinate_text(cut["depth_list"][0])
+    cut["ending_depth"] = coordinate_text(cut["depth_list"][-1])
+    cut["lat1"], cut["lon1"] = coordinate_text(cut["lat_list"][0]), coordinate_text(cut["lon_list"][0])
+    cut["lat2"], cut["lon2"] = coordinate_text(cut["lat_list"][-1]), coordinate_text(cut["lon_list"][-1])
+    return cut
+
+
+def cut_horizontal_slice(obj, rows, cols):
+    """
+    :return: copy of horizontal slice metadata cut to rows and cols of the grid
+
+    lat2 and lon2 are the first point past the end of the lists, like in
+    the metadata files.
+    """
+    cut = dict(obj)
+    for key, index, first, last in (("lat_list", rows, "lat1", "lat2"), ("lon_list", cols, "lon1", "lon2")):
+        values = obj[key]
+        cut[key] = values[index]
+        if index.start > 0:
+            cut[first] = coordinate_text(values[index.start])
+        if index.stop < len(values):
+            cut[last] = coordinate_text(values[index.stop])
+    cut_counts(obj, cut, len(cut["lat_list"]), len(cut["lon_list"]))
+    return cut
+
+
+def part_cross_section(obj, grids, part):
+    """
+    :param part: (row slice, column slice) of the grid, with start and stop
+    :return: (cut metadata, list of grid views of the part)
+    """
+    rows, cols = part
+    return cut_cross_section(obj, rows, cols), [grid[rows, cols] for grid in grids]
+
+
+def part_horizontal_slice(obj, grids, part):
+    """
+    :param part: (row slice, column slice) of the grid, with start and stop
+    :return: (cut metadata, list of grid views of the part)
+    """
+    rows, cols = part
+    return cut_horizontal_slice(obj, rows, cols), [grid[rows, cols] for grid in grids]
+
+
+def subset_cross_section(obj, grids, bbox=None, depth_range=None):
+    """
+    :param grids: list of grids sharing the metadata obj, like the vp, vs
+                  and density grids of the _all converter
+    :return: (cut metadata, list of grid views inside the window)
+    """
+    return part_cross_section(obj, grids, cross_section_window(obj, bbox, depth_range))
+
+
+def subset_horizontal_slice(obj, grids, bbox=None):
+    """
+    :param grids: list of grids sharing the metadata obj
+    :return: (cut metadata, list of grid views inside the window)
+    """
+    return part_horizontal_slice(obj, grids, horizontal_slice_window(obj, bbox))